@@ -12,10 +12,12 @@ from agentes_agno.agente_banco_dados import AgenteBancoDados
 from agentes_agno.agente_pesquisador import Pesquisador
 from agentes_agno.agente_github import Agente_GitHub
 from agno.team.team import Team  
+from agentes_agno.parallel_team import ParallelTeam
 from agno.memory.v2.db.sqlite import SqliteMemoryDb
 from agno.memory.v2.memory import Memory
 from agno.storage.sqlite import SqliteStorage
 from agno.tools.reasoning import ReasoningTools
+from agentes_agno.storage_maintenance import StorageMaintenance, HISTORY_TOKEN_BUDGET
 
 load_dotenv()
 
@@ -23,6 +25,9 @@ GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 SMITHERY_API_KEY = os.getenv('SMITHERY_API_KEY')
 GITHUB_ACCESS_TOKEN = os.getenv('GITHUB_ACCESS_TOKEN')
+# Em produção, desligue para evitar o custo de log por requisição
+AGENTE_DEBUG = os.getenv('AGENTE_DEBUG', '1') == '1'
+AGENTE_SHOW_TOOL_CALLS = os.getenv('AGENTE_SHOW_TOOL_CALLS', '1') == '1'
 
 print(GOOGLE_API_KEY, OPENAI_API_KEY, SMITHERY_API_KEY, GITHUB_ACCESS_TOKEN)
 
@@ -30,7 +35,17 @@ print(GOOGLE_API_KEY, OPENAI_API_KEY, SMITHERY_API_KEY, GITHUB_ACCESS_TOKEN)
 sessoes = SqliteStorage(table_name="sessoes", db_file="Banco Agente.db" )
 memorias = Memory(db=SqliteMemoryDb(table_name="memorias", db_file="memorias"))
 
-AgentePrincipal = Team(
+# WAL, índices, poda das execuções antigas e VACUUM periódico dos dois bancos
+manutencao = StorageMaintenance(
+    sessions_db="Banco Agente.db",
+    sessions_table="sessoes",
+    memory_db="memorias",
+    memory_table="memorias",
+    memory=memorias,
+    user_id="Leo",
+)
+
+AgentePrincipal = ParallelTeam(
     memory=memorias,
     user_id="Leo",
     session_id="1",
@@ -38,7 +53,7 @@ AgentePrincipal = Team(
     name='Agente Principal',
     role='Você é um agente principal que pode executar tarefas usando outros agentes e as suas ferramentas.',
     model=OpenAIChat(id='gpt-4o-mini', api_key=OPENAI_API_KEY),
-    show_tool_calls=True,
+    show_tool_calls=AGENTE_SHOW_TOOL_CALLS,
     markdown=True,
     add_datetime_to_instructions=True,
     add_history_to_messages=True,
@@ -48,8 +63,9 @@ AgentePrincipal = Team(
     tools=[ReasoningTools(add_instructions=True, add_few_shot=True)],
     members=[AgenteBancoDados, Pesquisador, Agente_GitHub],  # Só agentes aqui
     
+    # Membros executados em paralelo, com prazo por membro (TEAM_MEMBER_TIMEOUT)
     mode='collaborate',
-    debug_mode=True,
+    debug_mode=AGENTE_DEBUG,
     show_members_responses=True,
     enable_user_memories=True,
     success_criteria='A resposta final deve ser clara, precisa e combinar as informações da internet (via Pesquisador), do GitHub (via Agente GitHub) e do banco de dados (via Agente de Banco de Dados) para resolver completamente a solicitação do usuário.'
@@ -58,10 +74,19 @@ AgentePrincipal = Team(
 
 
 if __name__ == "__main__":
+    manutencao.run()
+    manutencao.start_scheduler()
     print("Agente Principal pronto. Digite 'sair' para encerrar.")
     while True:
         user_input = input("Você: ")
         if user_input.lower() == 'sair':
             break
-        
-        response = AgentePrincipal.print_response(user_input)
\ No newline at end of file
+
+        # Janela de histórico limitada pelo orçamento de tokens
+        AgentePrincipal.num_history_runs = manutencao.history_runs_for(AgentePrincipal.session_id, HISTORY_TOKEN_BUDGET)
+        # "/debug <pergunta>" liga debug e chamadas de ferramentas só nesta requisição
+        time_da_requisicao = AgentePrincipal
+        if user_input.startswith('/debug '):
+            user_input = user_input[len('/debug '):]
+            time_da_requisicao = AgentePrincipal.with_options(debug_mode=True, show_tool_calls=True)
+        response = time_da_requisicao.print_response(user_input)
\ No newline at end of file
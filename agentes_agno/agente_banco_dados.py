@@ -3,9 +3,9 @@ load_dotenv()
 import os
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
-from agno.tools.postgres import PostgresTools
-from agno.tools.visualization import VisualizationTools
 from textwrap import dedent
+from agentes_agno.postgres_pool import PostgresPoolTools
+from agentes_agno.chart_service import CachedVisualizationTools
 
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
@@ -18,7 +18,8 @@ DATABASE_NAME = os.getenv('DATABASE_NAME')
 DATABASE_USER = os.getenv('DATABASE_USER')
 DATABASE_PASSWORD = os.getenv('DATABASE_PASSWORD')
 
-postgres_tools = PostgresTools(
+# Pool de conexões compartilhado pelas chamadas de ferramenta, com limites de resultado
+postgres_tools = PostgresPoolTools(
     host=DATABASE_HOST,
     port=DATABASE_PORT,
     db_name=DATABASE_NAME,
@@ -26,16 +27,7 @@ postgres_tools = PostgresTools(
     password=DATABASE_PASSWORD
 )
 
-AgenteBancoDados = Agent(
-    name='Agente de Banco de Dados',
-    model=OpenAIChat(id='gpt-4o-mini', api_key=OPENAI_API_KEY),
-    tools=[postgres_tools,VisualizationTools(output_dir="my_charts")],
-    show_tool_calls=True,
-    add_datetime_to_instructions=True,
-    memory=True,
-    role="Agente de banco de dados",
-    add_name_to_instructions=True,
-    instructions=dedent('''
+INSTRUCOES_BANCO = dedent('''
     Você é um agente de banco de dados.
     Use as ferramentas SQL e Postgres para buscar informações.
     Seja bem-vindo ao agente de banco de dados.
@@ -46,5 +38,23 @@ AgenteBancoDados = Agent(
     Seja sempre útil e forneça informações precisas.
     Insights sobre as consultas SQL e Postgres.
     Use as ferramentas de visualização para criar gráficos referente as consultas.
-    '''),
+    ''')
+
+
+def instrucoes_banco():
+    """Instruções fixas + catálogo compacto do schema (recarregado só quando o schema muda)"""
+    catalogo = postgres_tools.schema_instructions()
+    return [INSTRUCOES_BANCO, catalogo] if catalogo else [INSTRUCOES_BANCO]
+
+
+AgenteBancoDados = Agent(
+    name='Agente de Banco de Dados',
+    model=OpenAIChat(id='gpt-4o-mini', api_key=OPENAI_API_KEY),
+    tools=[postgres_tools, CachedVisualizationTools(output_dir="my_charts")],
+    show_tool_calls=True,
+    add_datetime_to_instructions=True,
+    memory=True,
+    role="Agente de banco de dados",
+    add_name_to_instructions=True,
+    instructions=instrucoes_banco,
     markdown=True)
\ No newline at end of file
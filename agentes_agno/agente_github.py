@@ -4,9 +4,15 @@ import os
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat,OpenAIResponses
 from agno.tools.github import GithubTools
+from agentes_agno.tool_cache import cache_toolkit, enable_github_etags
 from textwrap import dedent
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+GITHUB_BASE_URL = os.getenv('GITHUB_BASE_URL')  # GitHub Enterprise ou servidor local de testes
+
+# Resultados cacheados por ferramenta + requisições condicionais com ETag
+github_tools = cache_toolkit(enable_github_etags(GithubTools(base_url=GITHUB_BASE_URL)))
+
 Agente_GitHub = Agent(
     name='Agente GitHub',
     role='Você é um agente especialista em GitHub que pode executar tarefas usando as ferramentas do GitHub.',
@@ -14,7 +20,7 @@ Agente_GitHub = Agent(
     show_tool_calls=True,
     markdown=True,
     add_datetime_to_instructions=True,
-    tools=[GithubTools()],  # Sem parênteses extras
+    tools=[github_tools],
     debug_mode=True,
     instructions=dedent("""
         1. Quando perguntado sobre repositórios, sempre especifique o owner/repo_name no formato correto
@@ -4,6 +4,7 @@ import os
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools.duckduckgo import DuckDuckGoTools
+from agentes_agno.tool_cache import cache_toolkit
 from textwrap import dedent
 
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
@@ -13,7 +14,7 @@ SMITHERY_API_KEY = os.getenv('SMITHERY_API_KEY')
 Pesquisador = Agent(
     name='Pesquisador',
     model=OpenAIChat(id='gpt-4o-mini', api_key=OPENAI_API_KEY),
-    tools=[DuckDuckGoTools],
+    tools=[cache_toolkit(DuckDuckGoTools())],
     role="Pesquisador de temas em geral baseado na pergunta",
     add_name_to_instructions=True,
     instructions=dedent('''
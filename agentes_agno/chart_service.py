@@ -0,0 +1,427 @@
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from typing import Any, Dict, List, Optional, Union
+
+from agno.tools.visualization import VisualizationTools
+
+logger = logging.getLogger(__name__)
+
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', '2'))
+CHART_DPI = int(os.getenv('CHART_DPI', '300'))
+CHART_FORMAT = os.getenv('CHART_FORMAT', 'auto')  # auto | png | svg
+CHART_SVG_MAX_POINTS = int(os.getenv('CHART_SVG_MAX_POINTS', '20'))
+CHART_MAX_FILES = int(os.getenv('CHART_MAX_FILES', '200'))
+CHART_MAX_BYTES = int(os.getenv('CHART_MAX_BYTES', str(100 * 1024 * 1024)))
+CHART_RENDER_TIMEOUT = float(os.getenv('CHART_RENDER_TIMEOUT', '60'))
+
+_SVG_TYPES = ('bar_chart', 'line_chart', 'pie_chart')
+_KEY_CHARS = 20
+# Só os arquivos gerados por este serviço (tipo_hash.ext) entram no LRU; os demais do diretório ficam intocados
+_ARTIFACT_NAME = re.compile(rf'^(bar_chart|line_chart|pie_chart|scatter_plot|histogram)_[0-9a-f]{{{_KEY_CHARS}}}\.(png|svg)$')
+_PALETTE = ('#4c72b0', '#dd8452', '#55a868', '#c44e52', '#8172b3', '#937860', '#da8bc3', '#8c8c8c', '#ccb974', '#64b5cd')
+
+
+def chart_key(chart_type: str, spec: Dict[str, Any], fmt: str) -> str:
+    """Hash do conteúdo (dados + especificação + formato) usado como nome do arquivo"""
+    payload = json.dumps({'type': chart_type, 'spec': spec, 'format': fmt, 'dpi': CHART_DPI},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:_KEY_CHARS]
+
+
+def render_png(chart_type: str, spec: Dict[str, Any], path: str, dpi: int = CHART_DPI) -> str:
+    """Renderiza com matplotlib. Roda nos processos do pool (pyplot não é thread-safe)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    labels, values = spec.get('labels', []), spec.get('values', [])
+    fig = plt.figure(figsize=(10, 8) if chart_type == 'pie_chart' else (10, 6))
+    try:
+        if chart_type == 'bar_chart':
+            plt.bar(labels, values)
+        elif chart_type == 'line_chart':
+            plt.plot(labels, values, marker='o', linewidth=2, markersize=6)
+            plt.grid(True, alpha=0.3)
+        elif chart_type == 'pie_chart':
+            plt.pie(values, labels=labels, autopct='%1.1f%%', startangle=90)
+            plt.axis('equal')
+        elif chart_type == 'scatter_plot':
+            plt.scatter(spec['x'], spec['y'], alpha=0.7)
+            plt.grid(True, alpha=0.3)
+        elif chart_type == 'histogram':
+            plt.hist(values, bins=spec.get('bins', 10), alpha=0.7, edgecolor='black')
+            plt.grid(True, alpha=0.3)
+        else:
+            raise ValueError(f'Tipo de gráfico não suportado: {chart_type}')
+
+        plt.title(spec.get('title', ''))
+        if chart_type != 'pie_chart':
+            plt.xlabel(spec.get('x_label', ''))
+            plt.ylabel(spec.get('y_label', ''))
+        if chart_type in ('bar_chart', 'line_chart'):
+            plt.xticks(rotation=45, ha='right')
+            plt.tight_layout()
+
+        # Grava em arquivo temporário e renomeia: quem lê nunca vê um PNG pela metade
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        plt.savefig(tmp_path, dpi=dpi, bbox_inches='tight', format='png')
+        os.replace(tmp_path, path)
+    finally:
+        plt.close(fig)
+    return path
+
+
+def render_svg(chart_type: str, spec: Dict[str, Any]) -> str:
+    """SVG escrito à mão para poucos pontos (barras, linha, pizza): sem matplotlib, poucos KB"""
+    width, height, margin = 640, 400, 60
+    labels = [str(label) for label in spec.get('labels', [])]
+    values = [float(v) for v in spec.get('values', [])]
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="11">',
+        f'<rect width="{width}" height="{height}" fill="#fff"/>',
+        f'<text x="{width / 2}" y="24" text-anchor="middle" font-size="16">{escape(spec.get("title", ""))}</text>',
+    ]
+
+    if chart_type == 'pie_chart':
+        total = sum(v for v in values if v > 0) or 1.0
+        cx, cy, r = width / 2 - 80, height / 2 + 10, 140
+        angle = -math.pi / 2
+        for i, (label, value) in enumerate(zip(labels, values)):
+            if value <= 0:
+                continue
+            sweep = 2 * math.pi * value / total
+            x1, y1 = cx + r * math.cos(angle), cy + r * math.sin(angle)
+            x2, y2 = cx + r * math.cos(angle + sweep), cy + r * math.sin(angle + sweep)
+            large = 1 if sweep > math.pi else 0
+            color = _PALETTE[i % len(_PALETTE)]
+            if sweep >= 2 * math.pi - 1e-9:
+                parts.append(f'<circle cx="{cx:.1f}" cy="{cy:.1f}" r="{r}" fill="{color}"/>')
+            else:
+                parts.append(f'<path d="M{cx:.1f},{cy:.1f} L{x1:.1f},{y1:.1f} A{r},{r} 0 {large} 1 {x2:.1f},{y2:.1f} Z" fill="{color}"/>')
+            ly = 60 + i * 18
+            parts.append(f'<rect x="{width - 170}" y="{ly - 10}" width="12" height="12" fill="{color}"/>')
+            parts.append(f'<text x="{width - 152}" y="{ly}">{escape(label)} ({value / total:.1%})</text>')
+            angle += sweep
+    else:
+        plot_w, plot_h = width - 2 * margin, height - 2 * margin
+        top = max(max(values, default=0.0), 0.0)
+        bottom = min(min(values, default=0.0), 0.0)
+        span = (top - bottom) or 1.0
+
+        def y_of(v):
+            return margin + plot_h * (top - v) / span
+
+        parts.append(f'<line x1="{margin}" y1="{y_of(0):.1f}" x2="{width - margin}" y2="{y_of(0):.1f}" stroke="#333"/>')
+        parts.append(f'<line x1="{margin}" y1="{margin}" x2="{margin}" y2="{height - margin}" stroke="#333"/>')
+        for tick in range(5):
+            v = bottom + span * tick / 4
+            parts.append(f'<text x="{margin - 6}" y="{y_of(v) + 4:.1f}" text-anchor="end">{v:.4g}</text>')
+        step = plot_w / max(len(values), 1)
+        points = []
+        for i, (label, value) in enumerate(zip(labels, values)):
+            x = margin + step * i + step / 2
+            if chart_type == 'bar_chart':
+                y0, y1 = sorted((y_of(0), y_of(value)))
+                parts.append(f'<rect x="{x - step * 0.35:.1f}" y="{y0:.1f}" width="{step * 0.7:.1f}" height="{y1 - y0:.1f}" fill="{_PALETTE[0]}"/>')
+            else:
+                points.append(f'{x:.1f},{y_of(value):.1f}')
+                parts.append(f'<circle cx="{x:.1f}" cy="{y_of(value):.1f}" r="3" fill="{_PALETTE[0]}"/>')
+            parts.append(f'<text x="{x:.1f}" y="{height - margin + 14}" text-anchor="end" transform="rotate(-45 {x:.1f} {height - margin + 14})">{escape(label)}</text>')
+        if points:
+            parts.append(f'<polyline points="{" ".join(points)}" fill="none" stroke="{_PALETTE[0]}" stroke-width="2"/>')
+        parts.append(f'<text x="{width / 2}" y="{height - 6}" text-anchor="middle">{escape(spec.get("x_label", ""))}</text>')
+        parts.append(f'<text x="14" y="{height / 2}" text-anchor="middle" transform="rotate(-90 14 {height / 2})">{escape(spec.get("y_label", ""))}</text>')
+
+    parts.append('</svg>')
+    return "\n".join(parts)
+
+
+class ChartRenderService:
+    """
+    Renderiza gráficos fora da thread do agente, endereçando os arquivos pelo
+    conteúdo: o mesmo gráfico (dados + especificação) é servido do disco sem
+    ser renderizado de novo. Artefatos antigos são removidos por LRU
+    (mtime, atualizado a cada acerto) quando passam de `max_files`/`max_bytes`.
+    """
+
+    def __init__(self, output_dir='my_charts', workers=CHART_WORKERS, max_files=CHART_MAX_FILES,
+                 max_bytes=CHART_MAX_BYTES):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.renders = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Any] = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: fork de um processo com threads (Django/agno) pode herdar locks travados
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def choose_format(self, chart_type: str, points: int) -> str:
+        if CHART_FORMAT == 'png' or chart_type not in _SVG_TYPES:
+            return 'png'
+        if CHART_FORMAT == 'svg' or points <= CHART_SVG_MAX_POINTS:
+            return 'svg'
+        return 'png'
+
+    def render(self, chart_type: str, spec: Dict[str, Any], points: int):
+        """Retorna (caminho, veio_do_cache)"""
+        fmt = self.choose_format(chart_type, points)
+        key = chart_key(chart_type, spec, fmt)
+        path = os.path.join(self.output_dir, f"{chart_type}_{key}.{fmt}")
+
+        if os.path.exists(path):
+            os.utime(path)
+            with self._lock:
+                self.hits += 1
+            return path, True
+
+        if fmt == 'svg':
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(render_svg(chart_type, spec))
+            os.replace(tmp_path, path)
+        else:
+            executor = self._pool()
+            # Pedidos idênticos simultâneos esperam a mesma renderização
+            with self._lock:
+                future = self._pending.get(path)
+                if future is None:
+                    future = executor.submit(render_png, chart_type, spec, path, CHART_DPI)
+                    self._pending[path] = future
+            try:
+                future.result(timeout=CHART_RENDER_TIMEOUT)
+            finally:
+                with self._lock:
+                    self._pending.pop(path, None)
+
+        with self._lock:
+            self.renders += 1
+        self.evict()
+        return path, False
+
+    def evict(self):
+        """Remove os gráficos gerados pelo serviço menos usados recentemente acima dos limites"""
+        entries = []
+        for entry in os.scandir(self.output_dir):
+            if entry.is_file() and _ARTIFACT_NAME.match(entry.name):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        if len(entries) <= self.max_files and total <= self.max_bytes:
+            return
+        entries.sort()
+        while entries and (len(entries) > self.max_files or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+class CachedVisualizationTools(VisualizationTools):
+    """
+    VisualizationTools com renderização em pool de processos e cache por
+    conteúdo. O parâmetro `filename` é ignorado: o nome do arquivo é o hash
+    dos dados e da especificação do gráfico.
+    """
+
+    def __init__(self, output_dir: str = 'my_charts', **kwargs):
+        super().__init__(output_dir=output_dir, **kwargs)
+        self.service = ChartRenderService(output_dir)
+
+    def _result(self, chart_type, title, spec, points, **extra) -> str:
+        try:
+            path, cached = self.service.render(chart_type, spec, points)
+            return json.dumps({
+                'chart_type': chart_type,
+                'title': title,
+                'file_path': path,
+                'data_points': points,
+                'cached': cached,
+                'status': 'success',
+                **extra,
+            })
+        except Exception as e:
+            logger.error(f"Erro ao criar {chart_type}: {e}")
+            return json.dumps({'chart_type': chart_type, 'error': str(e), 'status': 'error'})
+
+    def _labels_values(self, data):
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except json.JSONDecodeError:
+                pass
+        normalized = self._normalize_data_for_charts(data)
+        return list(normalized.keys()), list(normalized.values())
+
+    def create_bar_chart(
+        self,
+        data: Union[Dict[str, Union[int, float]], List[Dict[str, Any]], str],
+        title: str = "Bar Chart",
+        x_label: str = "Categories",
+        y_label: str = "Values",
+        filename: Optional[str] = None,
+    ) -> str:
+        """
+        Create a bar chart from the provided data.
+
+        Args:
+            data: Dictionary with categories as keys and values as numbers,
+                  or list of dictionaries, or JSON string
+            title (str): Title of the chart
+            x_label (str): Label for x-axis
+            y_label (str): Label for y-axis
+            filename (Optional[str]): Ignored; charts are named by content hash
+
+        Returns:
+            str: JSON string with chart information and file path
+        """
+        labels, values = self._labels_values(data)
+        spec = {'labels': labels, 'values': values, 'title': title, 'x_label': x_label, 'y_label': y_label}
+        return self._result('bar_chart', title, spec, len(labels))
+
+    def create_line_chart(
+        self,
+        data: Union[Dict[str, Union[int, float]], List[Dict[str, Any]], str],
+        title: str = "Line Chart",
+        x_label: str = "X-axis",
+        y_label: str = "Y-axis",
+        filename: Optional[str] = None,
+    ) -> str:
+        """
+        Create a line chart from the provided data.
+
+        Args:
+            data: Dictionary with x-values as keys and y-values as numbers,
+                  or list of dictionaries, or JSON string
+            title (str): Title of the chart
+            x_label (str): Label for x-axis
+            y_label (str): Label for y-axis
+            filename (Optional[str]): Ignored; charts are named by content hash
+
+        Returns:
+            str: JSON string with chart information and file path
+        """
+        labels, values = self._labels_values(data)
+        spec = {'labels': labels, 'values': values, 'title': title, 'x_label': x_label, 'y_label': y_label}
+        return self._result('line_chart', title, spec, len(labels))
+
+    def create_pie_chart(
+        self,
+        data: Union[Dict[str, Union[int, float]], List[Dict[str, Any]], str],
+        title: str = "Pie Chart",
+        filename: Optional[str] = None,
+    ) -> str:
+        """
+        Create a pie chart from the provided data.
+
+        Args:
+            data: Dictionary with categories as keys and values as numbers,
+                  or list of dictionaries, or JSON string
+            title (str): Title of the chart
+            filename (Optional[str]): Ignored; charts are named by content hash
+
+        Returns:
+            str: JSON string with chart information and file path
+        """
+        labels, values = self._labels_values(data)
+        spec = {'labels': labels, 'values': values, 'title': title}
+        return self._result('pie_chart', title, spec, len(labels))
+
+    def create_scatter_plot(
+        self,
+        x_data: Optional[List[Union[int, float]]] = None,
+        y_data: Optional[List[Union[int, float]]] = None,
+        title: str = "Scatter Plot",
+        x_label: str = "X-axis",
+        y_label: str = "Y-axis",
+        filename: Optional[str] = None,
+        x: Optional[List[Union[int, float]]] = None,
+        y: Optional[List[Union[int, float]]] = None,
+        data: Optional[Union[List[List[Union[int, float]]], Dict[str, List[Union[int, float]]]]] = None,
+    ) -> str:
+        """
+        Create a scatter plot from the provided data.
+
+        Args:
+            x_data: List of x-values (can also use 'x' parameter)
+            y_data: List of y-values (can also use 'y' parameter)
+            title (str): Title of the chart
+            x_label (str): Label for x-axis
+            y_label (str): Label for y-axis
+            filename (Optional[str]): Ignored; charts are named by content hash
+            data: Alternative format - list of [x,y] pairs or dict with 'x' and 'y' keys
+
+        Returns:
+            str: JSON string with chart information and file path
+        """
+        xs = x_data if x_data is not None else x
+        ys = y_data if y_data is not None else y
+        if (xs is None or ys is None) and data is not None:
+            if isinstance(data, dict):
+                xs, ys = data.get('x', []), data.get('y', [])
+            else:
+                xs = [pair[0] for pair in data if len(pair) >= 2]
+                ys = [pair[1] for pair in data if len(pair) >= 2]
+        if not xs or not ys or len(xs) != len(ys):
+            return json.dumps({'chart_type': 'scatter_plot', 'error': 'x e y devem ter o mesmo tamanho', 'status': 'error'})
+        spec = {'x': [float(v) for v in xs], 'y': [float(v) for v in ys], 'title': title, 'x_label': x_label, 'y_label': y_label}
+        return self._result('scatter_plot', title, spec, len(xs))
+
+    def create_histogram(
+        self,
+        data: List[Union[int, float]],
+        bins: int = 10,
+        title: str = "Histogram",
+        x_label: str = "Values",
+        y_label: str = "Frequency",
+        filename: Optional[str] = None,
+    ) -> str:
+        """
+        Create a histogram from the provided data.
+
+        Args:
+            data: List of numeric values to plot
+            bins (int): Number of bins for the histogram
+            title (str): Title of the chart
+            x_label (str): Label for x-axis
+            y_label (str): Label for y-axis
+            filename (Optional[str]): Ignored; charts are named by content hash
+
+        Returns:
+            str: JSON string with chart information and file path
+        """
+        values = []
+        for value in data if isinstance(data, list) else []:
+            try:
+                values.append(float(value))
+            except (ValueError, TypeError):
+                continue
+        if not values:
+            return json.dumps({'chart_type': 'histogram', 'error': 'No valid numeric data found', 'status': 'error'})
+        spec = {'values': values, 'bins': bins, 'title': title, 'x_label': x_label, 'y_label': y_label}
+        return self._result('histogram', title, spec, len(values), bins=bins)
@@ -0,0 +1,243 @@
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Union, cast
+
+from agno.agent import Agent
+from agno.media import Audio, File, Image, Video
+from agno.memory.team import TeamMemory
+from agno.memory.v2.memory import Memory
+from agno.run.response import RunResponseContentEvent
+from agno.run.team import TeamRunResponse
+from agno.team.team import Team
+from agno.tools.function import Function
+from agno.utils.log import use_agent_logger, use_team_logger
+from agno.utils.response import check_if_run_cancelled
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+TEAM_PARALLEL_MEMBERS = os.getenv('TEAM_PARALLEL_MEMBERS', '1') == '1'
+TEAM_MEMBER_TIMEOUT = float(os.getenv('TEAM_MEMBER_TIMEOUT', '90'))
+TEAM_MEMBER_WORKERS = int(os.getenv('TEAM_MEMBER_WORKERS', '0'))  # 0 = um por membro
+
+
+def member_output(member: Union[Agent, Team], response) -> str:
+    """Mesmo formato de saída que o Team usa para as respostas dos membros"""
+    if response is None:
+        return f"Agent {member.name}: No response from the member agent."
+    content = response.content
+    if content is None and not response.tools:
+        return f"Agent {member.name}: No response from the member agent."
+    if isinstance(content, str):
+        if content.strip():
+            return f"Agent {member.name}: {content}"
+        if response.tools:
+            return f"Agent {member.name}: {','.join(str(tool.result) for tool in response.tools)}"
+        return f"Agent {member.name}: No response from the member agent."
+    if isinstance(content, BaseModel):
+        return f"Agent {member.name}: {content.model_dump_json(indent=2)}"
+    return f"Agent {member.name}: {json.dumps(content, indent=2, default=str)}"
+
+
+class ParallelTeam(Team):
+    """
+    Team em modo 'collaborate' que despacha a tarefa para os membros em paralelo.
+
+    Cada membro roda em uma thread com prazo próprio (`member_timeouts`, por nome,
+    ou `member_timeout`). As respostas são entregues na ordem em que terminam;
+    um membro que estoura o prazo é reportado e ignorado nesta execução (e na
+    próxima, enquanto a execução anterior não terminar).
+    """
+
+    def __init__(self, *args, parallel_members: bool = TEAM_PARALLEL_MEMBERS,
+                 member_timeout: float = TEAM_MEMBER_TIMEOUT,
+                 member_timeouts: Optional[Dict[str, float]] = None,
+                 max_member_workers: int = TEAM_MEMBER_WORKERS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.parallel_members = parallel_members
+        self.member_timeout = member_timeout
+        self.member_timeouts = member_timeouts or {}
+        self.max_member_workers = max_member_workers or max(1, len(self.members))
+        self._member_executor: Optional[ThreadPoolExecutor] = None
+        self._busy_members = set()
+        self._busy_lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._member_executor is None:
+            self._member_executor = ThreadPoolExecutor(max_workers=self.max_member_workers, thread_name_prefix='team-member')
+        return self._member_executor
+
+    def _deadline_for(self, member) -> float:
+        return self.member_timeouts.get(member.name, self.member_timeout)
+
+    def with_options(self, debug_mode: Optional[bool] = None, show_tool_calls: Optional[bool] = None) -> 'ParallelTeam':
+        """
+        Cópia rasa do time e dos membros com debug_mode/show_tool_calls próprios, para uma execução.
+        O time original não muda; memória, storage, modelos e o pool de threads continuam
+        compartilhados. `None` mantém a configuração atual.
+        """
+        if debug_mode is None and show_tool_calls is None:
+            return self
+        # O pool é criado antes da cópia para ser o mesmo em todas as execuções
+        self._executor()
+        team = copy.copy(self)
+        team.members = [copy.copy(member) for member in self.members]
+        for target in [team] + team.members:
+            if debug_mode is not None:
+                target.debug_mode = debug_mode
+            if show_tool_calls is not None:
+                target.show_tool_calls = show_tool_calls
+        return team
+
+    def get_run_member_agents_function(
+        self,
+        session_id: str,
+        user_id: Optional[str] = None,
+        stream: bool = False,
+        stream_intermediate_steps: bool = False,
+        async_mode: bool = False,
+        images: Optional[List[Image]] = None,
+        videos: Optional[List[Video]] = None,
+        audio: Optional[List[Audio]] = None,
+        files: Optional[List[File]] = None,
+    ) -> Function:
+        # O modo assíncrono do agno já executa os membros em paralelo
+        if async_mode or not self.parallel_members:
+            return super().get_run_member_agents_function(
+                session_id=session_id, user_id=user_id, stream=stream,
+                stream_intermediate_steps=stream_intermediate_steps, async_mode=async_mode,
+                images=images, videos=videos, audio=audio, files=files,
+            )
+
+        images, videos, audio, files = images or [], videos or [], audio or [], files or []
+
+        def run_member_agents(task_description: str, expected_output: Optional[str] = None) -> Iterator[Union[RunResponseContentEvent, str]]:
+            """
+            Send the same task to all the member agents and return the responses.
+
+            Args:
+                task_description (str): The task description to send to the member agents.
+                expected_output (str, optional): The expected output from the member agents.
+
+            Returns:
+                str: The responses from the member agents.
+            """
+            use_agent_logger()
+            team_context_str, team_member_interactions_str = self._determine_team_context(session_id, images, videos, audio)
+
+            pending = {}
+            for index, member in enumerate(self.members):
+                # Pelo nome: as cópias de `with_options` compartilham o controle de ocupados
+                with self._busy_lock:
+                    busy = member.name in self._busy_members
+                    self._busy_members.add(member.name)
+                if busy:
+                    yield f"Agent {member.name}: Error - ainda ocupado com uma execução anterior que estourou o prazo."
+                    continue
+
+                self._initialize_member(member, session_id=session_id)
+                member_task = self._format_member_agent_task(
+                    task_description,
+                    None if member.expected_output is not None else expected_output,
+                    team_context_str,
+                    team_member_interactions_str,
+                )
+                future = self._executor().submit(self._run_member, member, member_task, session_id, user_id, images, videos, audio, files)
+                pending[future] = (index, member, time.monotonic() + self._deadline_for(member))
+
+            try:
+                while pending:
+                    next_deadline = min(deadline for _, _, deadline in pending.values())
+                    done, _ = wait(list(pending), timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        index, member, _ = pending.pop(future)
+                        try:
+                            response = future.result()
+                        except Exception as e:
+                            self._release_member(member)
+                            logger.error(f"Membro '{member.name}' falhou: {e}")
+                            yield f"Agent {member.name}: Error - {e}"
+                            continue
+                        if response is not None and response.is_cancelled:
+                            self._release_member(member)
+                            check_if_run_cancelled(response)
+                        output = member_output(member, response)
+                        self._register_member_run(member, index, task_description, session_id)
+                        if stream:
+                            yield RunResponseContentEvent(
+                                content=output + "\n",
+                                agent_id=getattr(member, 'agent_id', None),
+                                agent_name=member.name,
+                                run_id=response.run_id if response is not None else None,
+                                session_id=session_id,
+                            )
+                        else:
+                            yield output
+
+                    now = time.monotonic()
+                    for future, (index, member, deadline) in list(pending.items()):
+                        if deadline <= now:
+                            pending.pop(future)
+                            # A thread continua até o fim; o membro fica ocupado até lá
+                            future.add_done_callback(lambda _, member=member: self._release_member(member))
+                            logger.warning(f"Membro '{member.name}' excedeu o prazo de {self._deadline_for(member)}s.")
+                            yield f"Agent {member.name}: Error - tempo limite de {self._deadline_for(member):g}s excedido."
+            finally:
+                # Execução cancelada ou interrompida: quem ainda roda libera o membro ao terminar
+                for future, (_, member, _) in pending.items():
+                    future.add_done_callback(lambda _, member=member: self._release_member(member))
+
+            use_team_logger()
+
+        return Function.from_callable(run_member_agents, name="run_member_agents", strict=True)
+
+    @staticmethod
+    def _run_member(member, member_task, session_id, user_id, images, videos, audio, files):
+        return member.run(
+            member_task,
+            user_id=user_id,
+            # Todos os membros usam o mesmo session_id do time
+            session_id=session_id,
+            images=images,
+            videos=videos,
+            audio=audio,
+            files=files,
+            stream=False,
+        )
+
+    def _release_member(self, member):
+        with self._busy_lock:
+            self._busy_members.discard(member.name)
+
+    def _register_member_run(self, member, index, task_description, session_id):
+        """Atualiza contexto, run_response e estados do time com a execução do membro (thread do time)"""
+        self._release_member(member)
+        member_name = member.name if member.name else f"agent_{index}"
+        if isinstance(self.memory, TeamMemory):
+            self.memory.add_interaction_to_team_context(
+                member_name=member_name, task=task_description, run_response=member.run_response
+            )
+        else:
+            self.memory = cast(Memory, self.memory)
+            self.memory.add_interaction_to_team_context(
+                session_id=session_id,
+                member_name=member_name,
+                task=task_description,
+                run_response=member.run_response,
+            )
+        self.run_response = cast(TeamRunResponse, self.run_response)
+        self.run_response.add_member_run(member.run_response)
+        self._update_team_session_state(member)
+        self._update_workflow_session_state(member)
+        self._update_team_media(member.run_response)
+
+    def shutdown(self):
+        if self._member_executor is not None:
+            self._member_executor.shutdown(wait=False, cancel_futures=True)
+            self._member_executor = None
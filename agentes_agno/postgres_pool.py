@@ -0,0 +1,351 @@
+import json
+import os
+import re
+import threading
+from textwrap import dedent
+from typing import Any, Dict, List, Optional
+
+import sqlparse
+from agno.tools import Toolkit
+from agno.utils.log import log_debug, log_error
+
+from agentes_agno.schema_cache import QueryResultCache, SchemaCatalog
+
+# Configurações do pool e dos limites de resultado (sobrescritas pelo .env)
+POOL_MIN_SIZE = int(os.getenv('DATABASE_POOL_MIN', '1'))
+POOL_MAX_SIZE = int(os.getenv('DATABASE_POOL_MAX', '5'))
+POOL_TIMEOUT = float(os.getenv('DATABASE_POOL_TIMEOUT', '10'))
+STATEMENT_TIMEOUT_MS = int(os.getenv('DATABASE_STATEMENT_TIMEOUT_MS', '15000'))
+MAX_ROWS = int(os.getenv('DATABASE_MAX_ROWS', '50'))
+MAX_BYTES = int(os.getenv('DATABASE_MAX_BYTES', '16000'))
+SCAN_ROWS = int(os.getenv('DATABASE_SCAN_ROWS', '5000'))
+FETCH_SIZE = 500
+
+# Consultas que podem ir para um cursor do lado do servidor e receber LIMIT automático
+_WRAPPABLE = re.compile(r'^\s*(select|with|values|table)\b', re.IGNORECASE)
+
+
+def prepare_query(query: str, limit: int):
+    """
+    Remove comentários e `;` final e, quando é uma leitura simples, envolve a
+    consulta em um SELECT com LIMIT. Retorna (sql, pode_usar_cursor_servidor).
+    """
+    # O sqlparse respeita literais: '--' ou ';' dentro de uma string não são comentário nem separador
+    sql = sqlparse.format(query, strip_comments=True).strip().rstrip(';').strip()
+    if len(sqlparse.split(sql)) > 1 or not _WRAPPABLE.match(sql):
+        return sql, False
+    return f"SELECT * FROM ({sql}) AS _consulta LIMIT {int(limit)}", True
+
+
+class ColumnSummary:
+    """Estatísticas incrementais de uma coluna, calculadas enquanto as linhas passam"""
+
+    __slots__ = ('name', 'count', 'nulls', 'minimum', 'maximum', 'total', 'numeric', 'distinct')
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.numeric = True
+        self.distinct = {}
+
+    def add(self, value):
+        self.count += 1
+        if value is None:
+            self.nulls += 1
+            return
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            self.numeric = False
+            # Só guarda as frequências enquanto a cardinalidade é baixa
+            if self.distinct is not None:
+                key = str(value)[:60]
+                self.distinct[key] = self.distinct.get(key, 0) + 1
+                if len(self.distinct) > 50:
+                    self.distinct = None
+        else:
+            self.total += value
+        try:
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+        except TypeError:
+            pass
+
+    def describe(self) -> str:
+        parts = [f"{self.name}: {self.count - self.nulls} valores, {self.nulls} nulos"]
+        if self.numeric and self.count > self.nulls:
+            avg = self.total / (self.count - self.nulls)
+            parts.append(f"min={self.minimum} max={self.maximum} média={avg:.4g}")
+        elif self.minimum is not None:
+            parts.append(f"min={str(self.minimum)[:40]} max={str(self.maximum)[:40]}")
+        if not self.numeric and self.distinct:
+            top = sorted(self.distinct.items(), key=lambda kv: -kv[1])[:5]
+            parts.append("mais frequentes: " + ", ".join(f"{k} ({v})" for k, v in top))
+        elif not self.numeric and self.distinct is None:
+            parts.append("mais de 50 valores distintos")
+        return "; ".join(parts)
+
+
+def _format_row(values) -> str:
+    return ",".join("" if v is None else str(v) for v in values)
+
+
+def stream_capped(cursor, max_rows=MAX_ROWS, max_bytes=MAX_BYTES, scan_rows=SCAN_ROWS,
+                  fetch_size=FETCH_SIZE) -> str:
+    """
+    Lê um cursor DB-API em blocos (`fetchmany`) e monta o texto entregue ao modelo.
+
+    No máximo `max_rows` linhas / `max_bytes` bytes vão literalmente para a
+    resposta; o restante, até `scan_rows`, só alimenta um resumo por coluna.
+    Funciona com qualquer cursor DB-API (psycopg, sqlite3...).
+    """
+    if cursor.description is None:
+        return getattr(cursor, 'statusmessage', None) or "Query executed successfully with no output."
+
+    columns = [desc[0] for desc in cursor.description]
+    summaries = [ColumnSummary(c) for c in columns]
+    header = ",".join(columns)
+    lines: List[str] = []
+    used_bytes = len(header.encode('utf-8'))
+    scanned = 0
+    shown_limit_reason = None
+    exhausted = False
+
+    while scanned < scan_rows:
+        batch = cursor.fetchmany(min(fetch_size, scan_rows - scanned))
+        if not batch:
+            exhausted = True
+            break
+        for row in batch:
+            values = list(row.values()) if isinstance(row, dict) else list(row)
+            scanned += 1
+            for summary, value in zip(summaries, values):
+                summary.add(value)
+            if shown_limit_reason is None:
+                line = _format_row(values)
+                # Limite em bytes UTF-8: acentos e emojis contam mais de um
+                line_bytes = len(line.encode('utf-8')) + 1
+                if len(lines) >= max_rows:
+                    shown_limit_reason = f"limite de {max_rows} linhas"
+                elif used_bytes + line_bytes > max_bytes:
+                    shown_limit_reason = f"limite de {max_bytes} bytes"
+                else:
+                    lines.append(line)
+                    used_bytes += line_bytes
+    if not exhausted and scanned >= scan_rows and not cursor.fetchmany(1):
+        exhausted = True
+
+    if scanned == 0:
+        return f"Query returned no results.\nColumns: {', '.join(columns)}"
+
+    result = f"{header}\n" + "\n".join(lines)
+    if shown_limit_reason is None and exhausted:
+        return result
+
+    total = f"{scanned}" if exhausted else f"mais de {scanned}"
+    summary_lines = "\n".join(f"- {s.describe()}" for s in summaries)
+    return (
+        f"{result}\n\n"
+        f"[Resultado truncado: {len(lines)} de {total} linhas exibidas ({shown_limit_reason or f'varredura limitada a {scan_rows} linhas'}).]\n"
+        f"Resumo das linhas lidas:\n{summary_lines}\n"
+        f"Use agregações (COUNT, SUM, GROUP BY) ou filtros para refinar a consulta."
+    )
+
+
+class PostgresPoolTools(Toolkit):
+    """
+    Substituto do PostgresTools do agno com pool de conexões, timeout por
+    instrução, cursor do lado do servidor e limites de linhas/bytes no
+    resultado entregue ao modelo. As conexões são somente leitura.
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[str] = None,
+        db_name: Optional[str] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        table_schema: str = 'public',
+        min_size: int = POOL_MIN_SIZE,
+        max_size: int = POOL_MAX_SIZE,
+        statement_timeout_ms: int = STATEMENT_TIMEOUT_MS,
+        max_rows: int = MAX_ROWS,
+        max_bytes: int = MAX_BYTES,
+        scan_rows: int = SCAN_ROWS,
+        **kwargs,
+    ):
+        self.table_schema = table_schema
+        self.statement_timeout_ms = statement_timeout_ms
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.scan_rows = scan_rows
+        self._conninfo: Dict[str, Any] = {
+            k: v for k, v in {
+                'host': host, 'port': port, 'dbname': db_name, 'user': user, 'password': password,
+            }.items() if v
+        }
+        # Timeout e schema valem para a sessão inteira de cada conexão do pool
+        self._conninfo['options'] = f"-c statement_timeout={int(statement_timeout_ms)} -c search_path={table_schema}"
+        self._min_size = min_size
+        self._max_size = max_size
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Schema introspectado uma vez (versionado por fingerprint) e cache de leituras repetidas
+        self.catalog = SchemaCatalog(self._fetch_rows, table_schema)
+        self.query_cache = QueryResultCache()
+
+        super().__init__(
+            name='postgres_tools',
+            tools=[self.show_tables, self.describe_table, self.run_query, self.inspect_query],
+            **kwargs,
+        )
+
+    def _configure_connection(self, conn):
+        """Executado uma vez por conexão nova do pool"""
+        conn.read_only = True
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            # Chamadas de ferramenta concorrentes não podem abrir dois pools
+            with self._pool_lock:
+                if self._pool is None:
+                    from psycopg_pool import ConnectionPool
+
+                    log_debug(f"Abrindo pool PostgreSQL (min={self._min_size}, max={self._max_size}).")
+                    self._pool = ConnectionPool(
+                        kwargs=self._conninfo,
+                        min_size=self._min_size,
+                        max_size=self._max_size,
+                        timeout=POOL_TIMEOUT,
+                        configure=self._configure_connection,
+                        open=True,
+                    )
+        return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+    def _fetch_rows(self, sql: str, params: Optional[tuple] = None) -> list:
+        """Consulta interna (catálogo/fingerprint), sem limites de resultado"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+
+    def _fingerprint(self) -> Optional[str]:
+        try:
+            return self.catalog.refresh() or None
+        except Exception as e:
+            log_error(f"Falha ao verificar o fingerprint do schema: {e}")
+            return None
+
+    def schema_instructions(self) -> str:
+        """Trecho de instruções com o catálogo compacto do schema"""
+        compact = self.catalog.compact()
+        if not compact:
+            return ''
+        return (
+            f"Schema '{self.table_schema}' (tabela(coluna tipo), ? = anulável). "
+            "Use-o diretamente ao escrever SQL; só chame show_tables/describe_table se algo não estiver aqui:\n"
+            f"{compact}"
+        )
+
+    def _execute(self, query: str, params: Optional[tuple] = None, capped: bool = True) -> str:
+        import psycopg
+
+        try:
+            with self.pool.connection() as conn:
+                if not capped:
+                    with conn.cursor() as cursor:
+                        cursor.execute(query, params)
+                        return stream_capped(cursor, self.max_rows, self.max_bytes, self.scan_rows)
+
+                sql, server_side = prepare_query(query, self.scan_rows + 1)
+                log_debug(f"Running PostgreSQL Query: {sql}")
+                # Cursor nomeado: as linhas vêm do servidor em blocos, sem materializar tudo no cliente
+                cursor = conn.cursor(name='agente_consulta') if server_side else conn.cursor()
+                with cursor:
+                    cursor.execute(sql, params)
+                    return stream_capped(cursor, self.max_rows, self.max_bytes, self.scan_rows)
+        except psycopg.errors.QueryCanceled:
+            return f"Error executing query: tempo limite de {self.statement_timeout_ms} ms excedido. Refine a consulta."
+        except psycopg.Error as e:
+            log_error(f"Database error: {e}")
+            return f"Error executing query: {e}"
+        except Exception as e:
+            log_error(f"An unexpected error occurred: {e}")
+            return f"An unexpected error occurred: {e}"
+
+    def show_tables(self) -> str:
+        """Lists all tables in the configured schema."""
+        if self._fingerprint() is not None and self.catalog.tables:
+            return "table_name\n" + "\n".join(sorted(self.catalog.tables))
+        stmt = "SELECT table_name FROM information_schema.tables WHERE table_schema = %s ORDER BY table_name"
+        return self._execute(stmt, (self.table_schema,), capped=False)
+
+    def describe_table(self, table: str) -> str:
+        """
+        Provides the schema (column name, data type, is nullable) for a given table.
+
+        Args:
+            table: The name of the table to describe.
+
+        Returns:
+            A string describing the table's columns and data types.
+        """
+        if self._fingerprint() is not None and table in self.catalog.tables:
+            rows = [f"{name},{dtype},{'YES' if nullable else 'NO'}" for name, dtype, nullable in self.catalog.tables[table]]
+            return "column_name,data_type,is_nullable\n" + "\n".join(rows)
+        stmt = dedent("""
+            SELECT column_name, data_type, is_nullable
+            FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s
+            ORDER BY ordinal_position
+        """)
+        return self._execute(stmt, (self.table_schema, table), capped=False)
+
+    def inspect_query(self, query: str) -> str:
+        """
+        Shows the execution plan for a SQL query (using EXPLAIN).
+
+        Args:
+            query: The SQL query to inspect.
+
+        Returns:
+            The query's execution plan.
+        """
+        return self._execute(f"EXPLAIN {prepare_query(query, self.scan_rows)[0]}", capped=False)
+
+    def run_query(self, query: str) -> str:
+        """
+        Runs a read-only SQL query and returns the result.
+        Large results are truncated and summarized per column.
+
+        :param query: The SQL query to run.
+        :return: The query result as a formatted string.
+        """
+        fingerprint = self._fingerprint()
+        if fingerprint is not None:
+            cached = self.query_cache.get(fingerprint, query)
+            if cached is not None:
+                log_debug("Resultado servido do cache de consultas.")
+                return cached
+        result = self._execute(query)
+        if fingerprint is not None:
+            self.query_cache.put(fingerprint, query, result)
+        return result
+
+    def pool_stats(self) -> str:
+        """Estatísticas do pool (conexões em uso, espera...)"""
+        if self._pool is None:
+            return json.dumps({'status': 'fechado'})
+        return json.dumps(self._pool.get_stats(), default=str)
@@ -0,0 +1,156 @@
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import sqlparse
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_CHECK_INTERVAL = float(os.getenv('DATABASE_SCHEMA_CHECK_INTERVAL', '60'))
+QUERY_CACHE_TTL = float(os.getenv('DATABASE_QUERY_CACHE_TTL', '120'))
+QUERY_CACHE_SIZE = int(os.getenv('DATABASE_QUERY_CACHE_SIZE', '256'))
+
+# Abreviações de tipos para manter o catálogo curto nas instruções
+_TYPE_ALIASES = {
+    'character varying': 'varchar',
+    'character': 'char',
+    'timestamp without time zone': 'timestamp',
+    'timestamp with time zone': 'timestamptz',
+    'time without time zone': 'time',
+    'double precision': 'float8',
+    'integer': 'int',
+    'boolean': 'bool',
+}
+
+FINGERPRINT_SQL = """
+    SELECT md5(coalesce(string_agg(table_name || '.' || column_name || ':' || data_type || ':' || is_nullable,
+                                   ',' ORDER BY table_name, ordinal_position), ''))
+    FROM information_schema.columns
+    WHERE table_schema = %s
+"""
+
+COLUMNS_SQL = """
+    SELECT table_name, column_name, data_type, is_nullable
+    FROM information_schema.columns
+    WHERE table_schema = %s
+    ORDER BY table_name, ordinal_position
+"""
+
+_READ_ONLY = re.compile(r'^\s*(select|with|values|table|show|explain)\b', re.IGNORECASE)
+# Palavras-chave que alteram dados ou schema mesmo dentro de uma leitura (WITH ... INSERT, SELECT ... INTO)
+_WRITE_KEYWORDS = frozenset({
+    'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'INTO', 'CREATE', 'DROP', 'ALTER', 'TRUNCATE',
+    'GRANT', 'REVOKE', 'COPY', 'CALL', 'LOCK',
+})
+
+
+def normalize_sql(sql: str) -> str:
+    """Forma canônica usada como chave de cache: sem comentários, keywords em maiúsculas, espaços colapsados"""
+    # O sqlparse só mexe nos tokens: literais mantêm caixa e espaços
+    formatted = sqlparse.format(sql, strip_comments=True, keyword_case='upper', strip_whitespace=True)
+    return formatted.strip().rstrip(';').strip()
+
+
+def is_read_only(sql: str) -> bool:
+    """Uma única instrução de leitura, sem escrita embutida (`;` final é aceito)"""
+    statements = [s for s in sqlparse.parse(sql) if s.token_first(skip_cm=True) is not None]
+    if len(statements) != 1 or not _READ_ONLY.match(sqlparse.format(sql, strip_comments=True)):
+        return False
+    return not any(token.is_keyword and token.normalized in _WRITE_KEYWORDS for token in statements[0].flatten())
+
+
+class SchemaCatalog:
+    """
+    Catálogo do schema introspectado uma vez e versionado por fingerprint.
+
+    O fingerprint (md5 das colunas do information_schema) é reconsultado no
+    máximo a cada `check_interval` segundos; o catálogo só é recarregado
+    quando ele muda.
+    """
+
+    def __init__(self, fetch, table_schema='public', check_interval=FINGERPRINT_CHECK_INTERVAL):
+        # fetch(sql, params) -> lista de tuplas
+        self._fetch = fetch
+        self.table_schema = table_schema
+        self.check_interval = check_interval
+        self.fingerprint: Optional[str] = None
+        self.tables: Dict[str, List[Tuple[str, str, bool]]] = {}
+        self._compact = ''
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False) -> str:
+        """Revalida o fingerprint (respeitando o intervalo) e retorna o fingerprint atual"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self.fingerprint
+            # Marca a verificação antes de consultar: com o banco fora do ar, não tenta a cada chamada
+            self._checked_at = now
+            rows = self._fetch(FINGERPRINT_SQL, (self.table_schema,))
+            fingerprint = rows[0][0] if rows else ''
+            if fingerprint != self.fingerprint:
+                self._load()
+                logger.info(f"Catálogo do schema '{self.table_schema}' carregado ({len(self.tables)} tabelas, {fingerprint[:8]}).")
+                self.fingerprint = fingerprint
+            return self.fingerprint
+
+    def _load(self):
+        tables: Dict[str, List[Tuple[str, str, bool]]] = {}
+        for table, column, data_type, nullable in self._fetch(COLUMNS_SQL, (self.table_schema,)):
+            tables.setdefault(table, []).append((column, _TYPE_ALIASES.get(data_type, data_type), nullable == 'YES'))
+        self.tables = tables
+        self._compact = self._render(tables)
+
+    @staticmethod
+    def _render(tables) -> str:
+        lines = []
+        for table in sorted(tables):
+            cols = ", ".join(f"{name} {dtype}{'?' if nullable else ''}" for name, dtype, nullable in tables[table])
+            lines.append(f"{table}({cols})")
+        return "\n".join(lines)
+
+    def compact(self) -> str:
+        """Catálogo no formato `tabela(coluna tipo, coluna tipo?)`; `?` marca coluna anulável"""
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f"Não foi possível atualizar o catálogo do schema: {e}")
+        return self._compact
+
+
+class QueryResultCache:
+    """Cache com TTL de resultados de consultas somente leitura, chaveado por (fingerprint, SQL normalizado)"""
+
+    def __init__(self, ttl=QUERY_CACHE_TTL, maxsize=QUERY_CACHE_SIZE):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl) if ttl > 0 else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fingerprint: str, sql: str):
+        if self._cache is None or not is_read_only(sql):
+            return None
+        key = (fingerprint, normalize_sql(sql))
+        with self._lock:
+            result = self._cache.get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def put(self, fingerprint: str, sql: str, result: str):
+        if self._cache is None or not is_read_only(sql) or result.startswith(('Error', 'An unexpected error')):
+            return
+        with self._lock:
+            self._cache[(fingerprint, normalize_sql(sql))] = result
+
+    def clear(self):
+        if self._cache is not None:
+            with self._lock:
+                self._cache.clear()
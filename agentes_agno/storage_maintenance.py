@@ -0,0 +1,305 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+HISTORY_KEEP_RUNS = int(os.getenv('HISTORY_KEEP_RUNS', '20'))
+HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', '6000'))
+HISTORY_MAX_RUNS = int(os.getenv('HISTORY_MAX_RUNS', '10'))
+VACUUM_INTERVAL_HOURS = float(os.getenv('STORAGE_VACUUM_INTERVAL_HOURS', '24'))
+MAINTENANCE_INTERVAL_MINUTES = float(os.getenv('STORAGE_MAINTENANCE_INTERVAL_MINUTES', '60'))
+
+# Aproximação de tokens sem depender do tokenizer do provedor
+CHARS_PER_TOKEN = 4
+
+
+def _get(obj: Any, key: str, default=None):
+    """Lê um campo tanto de dicts (storage) quanto de objetos (RunResponse em memória)"""
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def _content_text(content) -> str:
+    if content is None:
+        return ''
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, ensure_ascii=False, default=str)
+
+
+def run_history_pair(run):
+    """(entrada do usuário, resposta final): o par que o agno reenvia como histórico"""
+    messages = _get(run, 'messages') or []
+    user_text, assistant_text = '', ''
+    for message in messages:
+        if _get(message, 'role') == 'user' and not _get(message, 'from_history'):
+            user_text = _content_text(_get(message, 'content'))
+            break
+    for message in reversed(messages):
+        if _get(message, 'role') in ('assistant', 'model') and not _get(message, 'from_history'):
+            assistant_text = _content_text(_get(message, 'content'))
+            if assistant_text:
+                break
+    return user_text, assistant_text or _content_text(_get(run, 'content'))
+
+
+def estimate_run_tokens(run) -> int:
+    user_text, assistant_text = run_history_pair(run)
+    return (len(user_text) + len(assistant_text)) // CHARS_PER_TOKEN + 1
+
+
+def history_window(runs: List[Any], budget_tokens: int = HISTORY_TOKEN_BUDGET, max_runs: int = HISTORY_MAX_RUNS) -> int:
+    """
+    Quantas execuções recentes cabem no orçamento de tokens do histórico.
+    Sempre inclui ao menos a última execução, quando existe.
+    """
+    used, count = 0, 0
+    for run in reversed(runs[-max_runs:] if max_runs else runs):
+        cost = estimate_run_tokens(run)
+        if count and used + cost > budget_tokens:
+            break
+        used += cost
+        count += 1
+    return count
+
+
+def compact_run(run: dict) -> dict:
+    """Mantém só o que o histórico usa: par usuário/assistente, conteúdo e metadados"""
+    user_text, assistant_text = run_history_pair(run)
+    compacted = {k: v for k, v in run.items() if k not in ('events', 'messages', 'member_responses', 'formatted_tool_calls', 'tools')}
+    compacted['messages'] = [
+        {'role': 'user', 'content': user_text},
+        {'role': 'assistant', 'content': assistant_text},
+    ]
+    compacted['member_responses'] = [
+        {'content': _content_text(_get(member, 'content'))[:1000], 'agent_id': _get(member, 'agent_id')}
+        for member in (run.get('member_responses') or [])
+    ]
+    return compacted
+
+
+def summarize_runs(runs: List[Any], max_chars: int = 300) -> str:
+    lines = []
+    for run in runs:
+        user_text, assistant_text = run_history_pair(run)
+        created = _get(run, 'created_at')
+        when = datetime.fromtimestamp(created).strftime('%Y-%m-%d') if isinstance(created, (int, float)) else ''
+        lines.append(f"[{when}] Pedido: {user_text[:max_chars]} -> Resposta: {assistant_text[:max_chars]}")
+    return "Resumo de conversas antigas:\n" + "\n".join(lines)
+
+
+class StorageMaintenance:
+    """
+    Manutenção dos bancos SQLite do AgentePrincipal (sessões e memórias).
+
+    - WAL + synchronous=NORMAL e índices para as consultas por usuário/data;
+    - poda das execuções antigas de cada sessão: as `keep_runs` mais recentes
+      ficam (compactadas, exceto a última) e as demais viram uma memória de
+      usuário resumida;
+    - VACUUM periódico;
+    - janela de histórico limitada por orçamento de tokens.
+    """
+
+    def __init__(self, sessions_db: str, sessions_table: str, memory_db: Optional[str] = None,
+                 memory_table: Optional[str] = None, memory=None, user_id: Optional[str] = None,
+                 keep_runs: int = HISTORY_KEEP_RUNS, vacuum_interval_hours: float = VACUUM_INTERVAL_HOURS):
+        self.sessions_db = sessions_db
+        self.sessions_table = sessions_table
+        self.memory_db = memory_db
+        self.memory_table = memory_table
+        self.memory = memory
+        self.user_id = user_id
+        self.keep_runs = keep_runs
+        self.vacuum_interval_hours = vacuum_interval_hours
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def _connect(self, db_file):
+        conn = sqlite3.connect(db_file, timeout=30)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    @staticmethod
+    def _table_exists(conn, table) -> bool:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone() is not None
+
+    def configure(self):
+        """WAL, synchronous=NORMAL e índices (idempotente)"""
+        for db_file, table, indexes in (
+            (self.sessions_db, self.sessions_table, [('updated_at',), ('user_id', 'updated_at')]),
+            (self.memory_db, self.memory_table, [('user_id', 'updated_at')]),
+        ):
+            if not db_file:
+                continue
+            conn = self._connect(db_file)
+            try:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+                if table and self._table_exists(conn, table):
+                    for columns in indexes:
+                        name = f"ix_{table}_{'_'.join(columns)}"
+                        conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({", ".join(columns)})')
+                conn.commit()
+            finally:
+                conn.close()
+
+    def prune_sessions(self) -> int:
+        """Poda e compacta as execuções gravadas. Retorna quantas execuções foram resumidas."""
+        conn = self._connect(self.sessions_db)
+        pruned_total = 0
+        try:
+            if not self._table_exists(conn, self.sessions_table):
+                return 0
+            rows = conn.execute(f'SELECT session_id, user_id, memory FROM "{self.sessions_table}"').fetchall()
+            for session_id, user_id, raw_memory in rows:
+                if not raw_memory:
+                    continue
+                # Uma linha com formato inesperado não pode travar a poda das demais
+                try:
+                    memory = json.loads(raw_memory) if isinstance(raw_memory, str) else raw_memory
+                    runs = memory.get('runs') if isinstance(memory, dict) else None
+                    if isinstance(runs, list):
+                        compacted, pruned = self._prune_runs(runs, user_id)
+                    elif isinstance(runs, dict):
+                        # Sessões de Team gravam Memory.to_dict()['runs']: {session_id: [execuções]}
+                        compacted, pruned = {}, 0
+                        for key, value in runs.items():
+                            if isinstance(value, list):
+                                compacted[key], count = self._prune_runs(value, user_id)
+                                pruned += count
+                            else:
+                                compacted[key] = value
+                    else:
+                        continue
+                    if compacted != runs:
+                        memory['runs'] = compacted
+                        conn.execute(
+                            f'UPDATE "{self.sessions_table}" SET memory = ? WHERE session_id = ?',
+                            (json.dumps(memory, ensure_ascii=False), session_id),
+                        )
+                    pruned_total += pruned
+                except Exception as e:
+                    logger.warning(f"Sessão {session_id} ignorada na poda: {e}")
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._prune_loaded_runs()
+        return pruned_total
+
+    def _prune_runs(self, runs: list, user_id: Optional[str]) -> tuple:
+        """Resume as execuções além de keep_runs e compacta as mantidas. Retorna (execuções, podadas)."""
+        if not runs:
+            return runs, 0
+        old, kept = runs[:-self.keep_runs], runs[-self.keep_runs:]
+        # A última execução fica intacta; as anteriores só precisam do par do histórico
+        compacted = [compact_run(run) for run in kept[:-1]] + kept[-1:]
+        if old:
+            self._remember(summarize_runs(old), user_id or self.user_id)
+        return compacted, len(old)
+
+    def _prune_loaded_runs(self):
+        """Aplica o mesmo limite às execuções já carregadas no objeto Memory do processo"""
+        runs_by_session = getattr(self.memory, 'runs', None)
+        if not isinstance(runs_by_session, dict):
+            return
+        for session_id, runs in runs_by_session.items():
+            if isinstance(runs, list) and len(runs) > self.keep_runs:
+                runs_by_session[session_id] = runs[-self.keep_runs:]
+
+    def _remember(self, text: str, user_id: Optional[str]):
+        if self.memory is None:
+            logger.info("Execuções antigas podadas sem destino de memória configurado.")
+            return
+        from agno.memory.v2.schema import UserMemory
+
+        try:
+            self.memory.add_user_memory(
+                memory=UserMemory(memory=text, topics=['historico_compactado']),
+                user_id=user_id,
+            )
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar o resumo das execuções antigas: {e}")
+
+    def _last_vacuum(self, conn) -> float:
+        conn.execute("CREATE TABLE IF NOT EXISTS _manutencao (chave TEXT PRIMARY KEY, valor TEXT)")
+        row = conn.execute("SELECT valor FROM _manutencao WHERE chave = 'ultimo_vacuum'").fetchone()
+        return float(row[0]) if row else 0.0
+
+    def vacuum_if_due(self, force: bool = False) -> bool:
+        """VACUUM + checkpoint do WAL quando o intervalo configurado venceu"""
+        vacuumed = False
+        for db_file in filter(None, (self.sessions_db, self.memory_db)):
+            conn = self._connect(db_file)
+            try:
+                last = self._last_vacuum(conn)
+                if not force and time.time() - last < self.vacuum_interval_hours * 3600:
+                    continue
+                conn.execute("INSERT OR REPLACE INTO _manutencao (chave, valor) VALUES ('ultimo_vacuum', ?)", (str(time.time()),))
+                conn.commit()
+                conn.execute("VACUUM")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                conn.execute("PRAGMA optimize")
+                vacuumed = True
+                logger.info(f"VACUUM executado em '{db_file}'.")
+            except sqlite3.OperationalError as e:
+                logger.warning(f"VACUUM adiado em '{db_file}': {e}")
+            finally:
+                conn.close()
+        return vacuumed
+
+    def run(self):
+        """Rodada completa de manutenção"""
+        with self._lock:
+            self.configure()
+            pruned = self.prune_sessions()
+            if pruned:
+                logger.info(f"{pruned} execuções antigas resumidas em memória.")
+            self.vacuum_if_due()
+
+    def start_scheduler(self, interval_minutes: float = MAINTENANCE_INTERVAL_MINUTES):
+        """Agenda a manutenção periódica em uma thread daemon"""
+        def tick():
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"Erro na manutenção do storage: {e}")
+            self.start_scheduler(interval_minutes)
+
+        self._timer = threading.Timer(interval_minutes * 60, tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop_scheduler(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def session_runs(self, session_id: str) -> List[Any]:
+        """Execuções da sessão: as carregadas em memória ou, antes da primeira execução, as do banco"""
+        runs_by_session = getattr(self.memory, 'runs', None) or {}
+        if runs_by_session.get(session_id):
+            return runs_by_session[session_id]
+        conn = self._connect(self.sessions_db)
+        try:
+            if not self._table_exists(conn, self.sessions_table):
+                return []
+            row = conn.execute(f'SELECT memory FROM "{self.sessions_table}" WHERE session_id = ?', (session_id,)).fetchone()
+        finally:
+            conn.close()
+        if not row or not row[0]:
+            return []
+        memory = json.loads(row[0]) if isinstance(row[0], str) else row[0]
+        return memory.get('runs') or []
+
+    def history_runs_for(self, session_id: str, budget_tokens: int = HISTORY_TOKEN_BUDGET,
+                         max_runs: int = HISTORY_MAX_RUNS) -> int:
+        """Valor de num_history_runs que mantém o histórico dentro do orçamento"""
+        return max(1, history_window(self.session_runs(session_id), budget_tokens, max_runs))
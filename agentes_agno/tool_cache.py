@@ -0,0 +1,317 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TOOL_CACHE_ENABLED = os.getenv('TOOL_CACHE_ENABLED', '1') == '1'
+TOOL_CACHE_DB = os.getenv('TOOL_CACHE_DB', 'tool_cache.db')
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv('TOOL_CACHE_MAX_ENTRIES', '5000'))
+TOOL_CACHE_MAX_ETAGS = int(os.getenv('TOOL_CACHE_MAX_ETAGS', '2000'))
+
+# TTL (segundos) por ferramenta; só as ferramentas listadas são cacheadas
+DEFAULT_TOOL_TTLS = {
+    'duckduckgo_search': 1800,
+    'duckduckgo_news': 300,
+    'search_repositories': 600,
+    'list_repositories': 600,
+    'get_repository': 300,
+    'get_repository_languages': 3600,
+    'get_repository_stars': 300,
+    'get_repository_with_stats': 300,
+    'list_branches': 300,
+    'get_pull_request': 120,
+    'get_pull_requests': 120,
+    'get_pull_request_count': 120,
+    'get_pull_request_changes': 300,
+    'get_pull_request_comments': 120,
+    'get_pull_request_with_details': 120,
+    'list_issues': 120,
+    'get_issue': 120,
+    'list_issue_comments': 120,
+    'get_file_content': 300,
+    'get_directory_content': 300,
+    'get_branch_content': 300,
+    'search_code': 600,
+    'search_issues_and_prs': 300,
+}
+
+# Ferramentas que alteram dados: invalidam o cache do toolkit após a chamada
+WRITE_TOOL_PREFIXES = (
+    'create_', 'update_', 'delete_', 'merge_', 'edit_', 'close_', 'reopen_', 'assign_',
+    'label_', 'comment_', 'set_', 'add_', 'remove_',
+)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def parse_ttls(value: Optional[str]) -> Dict[str, float]:
+    """`TOOL_CACHE_TTLS='duckduckgo_search=600,get_repository=0'` (0 desliga o cache da ferramenta)"""
+    ttls = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        name, _, ttl = item.partition('=')
+        ttls[name.strip()] = float(ttl)
+    return ttls
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return _WHITESPACE.sub(' ', value).strip()
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def is_error_result(result) -> bool:
+    """Erros devolvidos como resultado: texto 'Error...'/'Erro...' ou JSON {"error": ...} (GithubTools)"""
+    if not isinstance(result, str):
+        return True
+    text = result.lstrip()
+    if text.lower().startswith(('error', 'erro')):
+        return True
+    if text.startswith('{') and '"error"' in text:
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            return False
+        return isinstance(payload, dict) and 'error' in payload
+    return False
+
+
+def cache_key(namespace: str, tool_name: str, func, args, kwargs) -> str:
+    """Chave estável: ferramenta + argumentos normalizados (defaults aplicados, ordem irrelevante)"""
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+    except TypeError:
+        arguments = {'args': list(args), **kwargs}
+    payload = json.dumps(_normalize(arguments), sort_keys=True, ensure_ascii=False, default=str)
+    return f"{namespace}:{tool_name}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+
+class ToolCacheStore:
+    """
+    Armazenamento local (SQLite) dos resultados de ferramentas e das respostas HTTP com ETag.
+    Sobrevive a reinícios do processo; seguro entre threads.
+    """
+
+    def __init__(self, db_file: str = TOOL_CACHE_DB, max_entries: int = TOOL_CACHE_MAX_ENTRIES,
+                 max_etags: int = TOOL_CACHE_MAX_ETAGS):
+        self.db_file = db_file
+        self.max_entries = max_entries
+        self.max_etags = max_etags
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tool_results (
+                key TEXT PRIMARY KEY, namespace TEXT, tool TEXT, result TEXT,
+                expires_at REAL, created_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS ix_tool_results_namespace ON tool_results (namespace);
+            CREATE INDEX IF NOT EXISTS ix_tool_results_expires_at ON tool_results (expires_at);
+            CREATE TABLE IF NOT EXISTS http_etags (
+                key TEXT PRIMARY KEY, url TEXT, etag TEXT, headers TEXT, body BLOB, stored_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS ix_http_etags_stored_at ON http_etags (stored_at);
+        """)
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._etag_writes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT result, expires_at FROM tool_results WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= time.time():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, namespace: str, tool: str, result: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tool_results (key, namespace, tool, result, expires_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, tool, result, now + ttl, now),
+            )
+            self._conn.commit()
+        if (self.hits + self.misses) % 100 == 0:
+            self.purge()
+
+    def invalidate(self, namespace: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_results WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+    def purge(self):
+        """Remove expirados e mantém no máximo `max_entries` resultados e `max_etags` respostas com ETag"""
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_results WHERE expires_at <= ?", (time.time(),))
+            self._conn.execute(
+                "DELETE FROM tool_results WHERE key NOT IN (SELECT key FROM tool_results ORDER BY created_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            # stored_at é renovado a cada revalidação (304): saem as respostas usadas há mais tempo
+            self._conn.execute(
+                "DELETE FROM http_etags WHERE key NOT IN (SELECT key FROM http_etags ORDER BY stored_at DESC LIMIT ?)",
+                (self.max_etags,),
+            )
+            self._conn.commit()
+
+    def get_etag(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT etag, headers, body FROM http_etags WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def touch_etag(self, key: str):
+        with self._lock:
+            self._conn.execute("UPDATE http_etags SET stored_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+    def put_etag(self, key: str, url: str, etag: str, headers: dict, body: bytes):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_etags (key, url, etag, headers, body, stored_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, etag, json.dumps(headers), body, time.time()),
+            )
+            self._conn.commit()
+            self._etag_writes += 1
+            purge = self._etag_writes % 100 == 0
+        if purge:
+            self.purge()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_store: Optional[ToolCacheStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_tool_cache_store() -> ToolCacheStore:
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ToolCacheStore()
+        return _default_store
+
+
+def cache_toolkit(toolkit, ttls: Optional[Dict[str, float]] = None, store: Optional[ToolCacheStore] = None,
+                  namespace: Optional[str] = None):
+    """
+    Envolve as funções de um Toolkit do agno com cache de resultado.
+
+    Só ferramentas com TTL > 0 são cacheadas. As de escrita (WRITE_TOOL_PREFIXES,
+    como update_file) invalidam os resultados cacheados do toolkit; as demais
+    ficam como estão.
+    """
+    if not TOOL_CACHE_ENABLED:
+        return toolkit
+
+    ttls = {**DEFAULT_TOOL_TTLS, **(ttls or {}), **parse_ttls(os.getenv('TOOL_CACHE_TTLS'))}
+    store = store or get_tool_cache_store()
+    namespace = namespace or toolkit.name
+
+    for name, function in toolkit.functions.items():
+        if function.entrypoint is None:
+            continue
+        function.entrypoint = _wrap(function.entrypoint, name, ttls.get(name, 0), store, namespace)
+    return toolkit
+
+
+def is_write_tool(tool_name: str) -> bool:
+    return tool_name.startswith(WRITE_TOOL_PREFIXES)
+
+
+def _wrap(func, tool_name, ttl, store, namespace):
+    if ttl <= 0:
+        if not is_write_tool(tool_name):
+            return func
+
+        @functools.wraps(func)
+        def invalidating(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                store.invalidate(namespace)
+        return invalidating
+
+    @functools.wraps(func)
+    def cached(*args, **kwargs):
+        key = cache_key(namespace, tool_name, func, args, kwargs)
+        result = store.get(key)
+        if result is not None:
+            logger.debug(f"Cache hit: {tool_name}")
+            return result
+        result = func(*args, **kwargs)
+        # Só resultados bem-sucedidos são cacheados
+        if not is_error_result(result):
+            store.put(key, namespace, tool_name, result, ttl)
+        return result
+    return cached
+
+
+def _etag_connection_class(base, store: ToolCacheStore):
+    """Conexão do PyGithub que reaproveita respostas via If-None-Match (304 não consome cota da API)"""
+    import requests
+    from github.Requester import RequestsResponse
+
+    class ETagConnection(base):
+        def getresponse(self):
+            if self.verb.upper() != 'GET' or self.stream:
+                return super().getresponse()
+
+            url = f"{self.protocol}://{self.host}:{self.port}{self.url}"
+            auth = self.headers.get('Authorization', '')
+            key = hashlib.sha1(f"{url}|{auth}".encode('utf-8')).hexdigest()
+            cached = store.get_etag(key)
+            if cached is not None:
+                self.headers = {**self.headers, 'If-None-Match': cached[0]}
+
+            response = super().getresponse()
+            if response.status == 304 and cached is not None:
+                store.revalidated += 1
+                store.touch_etag(key)
+                etag, headers, body = cached
+                revalidated = requests.Response()
+                revalidated.status_code = 200
+                revalidated.headers = requests.structures.CaseInsensitiveDict({**headers, **response.headers})
+                revalidated._content = body
+                revalidated.encoding = 'utf-8'
+                revalidated.url = url
+                return RequestsResponse(revalidated)
+            etag = response.headers.get('ETag')
+            if response.status == 200 and etag:
+                store.put_etag(key, url, etag, dict(response.headers), response.response.content)
+            return response
+
+    return ETagConnection
+
+
+def enable_github_etags(github_tools, store: Optional[ToolCacheStore] = None):
+    """Ativa requisições condicionais (ETag) no cliente PyGithub do GithubTools"""
+    store = store or get_tool_cache_store()
+    requester = getattr(github_tools.g, '_Github__requester', None)
+    base = getattr(requester, '_Requester__connectionClass', None)
+    if base is None:
+        logger.warning("Versão do PyGithub sem suporte ao hook de conexão; ETags desativados.")
+        return github_tools
+    requester._Requester__connectionClass = _etag_connection_class(base, store)
+    return github_tools
@@ -0,0 +1,189 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONSOLE_TEMPLATE = os.path.join(BASE_DIR, 'ui', 'templates', 'console.html')
+CONSOLE_BUILD_DIR = os.getenv('CONSOLE_BUILD_DIR', os.path.join(BASE_DIR, 'ui', 'dist'))
+CONSOLE_ASSETS_URL = '/agents/ui/assets/'
+MANIFEST_NAME = 'manifest.json'
+
+# Codificações pré-comprimidas, na ordem de preferência (br só se a lib estiver instalada)
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.json': 'application/json',
+}
+
+_STYLE = re.compile(r'<style>(.*?)</style>', re.DOTALL)
+_SCRIPT = re.compile(r'<script>(.*?)</script>', re.DOTALL)
+
+
+def minify_css(css: str) -> str:
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r'([{;])\s*([\w-]+)\s*:\s*', r'\1\2:', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js: str) -> str:
+    """
+    Minificação conservadora (sem dependências): tira indentação, linhas vazias
+    e comentários de linha inteira. As quebras de linha ficam, então a
+    inserção automática de ponto e vírgula não muda.
+    """
+    lines = []
+    for line in js.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def minify_html(html: str) -> str:
+    # Espaço em branco com quebra de linha equivale a uma quebra (o texto pre-wrap do console não tem indentação relevante)
+    return re.sub(r'[ \t]*\n\s*', '\n', html).strip()
+
+
+def _hashed_name(stem: str, ext: str, content: bytes) -> str:
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+
+def _write_variants(build_dir: str, name: str, content: bytes) -> list:
+    """Grava o arquivo e as versões comprimidas; devolve as codificações disponíveis"""
+    with open(os.path.join(build_dir, name), 'wb') as f:
+        f.write(content)
+    encodings = []
+    # mtime=0 mantém o .gz idêntico entre builds do mesmo conteúdo
+    variants = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(content, quality=11)
+    for encoding, compressed in variants.items():
+        # Comprimir arquivos pequenos pode aumentar o tamanho
+        if len(compressed) < len(content):
+            with open(os.path.join(build_dir, name + ENCODINGS[encoding]), 'wb') as f:
+                f.write(compressed)
+            encodings.append(encoding)
+    return encodings
+
+
+def build_console(build_dir: str = CONSOLE_BUILD_DIR, template: str = CONSOLE_TEMPLATE) -> dict:
+    """
+    Compila o console: CSS e JS inline viram arquivos minificados com hash no
+    nome (cache longo e imutável), o HTML passa a referenciá-los, e cada
+    arquivo ganha versões .gz/.br. O manifest liga os nomes lógicos aos gerados.
+    """
+    with open(template, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    os.makedirs(build_dir, exist_ok=True)
+    files: Dict[str, dict] = {}
+
+    def emit(logical: str, content: str) -> str:
+        stem, ext = os.path.splitext(logical)
+        data = content.encode('utf-8')
+        name = _hashed_name(stem, ext, data)
+        files[logical] = {'file': name, 'size': len(data), 'encodings': _write_variants(build_dir, name, data)}
+        return name
+
+    css = '\n'.join(minify_css(block) for block in _STYLE.findall(html))
+    js = '\n'.join(minify_js(block) for block in _SCRIPT.findall(html))
+    css_name = emit('console.css', css)
+    js_name = emit('console.js', js)
+
+    # O primeiro bloco vira o link/script externo; os demais somem (já estão concatenados)
+    link = f'<link rel="stylesheet" href="{CONSOLE_ASSETS_URL}{css_name}">'
+    script = f'<script src="{CONSOLE_ASSETS_URL}{js_name}"></script>'
+    html = _STYLE.sub('', _STYLE.sub(lambda m: link, html, count=1))
+    html = _SCRIPT.sub('', _SCRIPT.sub(lambda m: script, html, count=1))
+    emit('console.html', minify_html(html))
+
+    manifest = {'built_at': time.time(), 'files': files}
+    manifest_path = os.path.join(build_dir, MANIFEST_NAME)
+    # Arquivos do build anterior continuam disponíveis: páginas já abertas ainda os referenciam
+    keep = {info['file'] for info in files.values()}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            keep.update(info['file'] for info in json.load(f)['files'].values())
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # Escrita atômica: um worker nunca lê um manifest pela metade
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    for name in os.listdir(build_dir):
+        base = name
+        for ext in ENCODINGS.values():
+            if base.endswith(ext):
+                base = base[:-len(ext)]
+        if name != MANIFEST_NAME and base not in keep:
+            os.remove(os.path.join(build_dir, name))
+    return manifest
+
+
+class ConsoleManifest:
+    """Manifest do build carregado em memória; relido só quando o arquivo muda"""
+
+    def __init__(self, build_dir: str = CONSOLE_BUILD_DIR):
+        self.build_dir = build_dir
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._manifest: Optional[dict] = None
+        self._by_file: Dict[str, dict] = {}
+
+    def _load(self) -> Optional[dict]:
+        path = os.path.join(self.build_dir, MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self._manifest, self._mtime, self._by_file = None, None, {}
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                self._by_file = {info['file']: info for info in manifest['files'].values()}
+                self._manifest, self._mtime = manifest, mtime
+        return self._manifest
+
+    def entry(self, logical: str) -> Optional[dict]:
+        manifest = self._load()
+        return manifest['files'].get(logical) if manifest else None
+
+    def asset(self, name: str) -> Optional[dict]:
+        """Entrada de um arquivo gerado (só nomes do manifest, nunca caminhos arbitrários)"""
+        self._load()
+        return self._by_file.get(name)
+
+    def open_variant(self, info: dict, accept_encoding: str):
+        """(conteúdo, codificação) na melhor codificação aceita pelo cliente"""
+        accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').split(',')}
+        for encoding, ext in ENCODINGS.items():
+            if encoding in accepted and encoding in info['encodings']:
+                with open(os.path.join(self.build_dir, info['file'] + ext), 'rb') as f:
+                    return f.read(), encoding
+        with open(os.path.join(self.build_dir, info['file']), 'rb') as f:
+            return f.read(), None
+
+
+def content_type_for(name: str) -> str:
+    return CONTENT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream')
+
+
+console_manifest = ConsoleManifest()
@@ -6,9 +6,21 @@ import ast
 from pathlib import Path
 from typing import List, Dict, Any
 import json
+import threading
 from urllib.parse import urlparse
 import urllib.request
 from core.base_agent import BaseAgent
+from .doc_index import DocIndex, DOC_INDEX_POLL_INTERVAL, IGNORED_DIRS, analyze_source
+
+# Diretórios indexados ao iniciar (separados por vírgula); consultas sobre eles não releem o disco
+DOC_WATCH_DIRS = [d.strip() for d in os.getenv('DOC_WATCH_DIRS', '').split(',') if d.strip()]
+# Raízes sob as quais a API pode iniciar um watch (padrão: DOC_WATCH_DIRS) e limite de diretórios em watch
+DOC_WATCH_ALLOWED_ROOTS = [os.path.realpath(d.strip())
+                           for d in (os.getenv('DOC_WATCH_ALLOWED_ROOTS') or ','.join(DOC_WATCH_DIRS)).split(',')
+                           if d.strip()]
+DOC_WATCH_MAX = int(os.getenv('DOC_WATCH_MAX', '8'))
+# Arquivos lidos por consulta quando o diretório não tem índice pronto
+DOC_SCAN_MAX_FILES = int(os.getenv('DOC_SCAN_MAX_FILES', '10'))
 
 class DocAgent(BaseAgent):
     """
@@ -22,8 +34,55 @@ class DocAgent(BaseAgent):
             role="Especialista em análise de documentação e docstrings Python",
             model="openai"
         )
+        # Índices em modo watch, por diretório raiz
+        self.indexes: Dict[str, DocIndex] = {}
+        self._watch_lock = threading.Lock()
+        for directory in DOC_WATCH_DIRS:
+            self.watch(directory)
+    
+    def watch(self, directory: str, interval: float = DOC_INDEX_POLL_INTERVAL, limit: int = None):
+        """
+        Indexa o diretório em segundo plano e mantém o índice atualizado (polling
+        a cada `interval` segundos e `DocIndex.notify` para alterações conhecidas).
+        Retorna None quando já há `limit` diretórios em watch.
+        """
+        root = os.path.abspath(directory)
+        with self._watch_lock:
+            index = self.indexes.get(root)
+            if index is None:
+                if limit is not None and len(self.indexes) >= limit:
+                    return None
+                index = DocIndex(root)
+                index.start(interval)
+                self.indexes[root] = index
+        return index
+    
+    def unwatch(self, directory: str) -> bool:
+        """Para o watch do diretório raiz informado e descarta o índice"""
+        with self._watch_lock:
+            index = self.indexes.pop(os.path.abspath(directory), None)
+        if index is None:
+            return False
+        index.stop()
+        return True
+    
+    @staticmethod
+    def watch_allowed(directory: str) -> bool:
+        """O diretório (com links resolvidos) fica sob uma das DOC_WATCH_ALLOWED_ROOTS"""
+        path = os.path.realpath(directory)
+        return any(path == root or path.startswith(root + os.sep) for root in DOC_WATCH_ALLOWED_ROOTS)
     
-    def run(self, prompt: str) -> str:
+    def index_for(self, path: str):
+        """Índice que cobre o caminho, ou None se ele não estiver em modo watch"""
+        path = os.path.abspath(path)
+        with self._watch_lock:
+            indexes = list(self.indexes.items())
+        for root, index in indexes:
+            if path == root or path.startswith(root + os.sep):
+                return index
+        return None
+    
+    def run(self, prompt: str, **kwargs) -> str:
         """
         Sobrescreve o método run do BaseAgent para usar nossa lógica personalizada.
         
@@ -35,6 +94,13 @@ class DocAgent(BaseAgent):
         """
         return self.process_task(prompt)
     
+    def run_stream(self, prompt: str, **kwargs):
+        """
+        Versão em streaming do run. A análise é local, então o resultado
+        é entregue em um único bloco.
+        """
+        yield self.process_task(prompt)
+    
     def process_task(self, task: str) -> str:
         """
         Processa tarefas relacionadas à documentação.
@@ -124,8 +190,7 @@ class DocAgent(BaseAgent):
             
             results = []
             for directory in directories:
-                result = self._analyze_directory_docstrings(directory)
-                results.append(f"📁 **Diretório**: {directory}\n{result}")
+                results.append(f"📁 **Diretório**: {directory}\n{self._directory_report(directory)}")
             
             return "\n\n".join(results)
             
@@ -176,67 +241,106 @@ class DocAgent(BaseAgent):
         """
         try:
             project_root = os.getcwd()
-            return self._analyze_directory_docstrings(project_root)
+            return self._directory_report(project_root)
         except Exception as e:
             return f"❌ Erro ao analisar projeto: {str(e)}"
     
-    def _analyze_directory_docstrings(self, directory: str) -> str:
+    def _directory_report(self, directory: str) -> str:
+        """
+        Estatísticas do diretório pelo índice quando possível. Diretórios sob
+        DOC_WATCH_ALLOWED_ROOTS ganham um watch na primeira consulta; enquanto o
+        índice não fica pronto (ou sem watch), lê no máximo DOC_SCAN_MAX_FILES arquivos.
         """
-        Analisa docstrings em todos os arquivos Python de um diretório.
+        index = self.index_for(directory)
+        if index is None and self.watch_allowed(directory):
+            index = self.watch(directory, limit=DOC_WATCH_MAX)
+        if index is not None and index.ready:
+            return self._format_index_coverage(index, directory)
+        result = self._analyze_directory_docstrings(directory, max_files=DOC_SCAN_MAX_FILES)
+        if index is not None:
+            result = "⏳ Índice do diretório em construção; as próximas consultas usarão a contagem completa.\n" + result
+        return result
+    
+    def _analyze_directory_docstrings(self, directory: str, max_files: int = None) -> str:
+        """
+        Analisa docstrings nos arquivos Python de um diretório (todos, ou os
+        `max_files` primeiros). As estatísticas usam a mesma contagem do índice
+        (analyze_source); o detalhamento por arquivo fica limitado aos 10 primeiros.
         """
         results = []
         python_files = []
+        truncated = False
         
-        # Encontra todos os arquivos Python
+        # Encontra os arquivos Python
         for root, dirs, files in os.walk(directory):
-            # Ignora diretórios comuns que não precisam de análise
-            dirs[:] = [d for d in dirs if d not in ['__pycache__', '.git', 'venv', 'env', 'node_modules']]
+            # Ignora os mesmos diretórios que o índice
+            dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
             
             for file in files:
                 if file.endswith('.py'):
+                    if max_files is not None and len(python_files) >= max_files:
+                        truncated = True
+                        break
                     python_files.append(os.path.join(root, file))
+            if truncated:
+                break
         
         if not python_files:
             return "❌ Nenhum arquivo Python encontrado no diretório."
         
-        # Analisa cada arquivo
         total_functions = 0
         total_classes = 0
         documented_functions = 0
         documented_classes = 0
         
-        for file_path in python_files[:10]:  # Limita a 10 arquivos para não sobrecarregar
+        for position, file_path in enumerate(python_files):
             try:
-                file_result = self._analyze_file_docstrings(file_path)
-                if "Funções:" in file_result:
-                    # Conta estatísticas básicas
-                    lines = file_result.split('\n')
-                    for line in lines:
-                        if "✅" in line and "def " in line:
-                            documented_functions += 1
-                            total_functions += 1
-                        elif "❌" in line and "def " in line:
-                            total_functions += 1
-                        elif "✅" in line and "class " in line:
-                            documented_classes += 1
-                            total_classes += 1
-                        elif "❌" in line and "class " in line:
-                            total_classes += 1
-                
-                results.append(f"**{os.path.basename(file_path)}**\n{file_result}")
-            except Exception as e:
+                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                    content = f.read()
+            except OSError as e:
                 results.append(f"❌ Erro ao analisar {file_path}: {str(e)}")
+                continue
+            
+            counts = analyze_source(content)
+            total_functions += counts.functions
+            documented_functions += counts.documented_functions
+            total_classes += counts.classes
+            documented_classes += counts.documented_classes
+            
+            if position < 10:  # Limita o detalhamento para não sobrecarregar
+                file_result = self._extract_docstrings_from_content(content, file_path)
+                results.append(f"**{os.path.basename(file_path)}**\n{file_result}")
         
         # Adiciona estatísticas gerais
         stats = f"""📊 **Estatísticas de Documentação**
-📁 Arquivos analisados: {len(results)}
+📁 Arquivos analisados: {len(python_files)}
 🔧 Funções documentadas: {documented_functions}/{total_functions}
 🏗️ Classes documentadas: {documented_classes}/{total_classes}
 📈 Taxa de documentação: {((documented_functions + documented_classes) / max(total_functions + total_classes, 1) * 100):.1f}%
 """
+        if truncated:
+            stats += f"⚠️ Estatísticas parciais: só os {max_files} primeiros arquivos foram lidos.\n"
         
         return stats + "\n\n" + "\n\n".join(results)
     
+    def _format_index_coverage(self, index: DocIndex, directory: str) -> str:
+        """
+        Estatísticas do diretório a partir do índice em memória.
+        """
+        prefix = os.path.relpath(os.path.abspath(directory), index.root)
+        coverage = index.coverage(None if prefix == '.' else prefix)
+        stats = f"""📊 **Estatísticas de Documentação**
+📁 Arquivos analisados: {coverage['files']}
+🔧 Funções documentadas: {coverage['functions']['documented']}/{coverage['functions']['total']}
+🏗️ Classes documentadas: {coverage['classes']['documented']}/{coverage['classes']['total']}
+📈 Taxa de documentação: {coverage['coverage']:.1f}%
+"""
+        worst = index.least_documented(10, None if prefix == '.' else prefix)
+        if worst:
+            stats += "\n📉 **Arquivos com menos documentação**\n" + "\n".join(
+                f"- {info['path']}: {info['coverage']:.1f}% ({', '.join(info['undocumented'][:5])})" for info in worst)
+        return stats
+    
     def _analyze_file_docstrings(self, file_path: str) -> str:
         """
         Analisa docstrings em um arquivo Python específico.
@@ -359,7 +463,7 @@ class DocAgent(BaseAgent):
             module_docstring = ast.get_docstring(tree)
             
             for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
                     docstring = ast.get_docstring(node)
                     status = "✅" if docstring else "❌"
                     functions.append(f"{status} def {node.name}(): {docstring[:100] if docstring else 'Sem documentação'}")
@@ -0,0 +1,259 @@
+import ast
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DOC_INDEX_POLL_INTERVAL = float(os.getenv('DOC_INDEX_POLL_INTERVAL', '5'))
+DOC_INDEX_MAX_NAMES = int(os.getenv('DOC_INDEX_MAX_NAMES', '20'))
+IGNORED_DIRS = {'__pycache__', '.git', 'venv', 'env', '.venv', 'node_modules'}
+
+
+class FileStats(NamedTuple):
+    """Resumo compacto de um arquivo: só contadores e os nomes sem docstring (limitados)"""
+    mtime_ns: int
+    size: int
+    functions: int
+    documented_functions: int
+    classes: int
+    documented_classes: int
+    module_doc: bool
+    error: bool
+    undocumented: Tuple[str, ...]
+
+
+def analyze_source(content: str, mtime_ns: int = 0, size: int = 0, max_names: int = DOC_INDEX_MAX_NAMES) -> FileStats:
+    """Conta funções/classes e docstrings de um código Python"""
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return FileStats(mtime_ns, size, 0, 0, 0, 0, False, True, ())
+
+    functions = documented_functions = classes = documented_classes = 0
+    undocumented: List[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions += 1
+            if ast.get_docstring(node):
+                documented_functions += 1
+            elif len(undocumented) < max_names:
+                undocumented.append(sys.intern(f"def {node.name}"))
+        elif isinstance(node, ast.ClassDef):
+            classes += 1
+            if ast.get_docstring(node):
+                documented_classes += 1
+            elif len(undocumented) < max_names:
+                undocumented.append(sys.intern(f"class {node.name}"))
+
+    return FileStats(mtime_ns, size, functions, documented_functions, classes, documented_classes,
+                     bool(ast.get_docstring(tree)), False, tuple(undocumented))
+
+
+def _coverage(documented: int, total: int) -> float:
+    return round(documented / total * 100, 1) if total else 100.0
+
+
+class DocIndex:
+    """
+    Índice em memória da documentação de um diretório.
+
+    Guarda um FileStats por arquivo (chave = caminho relativo) e os totais
+    agregados, atualizados de forma incremental: `refresh()` compara
+    mtime/tamanho e só reanalisa o que mudou; `notify()` atualiza caminhos
+    específicos. Consultas de cobertura e por arquivo não tocam o disco.
+    """
+
+    def __init__(self, root: str, extensions: Iterable[str] = ('.py',), ignored_dirs=IGNORED_DIRS):
+        self.root = os.path.abspath(root)
+        self.extensions = tuple(extensions)
+        self.ignored_dirs = set(ignored_dirs)
+        self._files: Dict[str, FileStats] = {}
+        # arquivos, funções, funções documentadas, classes, classes documentadas, módulos documentados, erros
+        self._totals = [0, 0, 0, 0, 0, 0, 0]
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_refresh: Optional[float] = None
+        self.last_refresh_seconds: Optional[float] = None
+
+    def _relative(self, path: str) -> str:
+        return sys.intern(os.path.relpath(os.path.abspath(os.path.join(self.root, path)), self.root))
+
+    def _scan(self):
+        """Percorre o diretório devolvendo (caminho relativo, mtime_ns, tamanho) sem ler os arquivos"""
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in self.ignored_dirs:
+                            stack.append(entry.path)
+                    elif entry.name.endswith(self.extensions):
+                        stat = entry.stat()
+                        yield os.path.relpath(entry.path, self.root), stat.st_mtime_ns, stat.st_size
+                except OSError:
+                    continue
+
+    def _analyze(self, relative: str, mtime_ns: int, size: int) -> Optional[FileStats]:
+        try:
+            with open(os.path.join(self.root, relative), 'r', encoding='utf-8', errors='replace') as f:
+                return analyze_source(f.read(), mtime_ns, size)
+        except OSError:
+            return None
+
+    def _apply(self, relative: str, stats: Optional[FileStats]):
+        """Troca a entrada do arquivo e ajusta os totais (chamar com o lock)"""
+        old = self._files.pop(relative, None)
+        for sign, entry in ((-1, old), (1, stats)):
+            if entry is None:
+                continue
+            self._totals[0] += sign
+            self._totals[1] += sign * entry.functions
+            self._totals[2] += sign * entry.documented_functions
+            self._totals[3] += sign * entry.classes
+            self._totals[4] += sign * entry.documented_classes
+            self._totals[5] += sign * entry.module_doc
+            self._totals[6] += sign * entry.error
+        if stats is not None:
+            self._files[sys.intern(relative)] = stats
+
+    def refresh(self) -> dict:
+        """Sincroniza o índice com o disco; reanalisa só arquivos novos ou alterados"""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            seen = set()
+            changed = 0
+            for relative, mtime_ns, size in self._scan():
+                seen.add(relative)
+                current = self._files.get(relative)
+                if current is not None and current.mtime_ns == mtime_ns and current.size == size:
+                    continue
+                stats = self._analyze(relative, mtime_ns, size)
+                with self._lock:
+                    self._apply(relative, stats)
+                changed += 1
+
+            with self._lock:
+                removed = [relative for relative in self._files if relative not in seen]
+                for relative in removed:
+                    self._apply(relative, None)
+
+            self.last_refresh = time.time()
+            self.last_refresh_seconds = time.perf_counter() - started
+            return {'changed': changed, 'removed': len(removed), 'seconds': round(self.last_refresh_seconds, 3)}
+
+    def notify(self, paths: Iterable[str]) -> int:
+        """Atualiza os caminhos informados (alterados, criados ou removidos)"""
+        updated = 0
+        for path in paths:
+            relative = self._relative(path)
+            if relative.startswith('..') or not relative.endswith(self.extensions):
+                continue
+            full_path = os.path.join(self.root, relative)
+            try:
+                stat = os.stat(full_path)
+                stats = self._analyze(relative, stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                stats = None
+            with self._lock:
+                self._apply(relative, stats)
+            updated += 1
+        return updated
+
+    def coverage(self, prefix: Optional[str] = None) -> dict:
+        """Cobertura total (O(1)) ou de um subdiretório (`prefix`, relativo à raiz)"""
+        with self._lock:
+            if not prefix:
+                files, functions, doc_functions, classes, doc_classes, module_docs, errors = self._totals
+            else:
+                prefix = self._relative(prefix).rstrip(os.sep) + os.sep
+                entries = [stats for relative, stats in self._files.items() if relative.startswith(prefix)]
+                files = len(entries)
+                functions = sum(s.functions for s in entries)
+                doc_functions = sum(s.documented_functions for s in entries)
+                classes = sum(s.classes for s in entries)
+                doc_classes = sum(s.documented_classes for s in entries)
+                module_docs = sum(s.module_doc for s in entries)
+                errors = sum(s.error for s in entries)
+        return {
+            'root': self.root,
+            'prefix': prefix,
+            'files': files,
+            'functions': {'documented': doc_functions, 'total': functions},
+            'classes': {'documented': doc_classes, 'total': classes},
+            'modules_documented': module_docs,
+            'syntax_errors': errors,
+            'coverage': _coverage(doc_functions + doc_classes, functions + classes),
+            'last_refresh': self.last_refresh,
+            'ready': self.ready,
+        }
+
+    def file_info(self, path: str) -> Optional[dict]:
+        relative = self._relative(path)
+        with self._lock:
+            stats = self._files.get(relative)
+        if stats is None:
+            return None
+        return {
+            'path': relative,
+            'functions': {'documented': stats.documented_functions, 'total': stats.functions},
+            'classes': {'documented': stats.documented_classes, 'total': stats.classes},
+            'module_doc': stats.module_doc,
+            'syntax_error': stats.error,
+            'coverage': _coverage(stats.documented_functions + stats.documented_classes, stats.functions + stats.classes),
+            'undocumented': list(stats.undocumented),
+        }
+
+    def least_documented(self, limit: int = 10, prefix: Optional[str] = None) -> List[dict]:
+        """Arquivos com mais funções/classes sem docstring (opcionalmente só de um subdiretório)"""
+        if prefix:
+            prefix = self._relative(prefix).rstrip(os.sep) + os.sep
+        with self._lock:
+            items = [(relative, stats) for relative, stats in self._files.items()
+                     if not prefix or relative.startswith(prefix)]
+        items.sort(key=lambda item: (item[1].documented_functions + item[1].documented_classes)
+                   - (item[1].functions + item[1].classes))
+        return [self.file_info(relative) for relative, stats in items[:limit]
+                if stats.functions + stats.classes > stats.documented_functions + stats.documented_classes]
+
+    def __len__(self):
+        return len(self._files)
+
+    @property
+    def ready(self) -> bool:
+        """A primeira varredura terminou (antes disso as contagens são parciais)"""
+        return self.last_refresh is not None
+
+    def start(self, interval: float = DOC_INDEX_POLL_INTERVAL):
+        """
+        Passa a verificar alterações a cada `interval` segundos em uma thread daemon.
+        A primeira varredura também roda na thread; `ready` indica quando ela terminou.
+        """
+        if self._thread is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Erro ao atualizar o índice de '{self.root}': {e}")
+                if self._stop.wait(interval):
+                    return
+
+        self._thread = threading.Thread(target=loop, name='doc-index', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from agents.console_build import CONSOLE_BUILD_DIR, brotli, build_console
+
+
+class Command(BaseCommand):
+    help = 'Compila o console (ui/templates/console.html) em assets minificados, com hash e pré-comprimidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=CONSOLE_BUILD_DIR, help='Diretório de saída do build')
+
+    def handle(self, *args, **options):
+        manifest = build_console(options['output'])
+        for logical, info in manifest['files'].items():
+            encodings = ', '.join(info['encodings']) or 'sem compressão'
+            self.stdout.write(f"{logical} -> {info['file']} ({info['size']} bytes; {encodings})")
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('brotli não instalado: apenas variantes gzip foram geradas'))
+        self.stdout.write(self.style.SUCCESS(f"Console compilado em {options['output']}"))
@@ -1,13 +1,85 @@
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from functools import lru_cache
+import gzip
+import hashlib
+import json
 import os
 import tempfile
-from core.orchestrator import orchestrate, orchestrate_auto, agent_registry
+from core.orchestrator import orchestrate, orchestrate_auto, orchestrate_batch, agent_registry, find_best_agent, BATCH_MAX_CONCURRENCY, BATCH_ITEM_TIMEOUT
+from core.admission import admission, AdmissionRejected
+from core.prompt_layout import prompt_cache_metrics
+from core.tiering import tiering_metrics
+from agents.doc_agent import doc_agent, DOC_WATCH_MAX
+from agents.console_build import console_manifest, content_type_for
 
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '500'))
+# O catálogo muda só quando o registro muda (em geral, num deploy); o ETag cobre revalidações depois disso
+CATALOG_MAX_AGE = int(os.getenv('CATALOG_MAX_AGE', '300'))
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+
+def _cached_response(request, content, content_type, etag, cache_control, encoding=None):
+    """Resposta com ETag/Cache-Control; 304 quando o cliente já tem a versão"""
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    response['Vary'] = 'Accept-Encoding'
+    return response
 
 def agents_ui(request):
-    return render(request, 'console.html')
+    """Console compilado (manage.py build_console) quando existir; senão o template original"""
+    entry = console_manifest.entry('console.html')
+    if entry is None:
+        return render(request, 'console.html')
+    content, encoding = console_manifest.open_variant(entry, request.headers.get('Accept-Encoding'))
+    # O HTML é revalidado a cada carga; os assets com hash que ele referencia ficam em cache
+    return _cached_response(request, content, content_type_for(entry['file']), f'"{entry["file"]}"',
+                            'no-cache', encoding)
+
+def console_asset(request, name):
+    """Assets do console com hash no nome: cache imutável e versões gzip/br pré-comprimidas"""
+    entry = console_manifest.asset(name)
+    if entry is None:
+        raise Http404('Asset não encontrado')
+    content, encoding = console_manifest.open_variant(entry, request.headers.get('Accept-Encoding'))
+    return _cached_response(request, content, content_type_for(name), f'"{name}"', IMMUTABLE_CACHE, encoding)
+
+@lru_cache(maxsize=4)
+def _catalog(entries):
+    """
+    Catálogo serializado: (json, json gzip, etag). A chave do cache é o próprio
+    conteúdo do registro, então um agente registrado ou trocado gera outra versão.
+    """
+    agents = [{'key': key, 'name': name, 'role': role} for key, name, role in entries]
+    body = json.dumps({'agents': agents}, ensure_ascii=False).encode('utf-8')
+    return body, gzip.compress(body, mtime=0), f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+def agents_catalog(request):
+    """Lista de agentes do registro para o console e outros seletores de agente"""
+    body, compressed, etag = _catalog(agent_registry.catalog())
+    encoding = None
+    if 'gzip' in (request.headers.get('Accept-Encoding') or '') and len(compressed) < len(body):
+        body, encoding = compressed, 'gzip'
+    return _cached_response(request, body, 'application/json', etag, f'public, max-age={CATALOG_MAX_AGE}', encoding)
+
+def _queue_headers(response):
+    """Informa a carga atual para o cliente ajustar o ritmo"""
+    response['X-Queue-Depth'] = str(admission.queue_depth_now)
+    response['X-Active-Requests'] = str(admission.active)
+    return response
+
+def _rejected_response(error: AdmissionRejected):
+    response = JsonResponse({'error': str(error), 'reason': error.reason, 'retry_after': error.retry_after},
+                            status=error.status)
+    response['Retry-After'] = str(error.retry_after)
+    return _queue_headers(response)
 
 @csrf_exempt
 def run_agent(request):
@@ -20,16 +92,26 @@ def run_agent(request):
         
         # Se nenhum agente foi especificado, usa seleção automática
         if not agent or agent == 'auto':
-            result = orchestrate_auto(task)
-            return JsonResponse({'result': result, 'agent_used': 'auto-selected'})
+            # O agente é escolhido antes da admissão para usar o limite dele
+            agent_key = find_best_agent(task)
+            try:
+                with admission.admit(agent_key):
+                    result = orchestrate(task, agent_key)
+            except AdmissionRejected as e:
+                return _rejected_response(e)
+            return _queue_headers(JsonResponse({'result': result, 'agent_used': 'auto-selected'}))
         
         # Validação do agente especificado
         agent_names = agent_registry.get_agent_names()
         if agent not in agent_names:
             return JsonResponse({'error': 'Agente inválido'}, status=400)
         
-        result = orchestrate(task, agent)
-        return JsonResponse({'result': result, 'agent_used': agent})
+        try:
+            with admission.admit(agent):
+                result = orchestrate(task, agent)
+        except AdmissionRejected as e:
+            return _rejected_response(e)
+        return _queue_headers(JsonResponse({'result': result, 'agent_used': agent}))
 
 @csrf_exempt
 def run_agent_auto(request):
@@ -40,8 +122,22 @@ def run_agent_auto(request):
         if not task:
             return JsonResponse({'error': 'Tarefa não pode ser vazia'}, status=400)
         
-        result = orchestrate_auto(task)
-        return JsonResponse({'result': result, 'mode': 'auto-selection'})
+        agent_key = find_best_agent(task)
+        try:
+            with admission.admit(agent_key):
+                result = orchestrate(task, agent_key)
+        except AdmissionRejected as e:
+            return _rejected_response(e)
+        return _queue_headers(JsonResponse({'result': result, 'mode': 'auto-selection'}))
+
+@csrf_exempt
+def admission_status(request):
+    """Estado do controle de admissão: execuções ativas, fila e recusas"""
+    return _queue_headers(JsonResponse(admission.snapshot()))
+
+def metrics_status(request):
+    """Métricas do processo: camadas de modelo (escalonamentos, economia) e cache de prompt"""
+    return JsonResponse({'tiering': tiering_metrics.snapshot(), 'prompt_cache': prompt_cache_metrics.snapshot()})
 
 @csrf_exempt
 def upload_and_analyze(request):
@@ -53,57 +149,195 @@ def upload_and_analyze(request):
         if not uploaded_files and not directory_path:
             return JsonResponse({'error': 'Nenhum arquivo ou diretório especificado'}, status=400)
         
-        results = []
+        # Uma vaga do doc_agent para a requisição inteira
+        try:
+            with admission.admit('doc_agent'):
+                results = _analyze_uploads(uploaded_files, directory_path)
+        except AdmissionRejected as e:
+            return _rejected_response(e)
         
-        # Processa arquivos enviados
-        if uploaded_files:
-            for uploaded_file in uploaded_files:
-                if uploaded_file.name.endswith('.py'):
-                    try:
-                        # Salva temporariamente o arquivo
-                        with tempfile.NamedTemporaryFile(mode='w+', suffix='.py', delete=False) as temp_file:
-                            content = uploaded_file.read().decode('utf-8')
-                            temp_file.write(content)
-                            temp_file_path = temp_file.name
-                        
-                        # Analisa com doc_agent
-                        task = f"analisar arquivo {temp_file_path}"
-                        result = orchestrate(task, 'doc_agent', files=[uploaded_file])
-                        results.append({
-                            'file': uploaded_file.name,
-                            'analysis': result
-                        })
-                        
-                        # Remove arquivo temporário
-                        os.unlink(temp_file_path)
-                        
-                    except Exception as e:
-                        results.append({
-                            'file': uploaded_file.name,
-                            'error': f'Erro ao processar: {str(e)}'
-                        })
-                else:
+        return _queue_headers(JsonResponse({
+            'results': results,
+            'total_processed': len(results)
+        }))
+
+def _analyze_uploads(uploaded_files, directory_path):
+    """Analisa os arquivos enviados e/ou o diretório com o doc_agent"""
+    results = []
+    
+    # Processa arquivos enviados
+    if uploaded_files:
+        for uploaded_file in uploaded_files:
+            if uploaded_file.name.endswith('.py'):
+                try:
+                    # Salva temporariamente o arquivo
+                    with tempfile.NamedTemporaryFile(mode='w+', suffix='.py', delete=False) as temp_file:
+                        content = uploaded_file.read().decode('utf-8')
+                        temp_file.write(content)
+                        temp_file_path = temp_file.name
+                    
+                    # Analisa com doc_agent
+                    task = f"analisar arquivo {temp_file_path}"
+                    result = orchestrate(task, 'doc_agent', files=[uploaded_file])
                     results.append({
                         'file': uploaded_file.name,
-                        'error': 'Apenas arquivos Python (.py) são suportados'
+                        'analysis': result
                     })
-        
-        # Processa diretório especificado
-        if directory_path and os.path.isdir(directory_path):
-            try:
-                task = f"analisar diretório {directory_path}"
-                result = orchestrate(task, 'doc_agent', files=None)
-                results.append({
-                    'directory': directory_path,
-                    'analysis': result
-                })
-            except Exception as e:
+                    
+                    # Remove arquivo temporário
+                    os.unlink(temp_file_path)
+                    
+                except Exception as e:
+                    results.append({
+                        'file': uploaded_file.name,
+                        'error': f'Erro ao processar: {str(e)}'
+                    })
+            else:
                 results.append({
-                    'directory': directory_path,
-                    'error': f'Erro ao processar diretório: {str(e)}'
+                    'file': uploaded_file.name,
+                    'error': 'Apenas arquivos Python (.py) são suportados'
                 })
+    
+    # Processa diretório especificado
+    if directory_path and os.path.isdir(directory_path):
+        try:
+            task = f"analisar diretório {directory_path}"
+            result = orchestrate(task, 'doc_agent', files=None)
+            results.append({
+                'directory': directory_path,
+                'analysis': result
+            })
+        except Exception as e:
+            results.append({
+                'directory': directory_path,
+                'error': f'Erro ao processar diretório: {str(e)}'
+            })
+    
+    return results
+
+@csrf_exempt
+def doc_coverage(request):
+    """
+    Cobertura de documentação a partir do índice em modo watch do doc_agent.
+    GET ?directory=...[&file=...|&prefix=...]: consulta instantânea, sem reler o disco.
+    POST {"directory": "...", "paths": [...]}: inicia o watch ou atualiza só os arquivos informados
+    ("paths" vazio força uma nova varredura). Novos watches só sob DOC_WATCH_ALLOWED_ROOTS,
+    até DOC_WATCH_MAX diretórios; a primeira varredura roda em segundo plano (202).
+    DELETE ?directory=...: encerra o watch do diretório raiz.
+    """
+    if request.method == 'GET':
+        directory = request.GET.get('directory', '')
+        if not directory:
+            roots = list(doc_agent.indexes)
+            if not roots:
+                return JsonResponse({'error': 'Nenhum diretório em modo watch'}, status=404)
+            directory = roots[0]
+        index = doc_agent.index_for(directory)
+        if index is None:
+            return JsonResponse({'error': 'Diretório não está em modo watch'}, status=404)
         
-        return JsonResponse({
-            'results': results,
-            'total_processed': len(results)
-        })
+        file_path = request.GET.get('file')
+        if file_path:
+            info = index.file_info(file_path)
+            if info is None:
+                return JsonResponse({'error': 'Arquivo não encontrado no índice'}, status=404)
+            return JsonResponse(info)
+        
+        prefix = request.GET.get('prefix')
+        try:
+            limit = min(int(request.GET.get('limit', 10)), 100)
+        except ValueError:
+            return JsonResponse({'error': 'limit inválido'}, status=400)
+        return JsonResponse({**index.coverage(prefix), 'least_documented': index.least_documented(limit, prefix)})
+    
+    if request.method == 'DELETE':
+        directory = request.GET.get('directory', '')
+        if not directory:
+            return JsonResponse({'error': 'Informe o diretório'}, status=400)
+        if not doc_agent.unwatch(directory):
+            return JsonResponse({'error': 'Diretório não está em modo watch'}, status=404)
+        return JsonResponse({'stopped': os.path.abspath(directory)})
+    
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Use GET, POST ou DELETE'}, status=405)
+    
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    if not isinstance(payload, dict) or not payload.get('directory'):
+        return JsonResponse({'error': 'Informe o diretório'}, status=400)
+    
+    directory = payload['directory']
+    paths = payload.get('paths') or []
+    if not isinstance(paths, list):
+        return JsonResponse({'error': 'paths deve ser uma lista'}, status=400)
+    
+    index = doc_agent.index_for(directory)
+    if index is None:
+        if not doc_agent.watch_allowed(directory):
+            return JsonResponse({'error': 'Diretório fora das raízes permitidas (DOC_WATCH_ALLOWED_ROOTS)'}, status=403)
+        if not os.path.isdir(directory):
+            return JsonResponse({'error': 'Diretório não encontrado'}, status=404)
+        index = doc_agent.watch(directory, limit=DOC_WATCH_MAX)
+        if index is None:
+            return JsonResponse({'error': f'Limite de {DOC_WATCH_MAX} diretórios em modo watch atingido'}, status=409)
+        return JsonResponse({'watching': index.root, 'ready': index.ready}, status=202)
+    
+    if paths:
+        return JsonResponse({'watching': index.root, 'updated': index.notify(paths)})
+    return JsonResponse({'watching': index.root, **index.refresh()})
+
+@csrf_exempt
+def run_batch(request):
+    """
+    Executa um lote de tarefas e devolve NDJSON, uma linha por item à medida que terminam.
+    Corpo: {"tasks": [{"task": "...", "agent": "auto", "id": "..."}, ...], "max_concurrency": 4, "timeout": 180}
+    Os itens rodam sem o contexto da conversa. Um item com timeout é reportado na hora,
+    mas a chamada ao LLM em andamento termina em segundo plano e ocupa sua vaga até lá.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Use POST'}, status=405)
+    
+    try:
+        payload = json.loads(request.body or b'null')
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    
+    tasks = payload.get('tasks') if isinstance(payload, dict) else payload
+    if not isinstance(tasks, list) or not tasks:
+        return JsonResponse({'error': 'Envie uma lista de tarefas'}, status=400)
+    if len(tasks) > BATCH_MAX_ITEMS:
+        return JsonResponse({'error': f'Máximo de {BATCH_MAX_ITEMS} tarefas por lote'}, status=400)
+    
+    options = payload if isinstance(payload, dict) else {}
+    try:
+        max_concurrency = int(options.get('max_concurrency', BATCH_MAX_CONCURRENCY))
+        item_timeout = float(options.get('timeout', BATCH_ITEM_TIMEOUT))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'max_concurrency/timeout inválidos'}, status=400)
+    # `not x > 0` também recusa NaN
+    if max_concurrency <= 0 or not item_timeout > 0:
+        return JsonResponse({'error': 'max_concurrency e timeout devem ser positivos'}, status=400)
+    # O cliente pode reduzir, mas não ultrapassar, os limites do servidor
+    max_concurrency = min(max_concurrency, BATCH_MAX_CONCURRENCY)
+    item_timeout = min(item_timeout, BATCH_ITEM_TIMEOUT)
+    
+    # Cada item passa pela admissão; aqui o lote inteiro é recusado se o servidor já está saturado
+    try:
+        admission.check()
+    except AdmissionRejected as e:
+        return _rejected_response(e)
+    
+    def stream():
+        totals = {'ok': 0, 'error': 0, 'timeout': 0}
+        for record in orchestrate_batch(tasks, max_concurrency, item_timeout):
+            totals[record['status']] += 1
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        yield json.dumps({'done': True, 'total': len(tasks), **totals}) + '\n'
+    
+    response = StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    # Desliga o buffer de proxies (nginx) para as linhas chegarem conforme terminam
+    response['X-Accel-Buffering'] = 'no'
+    return _queue_headers(response)
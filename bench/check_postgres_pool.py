@@ -0,0 +1,128 @@
+"""
+Verificação do PostgresPoolTools com um SQLite local no lugar do PostgreSQL.
+
+O pool é substituído por um que entrega conexões SQLite; o resto do caminho
+(prepare_query, cursor, stream_capped e a nota de truncamento) é o real.
+
+Uso:
+    python -m bench.check_postgres_pool
+"""
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+from bench.run_bench import BASE_DIR
+
+
+class SqliteCursor:
+    """Cursor DB-API do sqlite3 com o protocolo de contexto dos cursores do psycopg"""
+
+    def __init__(self, conn, name, executed):
+        self._cursor = conn.cursor()
+        self.name = name
+        self._executed = executed
+
+    def execute(self, sql, params=None):
+        self._executed.append((sql, self.name))
+        return self._cursor.execute(sql, params or ())
+
+    def __getattr__(self, attr):
+        return getattr(self._cursor, attr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    def __init__(self, conn, executed):
+        self._conn = conn
+        self._executed = executed
+
+    def cursor(self, name=None):
+        return SqliteCursor(self._conn, name, self._executed)
+
+
+class SqlitePool:
+    """Imita ConnectionPool.connection() sobre um único banco SQLite em memória"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.executed = []
+
+    @contextmanager
+    def connection(self):
+        yield SqliteConnection(self.conn, self.executed)
+
+    def close(self):
+        self.conn.close()
+
+
+def check(condition, message, failures):
+    print(f"{'ok   ' if condition else 'FALHA'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+def main():
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    from agentes_agno.postgres_pool import PostgresPoolTools, prepare_query, stream_capped
+
+    failures = []
+
+    sql, server_side = prepare_query("SELECT id FROM vendas -- comentário\nWHERE id > 1;", 10)
+    check(sql == "SELECT * FROM (SELECT id FROM vendas\nWHERE id > 1) AS _consulta LIMIT 10" and server_side,
+          'leitura simples perde comentário e `;` e recebe LIMIT', failures)
+    sql, _ = prepare_query("/* bloco */ WITH t AS (SELECT 1) SELECT * FROM t ;", 5)
+    check(sql.startswith("SELECT * FROM (WITH t AS") and sql.endswith("LIMIT 5") and '/*' not in sql,
+          'WITH é envolvido e comentário de bloco removido', failures)
+    sql, _ = prepare_query("SELECT '--x;' AS texto", 5)
+    check("'--x;'" in sql, "'--' e ';' dentro de literal são preservados", failures)
+    check(prepare_query("SELECT 1; SELECT 2", 5)[1] is False, 'múltiplas instruções não são envolvidas', failures)
+    check(prepare_query("EXPLAIN SELECT 1", 5) == ("EXPLAIN SELECT 1", False), 'EXPLAIN não recebe LIMIT', failures)
+
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.execute("CREATE TABLE vendas (id INTEGER, cidade TEXT, valor REAL)")
+    conn.executemany("INSERT INTO vendas VALUES (?, ?, ?)",
+                     [(i, 'São Paulo' if i % 2 else 'Brasília', i * 1.5) for i in range(1, 201)])
+
+    cursor = conn.execute("SELECT id, cidade FROM vendas ORDER BY id LIMIT 3")
+    check(stream_capped(cursor, max_rows=10) == "id,cidade\n1,São Paulo\n2,Brasília\n3,São Paulo",
+          'resultado pequeno vem inteiro e sem nota', failures)
+
+    # Cabeçalho "cidade" (6 bytes) + linhas "São Paulo\n" (11 bytes; 10 caracteres): 47 bytes cabem 3, não 4
+    cursor = conn.execute("SELECT cidade FROM vendas WHERE cidade = 'São Paulo'")
+    capped = stream_capped(cursor, max_rows=50, max_bytes=6 + 41)
+    shown = capped.split('\n\n')[0].split('\n')[1:]
+    check(len(shown) == 3 and "limite de 47 bytes" in capped,
+          'max_bytes conta bytes UTF-8, não caracteres', failures)
+
+    tools = PostgresPoolTools(max_rows=5, max_bytes=16000, scan_rows=100)
+    tools._pool = SqlitePool(conn)
+    result = tools._execute("SELECT id, valor FROM vendas ORDER BY id -- maiores\n;")
+    executed_sql, cursor_name = tools._pool.executed[-1]
+    check(executed_sql.endswith("LIMIT 101") and cursor_name == 'agente_consulta',
+          '_execute usa cursor nomeado e LIMIT scan_rows + 1', failures)
+    check(result.split('\n\n')[0].count('\n') == 5, 'limite de linhas exibidas respeitado', failures)
+    check("[Resultado truncado: 5 de mais de 100 linhas exibidas (limite de 5 linhas).]" in result,
+          'nota de truncamento informa linhas exibidas e total', failures)
+    check("- id: 100 valores, 0 nulos; min=1 max=100" in result, 'resumo por coluna cobre as linhas lidas', failures)
+
+    tools.max_rows, tools.max_bytes = 50, 30
+    result = tools._execute("SELECT cidade FROM vendas")
+    check("(limite de 30 bytes)" in result, '_execute aplica max_bytes com a nota', failures)
+
+    result = tools._execute("SELECT * FROM inexistente")
+    check(result.startswith("An unexpected error occurred") or result.startswith("Error"),
+          'erro de consulta vira mensagem, não exceção', failures)
+
+    tools.close()
+    print(f"\n{len(failures)} falha(s)" if failures else "\nTudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Verificação da normalização de SQL, do filtro de leitura e do cache de resultados
+usados pelo PostgresPoolTools. Não precisa de banco.
+
+Uso:
+    python -m bench.check_schema_cache
+"""
+import sys
+
+from bench.run_bench import BASE_DIR
+
+
+def check(condition, message, failures):
+    print(f"{'ok   ' if condition else 'FALHA'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+def main():
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    from agentes_agno.schema_cache import QueryResultCache, is_read_only, normalize_sql
+
+    failures = []
+
+    check(normalize_sql("select  id\n  FROM vendas -- recentes\nwhere cidade = 'X';")
+          == normalize_sql("SELECT id FROM vendas WHERE cidade = 'X'"),
+          'keywords, espaços, comentários e `;` final são normalizados', failures)
+    check(normalize_sql("SELECT id FROM vendas WHERE cidade = 'Ana'")
+          != normalize_sql("SELECT id FROM vendas WHERE cidade = 'ana'"),
+          'literais mantêm maiúsculas/minúsculas', failures)
+    check(normalize_sql("SELECT id FROM vendas WHERE cidade = 'São  Paulo'")
+          != normalize_sql("SELECT id FROM vendas WHERE cidade = 'São Paulo'"),
+          'espaços dentro de literais são preservados', failures)
+
+    for sql in ("SELECT * FROM vendas", "with t as (select 1) select * from t;", "-- c\nEXPLAIN SELECT 1",
+                "SELECT 'insert into x; delete' AS texto"):
+        check(is_read_only(sql), f'leitura aceita: {sql!r}', failures)
+    for sql in ("WITH novos AS (INSERT INTO vendas VALUES (1) RETURNING *) SELECT * FROM novos",
+                "WITH velhos AS (DELETE FROM vendas RETURNING *) SELECT count(*) FROM velhos",
+                "SELECT * INTO copia FROM vendas",
+                "SELECT 1; DELETE FROM vendas",
+                "SELECT 1; SELECT 2",
+                "UPDATE vendas SET valor = 0"):
+        check(not is_read_only(sql), f'escrita/múltiplas instruções rejeitadas: {sql!r}', failures)
+
+    cache = QueryResultCache(ttl=60, maxsize=16)
+    cache.put('fp1', "SELECT id FROM vendas", "id\n1")
+    check(cache.get('fp1', "select id\n from vendas;") == "id\n1", 'consulta equivalente é servida do cache', failures)
+    check(cache.get('fp2', "SELECT id FROM vendas") is None, 'fingerprint novo não reaproveita resultado', failures)
+    cache.put('fp1', "SELECT id FROM vendas WHERE cidade = 'Ana'", "id\n2")
+    check(cache.get('fp1', "SELECT id FROM vendas WHERE cidade = 'ana'") is None,
+          'literal diferente não colide na chave', failures)
+
+    cache.put('fp1', "SELECT * FROM inexistente", "Error executing query: relation does not exist")
+    cache.put('fp1', "SELECT 1/0", "An unexpected error occurred: division by zero")
+    check(cache.get('fp1', "SELECT * FROM inexistente") is None and cache.get('fp1', "SELECT 1/0") is None,
+          "resultados de erro ('Error...') não são cacheados", failures)
+    cache.put('fp1', "WITH n AS (INSERT INTO vendas VALUES (1) RETURNING id) SELECT id FROM n", "id\n3")
+    check(cache.get('fp1', "WITH n AS (INSERT INTO vendas VALUES (1) RETURNING id) SELECT id FROM n") is None,
+          'escrita disfarçada de leitura não é cacheada', failures)
+
+    print(f"\n{len(failures)} falha(s)" if failures else "\nTudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Verificação do cache de ferramentas contra um servidor HTTP local que imita a API do GitHub.
+
+Nenhuma chamada sai da máquina: o GithubTools aponta para o servidor local e
+as respostas usam ETag/304 como a API real.
+
+Uso:
+    python -m bench.check_tool_cache
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.run_bench import BASE_DIR
+
+REPO = {
+    'id': 1, 'name': 'repo', 'full_name': 'dono/repo', 'description': 'Repositório de teste',
+    'html_url': 'http://localhost/dono/repo', 'stargazers_count': 7, 'forks_count': 2,
+    'open_issues_count': 1, 'language': 'Python', 'license': None, 'default_branch': 'main',
+    'url': '/repos/dono/repo',
+}
+REPO_ETAG = '"repo-v1"'
+
+
+class GithubStandIn(BaseHTTPRequestHandler):
+    """Responde /repos/dono/repo (com ETag) e 404 para o resto; conta as requisições recebidas"""
+
+    requests = []
+
+    def do_GET(self):
+        conditional = self.headers.get('If-None-Match')
+        self.requests.append((self.path, conditional))
+        if self.path.rstrip('/') == '/repos/dono/repo':
+            if conditional == REPO_ETAG:
+                self._reply(304, None, {'ETag': REPO_ETAG})
+            else:
+                self._reply(200, REPO, {'ETag': REPO_ETAG})
+        else:
+            self._reply(404, {'message': 'Not Found'}, {})
+
+    def _reply(self, status, payload, headers):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def check(condition, message, failures):
+    print(f"{'ok   ' if condition else 'FALHA'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+def main():
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    from agno.tools.github import GithubTools
+    from agentes_agno.tool_cache import ToolCacheStore, _wrap, cache_toolkit, enable_github_etags, is_error_result
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GithubStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    failures = []
+
+    with tempfile.TemporaryDirectory(prefix='iron_tool_cache_') as workdir:
+        store = ToolCacheStore(os.path.join(workdir, 'tool_cache.db'))
+        tools = GithubTools(access_token='token-local', base_url=f'http://127.0.0.1:{server.server_port}',
+                            get_repository=True)
+        tools = cache_toolkit(enable_github_etags(tools, store=store), store=store, namespace='github')
+        get_repository = tools.functions['get_repository'].entrypoint
+        received = GithubStandIn.requests
+
+        first = get_repository('dono/repo')
+        check(json.loads(first).get('name') == 'dono/repo', 'primeira chamada consulta o servidor', failures)
+        check(get_repository('  dono/repo ') == first and len(received) == 1,
+              'mesmos argumentos (normalizados) são servidos do cache', failures)
+
+        store.invalidate('github')
+        check(get_repository('dono/repo') == first, 'resultado revalidado é igual ao original', failures)
+        check(received[-1][1] == REPO_ETAG and store.revalidated == 1, 'revalidação usa If-None-Match e recebe 304', failures)
+
+        before = len(received)
+        missing = get_repository('dono/inexistente')
+        check(is_error_result(missing), 'erro do GithubTools ({"error": ...}) é reconhecido', failures)
+        get_repository('dono/inexistente')
+        check(len(received) > before + 1, 'erros não são cacheados', failures)
+
+        def read_tool():
+            return 'leitura'
+
+        cached_before = store._conn.execute("SELECT COUNT(*) FROM tool_results WHERE namespace = 'github'").fetchone()[0]
+        check(_wrap(read_tool, 'list_forks', 0, store, 'github') is read_tool,
+              'leitura sem cache passa direto, sem invalidar', failures)
+        _wrap(lambda: 'ok', 'update_file', 0, store, 'github')()
+        cached_after = store._conn.execute("SELECT COUNT(*) FROM tool_results WHERE namespace = 'github'").fetchone()[0]
+        check(cached_before > 0 and cached_after == 0, 'ferramenta de escrita invalida o cache do toolkit', failures)
+
+        store.max_etags = 1
+        for i in range(3):
+            store.put_etag(f'extra-{i}', f'http://127.0.0.1/extra/{i}', f'"{i}"', {}, b'{}')
+        store.purge()
+        etags = store._conn.execute('SELECT COUNT(*) FROM http_etags').fetchone()[0]
+        check(etags == 1, 'tabela de ETags respeita max_etags', failures)
+        store.close()
+
+    server.shutdown()
+    print(f"\n{len(failures)} falha(s)" if failures else "\nTudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import json
+import os
+import platform
+import resource
+import subprocess
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+# Iterações da passada de memória (fora da medição de tempo)
+BENCH_MEM_ITERATIONS = int(os.getenv('BENCH_MEM_ITERATIONS', '50'))
+
+
+def percentile(sorted_values, pct):
+    """Percentil por interpolação linear sobre uma lista já ordenada"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    low = int(k)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+
+def summarize_latencies(latencies_s):
+    """Resumo de latências em milissegundos"""
+    values = sorted(v * 1000.0 for v in latencies_s)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': values[-1],
+    }
+
+
+def run_scenario(name, operation, iterations, concurrency=1, warmup=0, mem_iterations=BENCH_MEM_ITERATIONS):
+    """
+    Executa `operation(i)` `iterations` vezes com `concurrency` threads e mede
+    vazão e percentis de latência. O pico de memória alocada vem de uma passada
+    separada, sem cronômetro, porque o tracemalloc deixa cada alocação mais lenta.
+    """
+    for i in range(warmup):
+        operation(i)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def timed(i):
+        start = time.perf_counter()
+        try:
+            operation(i)
+        except Exception as e:
+            with lock:
+                errors.append(repr(e))
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    def untimed(i):
+        try:
+            operation(i)
+        except Exception:
+            pass
+
+    def execute(func, count):
+        if concurrency <= 1:
+            for i in range(count):
+                func(i)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(func, range(count)))
+
+    started = time.perf_counter()
+    execute(timed, iterations)
+    duration = time.perf_counter() - started
+
+    peak = 0
+    mem_count = min(iterations, mem_iterations)
+    if mem_count > 0:
+        tracemalloc.start()
+        execute(untimed, mem_count)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'name': name,
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'duration_s': duration,
+        'throughput_ops_s': iterations / duration if duration > 0 else 0.0,
+        'latency_ms': summarize_latencies(latencies),
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        'mem_peak_kb': peak / 1024.0,
+        'mem_iterations': mem_count,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(RESULTS_DIR), stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def build_report(scenarios, config=None):
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'config': config or {},
+        },
+        'scenarios': {s['name']: s for s in scenarios},
+    }
+
+
+def save_report(report, path=None):
+    """Grava o relatório em JSON e retorna o caminho usado"""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        revision = report['meta'].get('git_revision') or 'local'
+        path = os.path.join(RESULTS_DIR, f'bench_{stamp}_{revision}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_report(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_reports(baseline, current, threshold=0.10):
+    """
+    Compara dois relatórios cenário a cenário.
+
+    Uma regressão é sinalizada quando a vazão cai ou o p95 sobe mais que
+    `threshold` (fração) em relação ao baseline.
+    """
+    rows = []
+    for name, cur in current['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if not base:
+            continue
+        base_tp, cur_tp = base['throughput_ops_s'], cur['throughput_ops_s']
+        base_p95 = base['latency_ms'].get('p95', 0.0)
+        cur_p95 = cur['latency_ms'].get('p95', 0.0)
+        tp_delta = (cur_tp - base_tp) / base_tp if base_tp else 0.0
+        p95_delta = (cur_p95 - base_p95) / base_p95 if base_p95 else 0.0
+        rows.append({
+            'scenario': name,
+            'throughput_delta': tp_delta,
+            'p95_delta': p95_delta,
+            'mem_peak_delta_kb': cur['mem_peak_kb'] - base['mem_peak_kb'],
+            'regression': tp_delta < -threshold or p95_delta > threshold,
+        })
+    return rows
+
+
+def format_report(report):
+    lines = [f"{'cenário':<28}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mem KB':>10}{'erros':>7}"]
+    for name, s in report['scenarios'].items():
+        lat = s['latency_ms']
+        lines.append(
+            f"{name:<28}{s['throughput_ops_s']:>10.1f}{lat.get('p50', 0):>10.2f}"
+            f"{lat.get('p95', 0):>10.2f}{lat.get('p99', 0):>10.2f}{s['mem_peak_kb']:>10.0f}{s['errors']:>7}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,287 @@
+"""
+Replay de tráfego gravado contra /agents/run/ e /agents/auto/ usando o backend LLM falso.
+
+As tarefas vêm de requests.jsonl e conversation_memory.json. Dois modos de carga:
+
+- open:   chegadas Poisson com taxa fixa (req/s), independente da resposta;
+          o atraso de fila é o tempo entre a chegada agendada e o início do atendimento.
+- closed: N usuários simultâneos, cada um envia, espera a resposta e pensa.
+
+Uso:
+    python -m bench.replay --mode open --rates 5 10 20 40 --workers 4 --duration 10
+    python -m bench.replay --mode closed --users 1 4 16 --workers 4 --duration 10
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.run_bench import BASE_DIR, add_fake_llm_arguments, prepare_environment
+
+ENDPOINTS = ('/agents/run/', '/agents/auto/')
+
+
+def load_recorded_tasks(requests_file=None, memory_file=None):
+    """
+    Lê as tarefas gravadas. Cada item é (tarefa, agente_gravado_ou_None).
+    """
+    tasks = []
+    requests_file = requests_file or os.path.join(BASE_DIR, 'requests.jsonl')
+    memory_file = memory_file or os.path.join(BASE_DIR, 'conversation_memory.json')
+
+    if os.path.exists(requests_file):
+        with open(requests_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                task = record.get('task') or ' '.join(filter(None, [record.get('title'), record.get('body')]))
+                if task:
+                    tasks.append((task, record.get('agent')))
+
+    if os.path.exists(memory_file):
+        with open(memory_file, 'r', encoding='utf-8') as f:
+            try:
+                memory = json.load(f)
+            except json.JSONDecodeError:
+                memory = {'sessions': []}
+        for session in memory.get('sessions', []):
+            for interaction in session.get('interactions', []):
+                if interaction.get('task'):
+                    tasks.append((interaction['task'], interaction.get('agent_used')))
+
+    return tasks
+
+
+class ReplayTarget:
+    """Envia as requisições direto para as views Django, sem servidor HTTP"""
+
+    def __init__(self):
+        import django
+        django.setup()
+        from django.test import RequestFactory
+        from django.urls import resolve
+        from core.orchestrator import agent_registry, find_best_agent
+
+        self._factory = RequestFactory()
+        self._resolve = resolve
+        self._find_best_agent = find_best_agent
+        self.agent_names = set(agent_registry.get_agent_names())
+
+    def route(self, endpoint, task, agent):
+        """Agente que vai atender a requisição (mesma regra das views)"""
+        if endpoint == '/agents/run/' and agent in self.agent_names:
+            return agent
+        return self._find_best_agent(task)
+
+    def send(self, endpoint, task, agent):
+        data = {'task': task}
+        if endpoint == '/agents/run/' and agent in self.agent_names:
+            data['agent'] = agent
+        request = self._factory.post(endpoint, data)
+        return self._resolve(endpoint).func(request).status_code
+
+
+class LoadRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.queue_delays = []
+        self.statuses = Counter()
+        self.routing = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def finished(self, latency, queue_delay, status, agent):
+        with self._lock:
+            self.in_flight -= 1
+            self.latencies.append(latency)
+            self.queue_delays.append(queue_delay)
+            self.statuses[status] += 1
+            self.routing[agent] += 1
+
+
+def _pick(rng, tasks, endpoints):
+    task, agent = rng.choice(tasks)
+    return rng.choice(endpoints), task, agent
+
+
+def _execute(target, recorder, endpoint, task, agent, scheduled):
+    start = time.perf_counter()
+    routed = target.route(endpoint, task, agent)
+    recorder.started()
+    try:
+        status = target.send(endpoint, task, agent)
+    except Exception:
+        status = 'exception'
+    end = time.perf_counter()
+    recorder.finished(end - scheduled, start - scheduled, status, routed)
+
+
+def run_open_loop(target, tasks, endpoints, rate, duration, workers, seed):
+    """Chegadas Poisson a `rate` req/s atendidas por `workers` threads"""
+    rng = random.Random(seed)
+    recorder = LoadRecorder()
+    offered = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        begin = time.perf_counter()
+        next_arrival = begin
+        while next_arrival - begin < duration:
+            now = time.perf_counter()
+            if next_arrival > now:
+                time.sleep(next_arrival - now)
+            endpoint, task, agent = _pick(rng, tasks, endpoints)
+            executor.submit(_execute, target, recorder, endpoint, task, agent, next_arrival)
+            offered += 1
+            next_arrival += rng.expovariate(rate)
+    elapsed = time.perf_counter() - begin
+    return recorder, offered, elapsed
+
+
+def run_closed_loop(target, tasks, endpoints, users, duration, think_ms, workers, seed):
+    """`users` clientes em laço fechado disputando `workers` threads de atendimento"""
+    recorder = LoadRecorder()
+    counter = Counter()
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(workers)
+    begin = time.perf_counter()
+
+    def user_loop(user_id):
+        rng = random.Random(f"{seed}:{user_id}")
+        while time.perf_counter() - begin < duration:
+            endpoint, task, agent = _pick(rng, tasks, endpoints)
+            scheduled = time.perf_counter()
+            with slots:
+                _execute(target, recorder, endpoint, task, agent, scheduled)
+            with lock:
+                counter['sent'] += 1
+            if think_ms:
+                time.sleep(rng.expovariate(1000.0 / think_ms))
+
+    threads = [threading.Thread(target=user_loop, args=(u,)) for u in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - begin
+    return recorder, counter['sent'], elapsed
+
+
+def summarize_step(label, load, recorder, offered, elapsed):
+    from bench.harness import summarize_latencies
+
+    completed = len(recorder.latencies)
+    total_routes = sum(recorder.routing.values()) or 1
+    return {
+        'label': label,
+        'load': load,
+        'offered': offered,
+        'completed': completed,
+        'duration_s': elapsed,
+        'offered_rate': offered / elapsed if elapsed else 0.0,
+        'throughput_ops_s': completed / elapsed if elapsed else 0.0,
+        'latency_ms': summarize_latencies(recorder.latencies),
+        'queue_delay_ms': summarize_latencies(recorder.queue_delays),
+        'max_in_flight': recorder.max_in_flight,
+        'status_codes': {str(k): v for k, v in recorder.statuses.items()},
+        'routing': {k: {'count': v, 'share': v / total_routes} for k, v in recorder.routing.most_common()},
+    }
+
+
+def find_saturation(steps, queue_delay_ms=250.0, efficiency=0.9):
+    """
+    Primeiro passo saturado: a vazão não acompanha a carga oferecida ou o p95
+    da fila passa de `queue_delay_ms`. Retorna também o último passo saudável.
+    """
+    healthy = None
+    for step in steps:
+        keeps_up = step['throughput_ops_s'] >= efficiency * step['offered_rate']
+        queue_ok = step['queue_delay_ms'].get('p95', 0.0) <= queue_delay_ms
+        if keeps_up and queue_ok:
+            healthy = step
+            continue
+        return {'saturated_at': step['load'], 'last_healthy': healthy['load'] if healthy else None,
+                'max_healthy_throughput': healthy['throughput_ops_s'] if healthy else 0.0}
+    return {'saturated_at': None, 'last_healthy': healthy['load'] if healthy else None,
+            'max_healthy_throughput': healthy['throughput_ops_s'] if healthy else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay de tarefas gravadas contra as views dos agentes')
+    parser.add_argument('--mode', choices=['open', 'closed'], default='open')
+    parser.add_argument('--rates', type=float, nargs='+', default=[2, 5, 10, 20], help='Taxas (req/s) do modo open')
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 4, 8, 16], help='Usuários do modo closed')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='Tempo médio de "pensar" no modo closed')
+    parser.add_argument('--workers', type=int, nargs='+', default=[4], help='Threads de atendimento a simular')
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos por passo de carga')
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument('--requests-file')
+    parser.add_argument('--memory-file')
+    parser.add_argument('--max-queue-delay-ms', type=float, default=250.0)
+    parser.add_argument('--output', help='Caminho do JSON de resultados')
+    add_fake_llm_arguments(parser)
+    args = parser.parse_args(argv)
+
+    tasks = load_recorded_tasks(args.requests_file, args.memory_file)
+    if not tasks:
+        print('Nenhuma tarefa gravada encontrada.')
+        return 1
+
+    with tempfile.TemporaryDirectory(prefix='iron_replay_') as workdir:
+        fake_config = prepare_environment(args, workdir)
+        from bench.harness import build_report, save_report
+
+        target = ReplayTarget()
+        runs = []
+        for workers in args.workers:
+            steps = []
+            loads = args.rates if args.mode == 'open' else args.users
+            for load in loads:
+                print(f"workers={workers} {args.mode} carga={load} ({args.duration:.0f}s)...")
+                if args.mode == 'open':
+                    recorder, offered, elapsed = run_open_loop(
+                        target, tasks, args.endpoints, load, args.duration, workers, args.seed)
+                else:
+                    recorder, offered, elapsed = run_closed_loop(
+                        target, tasks, args.endpoints, load, args.duration, args.think_ms, workers, args.seed)
+                step = summarize_step(f'{args.mode}_{load}', load, recorder, offered, elapsed)
+                steps.append(step)
+                print(f"  vazão {step['throughput_ops_s']:.1f}/s  p95 {step['latency_ms'].get('p95', 0):.0f} ms"
+                      f"  fila p95 {step['queue_delay_ms'].get('p95', 0):.0f} ms")
+            saturation = find_saturation(steps, args.max_queue_delay_ms)
+            runs.append({'workers': workers, 'steps': steps, 'saturation': saturation})
+            print(f"  saturação: {saturation}")
+
+        from core.orchestrator import conversation_memory
+        conversation_memory.close()
+
+    report = build_report([], {
+        'mode': args.mode,
+        'duration_s': args.duration,
+        'endpoints': args.endpoints,
+        'recorded_tasks': len(tasks),
+        'fake_llm': fake_config.to_dict(),
+    })
+    report['replay'] = runs
+    path = save_report(report, args.output)
+    print(f"\nResultados salvos em {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
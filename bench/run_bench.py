@@ -0,0 +1,199 @@
+"""
+Benchmark offline do orquestrador usando o backend LLM falso.
+
+Uso:
+    python -m bench.run_bench --iterations 200 --concurrency 8
+    python -m bench.run_bench --latency-ms 0 --compare bench/results/anterior.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from bench.harness import BENCH_MEM_ITERATIONS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_TASKS = [
+    'criar uma tabela de usuários no banco',
+    'fazer um componente react para login',
+    'documentar a API do sistema',
+    'configurar urls do django',
+    'implemente uma api inteira com drf para pedidos de venda',
+    'desenhe a arquitetura de um sistema de estoque',
+    'escreva uma query sql para vendas por mês',
+    'tela em react native para consumir a api de pedidos',
+    'analisar docstrings do projeto',
+    'qual a melhor estrutura de pastas para o projeto',
+]
+
+
+def prepare_environment(args, workdir):
+    """Configura backend falso e arquivos temporários antes de importar o orquestrador"""
+    os.environ['AGENT_BACKEND'] = 'fake'
+    os.environ['CONVERSATION_MEMORY_FILE'] = os.path.join(workdir, 'conversation_memory.json')
+    if args.tiering:
+        os.environ['TIERING_ENABLED'] = '1'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'erp_agents.settings')
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+
+    from core.fake_model import configure_fake_llm
+    return configure_fake_llm(
+        latency_dist=args.latency_dist,
+        latency_ms=args.latency_ms,
+        latency_spread=args.latency_spread,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+
+
+def add_fake_llm_arguments(parser):
+    """Opções do backend falso compartilhadas pelas ferramentas de bench"""
+    parser.add_argument('--latency-dist', default='lognormal', choices=['constant', 'uniform', 'exponential', 'lognormal'])
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--latency-spread', type=float, default=0.5)
+    parser.add_argument('--tokens-per-second', type=float, default=0.0)
+    parser.add_argument('--response-tokens', type=int, default=120)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fração de chamadas que recebem 429')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tiering', action='store_true', help='Liga as camadas de modelo (TIERING_ENABLED=1)')
+
+
+def build_scenarios(args, workdir):
+    """Retorna a lista de (nome, operação, concorrência) a executar e a função de limpeza"""
+    import django
+    django.setup()
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    from core import orchestrator
+    from core.orchestrator import ConversationMemory, find_best_agent, orchestrate
+    from agents.doc_agent import doc_agent
+
+    tasks = SAMPLE_TASKS
+    factory = RequestFactory()
+    memory = ConversationMemory(os.path.join(workdir, 'memory_bench.json'))
+    doc_dir = args.doc_dir or BASE_DIR
+
+    def op_find_best_agent(i):
+        find_best_agent(tasks[i % len(tasks)])
+
+    def op_memory(i):
+        task = tasks[i % len(tasks)]
+        memory.add_interaction(task, 'arquiteto', 'resultado ' * 100)
+        memory.get_context_for_task(task)
+
+    def op_orchestrate(i):
+        orchestrate(tasks[i % len(tasks)])
+
+    def op_doc_directory(i):
+        doc_agent._analyze_directory_docstrings(doc_dir)
+
+    def post_view(path, data):
+        request = factory.post(path, data)
+        response = resolve(path).func(request)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{path} respondeu {response.status_code}')
+
+    def op_view_run(i):
+        keys = orchestrator.agent_registry.get_agent_names()
+        post_view('/agents/run/', {'task': tasks[i % len(tasks)], 'agent': keys[i % len(keys)]})
+
+    def op_view_auto(i):
+        post_view('/agents/auto/', {'task': tasks[i % len(tasks)]})
+
+    def op_view_upload(i):
+        post_view('/agents/upload/', {'directory_path': doc_dir})
+
+    def op_view_batch(i):
+        body = json.dumps({'tasks': [tasks[(i + k) % len(tasks)] for k in range(8)]})
+        request = factory.post('/agents/batch/', body, content_type='application/json')
+        response = resolve('/agents/batch/').func(request)
+        lines = [json.loads(line) for line in response.streaming_content]
+        if response.status_code >= 400 or not lines[-1].get('done'):
+            raise RuntimeError(f'/agents/batch/ respondeu {response.status_code}')
+
+    def cleanup():
+        # Descarrega as filas de gravação antes de apagar o diretório temporário
+        memory.close()
+        orchestrator.conversation_memory.close()
+
+    c = args.concurrency
+    scenarios = [
+        ('find_best_agent', op_find_best_agent, 1),
+        ('conversation_memory', op_memory, 1),
+        ('orchestrate', op_orchestrate, c),
+        ('doc_agent_directory', op_doc_directory, 1),
+        ('view_run_agent', op_view_run, c),
+        ('view_run_agent_auto', op_view_auto, c),
+        ('view_upload_directory', op_view_upload, c),
+        ('view_batch', op_view_batch, 1),
+    ]
+    return scenarios, cleanup
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark offline dos agentes com LLM falso')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--only', nargs='*', help='Executa apenas os cenários informados')
+    add_fake_llm_arguments(parser)
+    parser.add_argument('--doc-dir', help='Diretório analisado nos cenários do DocAgent')
+    parser.add_argument('--output', help='Caminho do JSON de resultados')
+    parser.add_argument('--compare', help='Relatório anterior para comparação')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Variação tolerada antes de acusar regressão')
+    parser.add_argument('--mem-iterations', type=int, default=BENCH_MEM_ITERATIONS,
+                        help='Iterações da passada de memória, fora da medição de tempo (0 desliga)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='iron_bench_') as workdir:
+        fake_config = prepare_environment(args, workdir)
+        from bench.harness import build_report, compare_reports, format_report, load_report, run_scenario, save_report
+
+        results = []
+        scenarios, cleanup = build_scenarios(args, workdir)
+        for name, operation, concurrency in scenarios:
+            if args.only and name not in args.only:
+                continue
+            print(f"Executando {name} ({args.iterations} iterações, concorrência {concurrency})...")
+            results.append(run_scenario(name, operation, args.iterations, concurrency=concurrency, warmup=1,
+                                        mem_iterations=args.mem_iterations))
+        cleanup()
+
+    config = {
+        'iterations': args.iterations,
+        'concurrency': args.concurrency,
+        'mem_iterations': args.mem_iterations,
+        'fake_llm': fake_config.to_dict(),
+    }
+    report = build_report(results, config)
+    from core.prompt_layout import prompt_cache_metrics
+    from core.tiering import tiering_metrics
+    report['tiering'] = tiering_metrics.snapshot()
+    report['prompt_cache'] = prompt_cache_metrics.snapshot()
+    path = save_report(report, args.output)
+    print(format_report(report))
+    tiering = report['tiering']
+    print(f"\nCamadas: {tiering['calls']}  escalonamentos: {tiering['escalations']}  "
+          f"economia estimada: {tiering['estimated_savings_s'] or 0:.2f}s")
+    prompt_cache = report['prompt_cache']
+    print(f"Tokens de entrada: {prompt_cache['input_tokens']}  em cache: {prompt_cache['cached_tokens']} "
+          f"({prompt_cache['cached_ratio']:.1%})")
+    print(f"Resultados salvos em {path}")
+
+    if args.compare:
+        rows = compare_reports(load_report(args.compare), report, args.threshold)
+        regressions = [r for r in rows if r['regression']]
+        for r in rows:
+            flag = 'REGRESSÃO' if r['regression'] else 'ok'
+            print(f"{r['scenario']:<28} vazão {r['throughput_delta']:+.1%}  p95 {r['p95_delta']:+.1%}  {flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Controle de admissão por processo (cada worker do gunicorn tem os seus limites)
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1') == '1'
+ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', '8'))
+ADMISSION_AGENT_CONCURRENCY = int(os.getenv('ADMISSION_AGENT_CONCURRENCY', '4'))
+ADMISSION_QUEUE_DEPTH = int(os.getenv('ADMISSION_QUEUE_DEPTH', '16'))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '10'))
+# Estimativa inicial do tempo de uma execução, antes de haver medições
+ADMISSION_INITIAL_SERVICE_TIME = float(os.getenv('ADMISSION_INITIAL_SERVICE_TIME', '5'))
+ADMISSION_MAX_RETRY_AFTER = 120
+
+
+def parse_agent_limits(value: Optional[str]) -> Dict[str, int]:
+    """'doc_agent=8,arquiteto=2' -> {'doc_agent': 8, 'arquiteto': 2}"""
+    limits = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        name, limit = item.split('=', 1)
+        try:
+            limits[name.strip()] = max(1, int(limit))
+        except ValueError:
+            logger.warning(f"Limite de concorrência inválido para '{name.strip()}': {limit}")
+    return limits
+
+
+class AdmissionRejected(Exception):
+    """
+    Requisição recusada sem executar: 503 quando o servidor inteiro está
+    saturado (fila cheia ou prazo de espera esgotado), 429 quando só o
+    agente pedido está no limite.
+    """
+
+    def __init__(self, status: int, reason: str, retry_after: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limita as execuções simultâneas (global e por agente) e mantém uma fila de
+    espera com profundidade máxima e prazo. Quem não cabe na fila ou não
+    consegue vaga a tempo é recusado na hora, com uma estimativa de Retry-After.
+
+    Trabalhos em segundo plano (itens de lote, `background=True`) esperam fora
+    dessa fila: não contam na profundidade, só ocupam vagas globais que nenhuma
+    requisição interativa esteja esperando, e usam o prazo que o chamador passar.
+    """
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 agent_concurrency: int = ADMISSION_AGENT_CONCURRENCY,
+                 queue_depth: int = ADMISSION_QUEUE_DEPTH,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+                 agent_limits: Optional[Dict[str, int]] = None,
+                 enabled: bool = ADMISSION_ENABLED):
+        self.max_concurrent = max(1, max_concurrent)
+        self.agent_concurrency = max(1, agent_concurrency)
+        self.queue_depth = max(0, queue_depth)
+        self.queue_timeout = queue_timeout
+        self.agent_limits = dict(agent_limits or {})
+        self.enabled = enabled
+        self._cond = threading.Condition()
+        self._active = 0
+        self._active_by_agent: Dict[str, int] = {}
+        self._waiting = 0
+        self._waiting_background = 0
+        self._admitted = 0
+        self._rejected: Dict[str, int] = {}
+        self._max_wait = 0.0
+        # Média móvel do tempo de execução, usada no Retry-After
+        self._service_time = ADMISSION_INITIAL_SERVICE_TIME
+
+    def limit_for(self, agent_key: str) -> int:
+        return self.agent_limits.get(agent_key, self.agent_concurrency)
+
+    def _has_slot(self, agent_key: str, background: bool = False) -> bool:
+        # Em segundo plano, as vagas globais disputadas por quem espera na fila interativa ficam reservadas
+        queued = self._waiting if background else 0
+        return (self._active + queued < self.max_concurrent
+                and self._active_by_agent.get(agent_key, 0) < self.limit_for(agent_key))
+
+    def _retry_after(self) -> int:
+        """Segundos até a fila atual escoar, pela média de duração das execuções"""
+        backlog = (self._waiting + 1) / self.max_concurrent
+        return max(1, min(ADMISSION_MAX_RETRY_AFTER, math.ceil(backlog * self._service_time)))
+
+    def _reject(self, status: int, reason: str, message: str):
+        self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        logger.warning(f"Requisição recusada ({reason}): {self._active} em execução, {self._waiting} na fila")
+        raise AdmissionRejected(status, reason, self._retry_after(), message)
+
+    def check(self):
+        """Recusa de imediato quando não há vaga nem lugar na fila (para trabalhos longos, como lotes)"""
+        if not self.enabled:
+            return
+        with self._cond:
+            if self._active >= self.max_concurrent and self._waiting >= self.queue_depth:
+                self._reject(503, 'fila_cheia', 'Servidor sobrecarregado, tente novamente mais tarde')
+
+    def acquire(self, agent_key: str, timeout: Optional[float] = None, background: bool = False):
+        """Reserva uma vaga para o agente, esperando na fila até `timeout` (padrão: ADMISSION_QUEUE_TIMEOUT)"""
+        with self._cond:
+            if background:
+                self._acquire_background(agent_key, timeout)
+            elif not self._has_slot(agent_key):
+                if self._waiting >= self.queue_depth:
+                    self._reject(503, 'fila_cheia', 'Servidor sobrecarregado, tente novamente mais tarde')
+
+                started = time.monotonic()
+                deadline = started + (self.queue_timeout if timeout is None else timeout)
+                self._waiting += 1
+                try:
+                    while not self._has_slot(agent_key):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            if self._active < self.max_concurrent:
+                                self._reject(429, 'limite_agente', f'Limite de execuções simultâneas do agente {agent_key} atingido')
+                            self._reject(503, 'prazo_fila', 'Tempo de espera na fila esgotado')
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    # Libera as vagas que estavam reservadas para esta espera
+                    self._cond.notify_all()
+                self._max_wait = max(self._max_wait, time.monotonic() - started)
+
+            self._active += 1
+            self._active_by_agent[agent_key] = self._active_by_agent.get(agent_key, 0) + 1
+            self._admitted += 1
+
+    def _acquire_background(self, agent_key: str, timeout: Optional[float]):
+        """Espera de baixa prioridade, sem limite de profundidade (chamar com o lock)"""
+        deadline = time.monotonic() + (self.queue_timeout if timeout is None else timeout)
+        self._waiting_background += 1
+        try:
+            while not self._has_slot(agent_key, background=True):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject(503, 'prazo_lote', f'Sem vaga para o agente {agent_key} dentro do prazo do item')
+                self._cond.wait(remaining)
+        finally:
+            self._waiting_background -= 1
+
+    def release(self, agent_key: str, elapsed: Optional[float] = None):
+        with self._cond:
+            self._active -= 1
+            self._active_by_agent[agent_key] -= 1
+            if elapsed is not None:
+                self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+            # Vagas por agente: quem espera por outro agente também precisa reavaliar
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, agent_key: str, timeout: Optional[float] = None, background: bool = False):
+        if not self.enabled:
+            yield
+            return
+        self.acquire(agent_key, timeout, background)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(agent_key, time.monotonic() - started)
+
+    @property
+    def queue_depth_now(self) -> int:
+        return self._waiting
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                'enabled': self.enabled,
+                'active': self._active,
+                'max_concurrent': self.max_concurrent,
+                'queue_depth': self._waiting,
+                'background_waiting': self._waiting_background,
+                'max_queue_depth': self.queue_depth,
+                'queue_timeout_s': self.queue_timeout,
+                'agents': {agent: {'active': count, 'limit': self.limit_for(agent)}
+                           for agent, count in self._active_by_agent.items()},
+                'admitted': self._admitted,
+                'rejected': dict(self._rejected),
+                'max_wait_s': round(self._max_wait, 3),
+                'avg_service_s': round(self._service_time, 3),
+                'retry_after_s': self._retry_after(),
+            }
+
+
+admission = AdmissionController(agent_limits=parse_agent_limits(os.getenv('ADMISSION_AGENT_LIMITS')))
@@ -3,39 +3,124 @@ from agno.models.openai import OpenAIChat
 from agno.models.google.gemini import Gemini
 from dotenv import load_dotenv
 import os
+import threading
 import time
 import random
-from typing import Any
+from typing import Any, Iterator
+from .prompt_layout import build_system_prompt, build_user_message, prompt_cache_metrics, token_usage
+from .tiering import (FAST, LARGE, MODEL_TIERS, TIERING_ENABLED, estimate_complexity, model_for,
+                      tiering_metrics, validate_response)
 
 load_dotenv()
 
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 SMITHERY_API_KEY = os.getenv('SMITHERY_API_KEY')
+# Limite de chamadas ao LLM somado entre todos os workers (requer SHARED_STATE_BACKEND=sqlite)
+LLM_RATE_LIMIT_PER_MIN = float(os.getenv('LLM_RATE_LIMIT_PER_MIN', '0'))
+# Valida o início da resposta do modelo rápido antes de transmiti-la (permite escalonar sem misturar respostas)
+TIERING_STREAM_VALIDATE = os.getenv('TIERING_STREAM_VALIDATE', '1') == '1'
+# Caracteres retidos para essa validação; o restante do stream segue direto
+TIERING_STREAM_HOLD_CHARS = int(os.getenv('TIERING_STREAM_HOLD_CHARS', '300'))
 print(GOOGLE_API_KEY, OPENAI_API_KEY, SMITHERY_API_KEY)
 
 class BaseAgent:
     def __init__(self, name, role, model='openai'):
-        if model=='openai':
-            # Usa gpt-4o-mini por padrão (mais econômico)
-            model_id = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+        self.name = name
+        self.role = role
+        # AGENT_BACKEND=fake troca o LLM por um backend local determinístico (benchmarks)
+        self.fake = model == 'fake' or os.getenv('AGENT_BACKEND') == 'fake'
+        if not self.fake and model not in MODEL_TIERS:
+            raise ValueError('Modelo inválido')
+        self.provider = model
+        # Um agente por camada (rápida/grande), criado só no primeiro uso
+        self._agents = {}
+        self._agents_lock = threading.Lock()
+
+    @property
+    def agent(self):
+        """Agente da camada rápida (o modelo padrão do provedor)"""
+        return self._agent_for(FAST)
+
+    def _agent_for(self, tier: str):
+        agent = self._agents.get(tier)
+        if agent is None:
+            with self._agents_lock:
+                agent = self._agents.get(tier)
+                if agent is None:
+                    agent = self._agents[tier] = self._build_agent(tier)
+        return agent
+
+    def _build_agent(self, tier: str):
+        if self.fake:
+            from .fake_model import FakeLLM, LARGE_LATENCY_FACTOR
+            return FakeLLM(name=self.name, role=self.role, latency_factor=LARGE_LATENCY_FACTOR if tier == LARGE else 1.0,
+                           system_message=self.system_prompt)
+
+        model_id = model_for(self.provider, tier)
+        if self.provider == 'openai':
             llm = OpenAIChat(id=model_id, api_key=OPENAI_API_KEY)
-        elif model=='gemini':
-            # Usa gemini-1.5-flash por padrão (mais econômico)
-            model_id = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
-            llm = Gemini(id=model_id, api_key=GOOGLE_API_KEY)
         else:
-            raise ValueError('Modelo inválido')
+            llm = Gemini(id=model_id, api_key=GOOGLE_API_KEY)
+        # system_message explícito: o prefixo não passa pela montagem do agno (que varia entre chamadas)
+        return Agent(name=self.name, role=self.role, model=llm, show_tool_calls=True, markdown=True, memory=True,
+                     system_message=self.system_prompt)
 
-        self.agent = Agent(name=name, role=role, model=llm, show_tool_calls=True, markdown=True, memory=True)
-        self.name = name
-        self.role = role
+    def system_prompt(self, agent=None) -> str:
+        """Prefixo estável (papel, instruções, catálogo de agentes), idêntico entre chamadas"""
+        return build_system_prompt(self.name, self.role)
+
+    def _record_usage(self, response):
+        input_tokens, cached_tokens = token_usage(getattr(response, 'metrics', None))
+        if input_tokens:
+            prompt_cache_metrics.record(self.name, input_tokens, cached_tokens)
+
+    def choose_tier(self, task: str) -> str:
+        """Camada do modelo para a tarefa: rápida, a menos que a estimativa local indique complexidade"""
+        if not TIERING_ENABLED:
+            return FAST
+        return estimate_complexity(task).tier
+
+    def _wait_rate_limit(self):
+        """Aguarda um token do balde compartilhado do LLM, quando configurado"""
+        if LLM_RATE_LIMIT_PER_MIN <= 0:
+            return
+        from .shared_state import get_shared_state
+        shared = get_shared_state()
+        if shared is not None:
+            shared.acquire('llm', rate=LLM_RATE_LIMIT_PER_MIN / 60, capacity=max(1.0, LLM_RATE_LIMIT_PER_MIN / 6))
+    
+    def run(self, prompt: str, max_retries: int = 3, task: str = None) -> str:
+        """
+        Executa o prompt na camada escolhida para `task` (o prompt, se omitida).
+        Uma resposta do modelo rápido que não passa na validação é refeita no modelo grande.
+        """
+        tier = self.choose_tier(task or prompt)
+        started = time.perf_counter()
+        content = self._run_tier(prompt, tier, max_retries)
+        if tier == FAST and TIERING_ENABLED:
+            reason = validate_response(content)
+            if reason:
+                tiering_metrics.record_escalation(reason)
+                tier = LARGE
+                content = self._run_tier(prompt, LARGE, max_retries)
+        tiering_metrics.record_served(tier, time.perf_counter() - started)
+        return content
+
+    def _run_tier(self, prompt: str, tier: str, max_retries: int = 3) -> str:
+        started = time.perf_counter()
+        try:
+            return self._run_with_retry(self._agent_for(tier), prompt, max_retries)
+        finally:
+            tiering_metrics.record(tier, time.perf_counter() - started)
 
-    def run(self, prompt: str, max_retries: int = 3) -> str:
+    def _run_with_retry(self, agent, prompt: str, max_retries: int = 3) -> str:
         """Executa o prompt com retry automático para erros de rate limiting"""
         for attempt in range(max_retries + 1):
             try:
-                response = self.agent.run(prompt)
+                self._wait_rate_limit()
+                response = agent.run(prompt)
+                self._record_usage(response)
                 # Extrair apenas o conteúdo de texto da resposta
                 if hasattr(response, 'content'):
                     return response.content
@@ -62,6 +147,81 @@ class BaseAgent:
         
         return "❌ Erro inesperado no sistema de retry"
     
+    def run_stream(self, prompt: str, max_retries: int = 3, task: str = None) -> Iterator[str]:
+        """
+        Executa o prompt em modo streaming, entregando o texto em blocos.
+
+        Na camada rápida só os primeiros TIERING_STREAM_HOLD_CHARS caracteres
+        são retidos e validados (TIERING_STREAM_VALIDATE); aprovados, eles e o
+        restante seguem em stream. Reprovados, o stream rápido é descartado e a
+        camada grande assume, sem misturar as duas respostas. Um bloco de código
+        aberto só é detectado em respostas que cabem no trecho retido.
+        """
+        tier = self.choose_tier(task or prompt)
+        started = time.perf_counter()
+        if tier == FAST and TIERING_ENABLED and TIERING_STREAM_VALIDATE:
+            stream = self._stream_tier(prompt, FAST, max_retries)
+            held, held_chars, partial = [], 0, False
+            for chunk in stream:
+                held.append(chunk)
+                held_chars += len(chunk)
+                if held_chars >= TIERING_STREAM_HOLD_CHARS:
+                    partial = True
+                    break
+            reason = validate_response(''.join(held), partial=partial)
+            if not reason:
+                yield from held
+                yield from stream
+                tiering_metrics.record_served(FAST, time.perf_counter() - started)
+                return
+            stream.close()
+            tiering_metrics.record_escalation(reason)
+            tier = LARGE
+        yield from self._stream_tier(prompt, tier, max_retries)
+        tiering_metrics.record_served(tier, time.perf_counter() - started)
+
+    def _stream_tier(self, prompt: str, tier: str, max_retries: int = 3) -> Iterator[str]:
+        started = time.perf_counter()
+        try:
+            yield from self._stream_with_retry(self._agent_for(tier), prompt, max_retries)
+        finally:
+            tiering_metrics.record(tier, time.perf_counter() - started)
+
+    def _stream_with_retry(self, agent, prompt: str, max_retries: int = 3) -> Iterator[str]:
+        """
+        O retry de rate limit só acontece antes do primeiro bloco; depois disso
+        um erro encerra o stream com a mensagem de erro como último bloco.
+        """
+        for attempt in range(max_retries + 1):
+            started = False
+            try:
+                self._wait_rate_limit()
+                for event in agent.run(prompt, stream=True):
+                    if getattr(event, 'event', 'RunResponseContent') != 'RunResponseContent':
+                        continue
+                    content = getattr(event, 'content', None)
+                    if isinstance(content, str) and content:
+                        started = True
+                        yield content
+                # As métricas do stream ficam no run_response ao final da execução
+                self._record_usage(getattr(agent, 'run_response', None))
+                return
+            except Exception as e:
+                error_str = str(e)
+                
+                if not started and ('429' in error_str or 'Too Many Requests' in error_str):
+                    if attempt < max_retries:
+                        wait_time = (2 ** attempt) + random.uniform(0, 1)
+                        print(f"Rate limit atingido. Tentativa {attempt + 1}/{max_retries + 1}. Aguardando {wait_time:.1f}s...")
+                        time.sleep(wait_time)
+                        continue
+                    yield f"❌ Erro de rate limit após {max_retries + 1} tentativas. Tente novamente em alguns minutos."
+                    return
+                
+                prefix = "\n" if started else ""
+                yield f"{prefix}❌ Erro ao executar agente: {error_str}"
+                return
+    
     def get_memory_summary(self) -> str:
         """Retorna um resumo da memória do agente"""
         if hasattr(self.agent, 'memory') and self.agent.memory:
@@ -73,18 +233,17 @@ class BaseAgent:
         return f"Sem memória persistente para {self.name}"
     
     def clear_memory(self):
-        """Limpa a memória do agente"""
-        if hasattr(self.agent, 'memory') and self.agent.memory:
-            if hasattr(self.agent.memory, 'clear'):
-                self.agent.memory.clear()
-            elif hasattr(self.agent.memory, 'messages'):
-                self.agent.memory.messages.clear()
+        """Limpa a memória do agente (de todas as camadas já criadas)"""
+        for agent in list(self._agents.values()):
+            if hasattr(agent, 'memory') and agent.memory:
+                if hasattr(agent.memory, 'clear'):
+                    agent.memory.clear()
+                elif hasattr(agent.memory, 'messages'):
+                    agent.memory.messages.clear()
     
     def add_context_to_prompt(self, prompt: str, context: str = None) -> str:
         """Adiciona contexto ao prompt se fornecido"""
-        if context:
-            return f"Contexto anterior:\n{context}\n\nTarefa atual: {prompt}"
-        return prompt
+        return build_user_message(prompt, context)
     
     def __str__(self):
         return self.agent.name
\ No newline at end of file
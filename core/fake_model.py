@@ -0,0 +1,205 @@
+import hashlib
+import os
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# Vocabulário usado para gerar respostas sintéticas
+_VOCABULARIO = (
+    'agente', 'tarefa', 'modelo', 'django', 'react', 'banco', 'consulta', 'tabela',
+    'componente', 'arquitetura', 'documentação', 'função', 'classe', 'api', 'dados',
+    'resultado', 'sistema', 'projeto', 'código', 'serviço', 'rota', 'estado', 'teste',
+)
+
+LATENCY_DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+
+# Quanto o "modelo grande" falso é mais lento que o rápido (tiering)
+LARGE_LATENCY_FACTOR = float(os.getenv('FAKE_LLM_LARGE_LATENCY_FACTOR', '3'))
+
+# Simulação do cache de prefixo do provedor: blocos de 128 tokens a partir de 1024 (como na OpenAI)
+PREFIX_CACHE_ENABLED = os.getenv('FAKE_LLM_PREFIX_CACHE', '1') == '1'
+PREFIX_CACHE_MIN_TOKENS = int(os.getenv('FAKE_LLM_CACHE_MIN_TOKENS', '1024'))
+PREFIX_CACHE_BLOCK_TOKENS = 128
+PREFIX_CACHE_MAX_ENTRIES = 50000
+CHARS_PER_TOKEN = 4
+
+
+class PrefixCache:
+    """Guarda hashes dos prefixos já vistos, em fronteiras de bloco, e devolve quantos tokens seriam reaproveitados"""
+
+    def __init__(self, min_tokens=PREFIX_CACHE_MIN_TOKENS, block_tokens=PREFIX_CACHE_BLOCK_TOKENS,
+                 max_entries=PREFIX_CACHE_MAX_ENTRIES):
+        self.min_tokens = min_tokens
+        self.block_tokens = block_tokens
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup_and_store(self, text: str) -> int:
+        block_chars = self.block_tokens * CHARS_PER_TOKEN
+        digest = hashlib.sha1()
+        prefixes = []
+        for end in range(block_chars, len(text) + 1, block_chars):
+            digest.update(text[end - block_chars:end].encode('utf-8'))
+            if end // CHARS_PER_TOKEN >= self.min_tokens:
+                prefixes.append((end // CHARS_PER_TOKEN, digest.copy().hexdigest()))
+
+        cached = 0
+        with self._lock:
+            for tokens, key in prefixes:
+                if key in self._entries:
+                    cached = tokens
+                    self._entries.move_to_end(key)
+                else:
+                    self._entries[key] = True
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+
+# Compartilhado por todos os FakeLLM, como o cache do provedor é por conta
+prefix_cache = PrefixCache()
+
+
+class FakeRunResponse:
+    """Resposta mínima compatível com o RunResponse do agno"""
+
+    def __init__(self, content, metrics=None):
+        self.content = content
+        self.metrics = metrics or {}
+
+
+class FakeLLMConfig:
+    """Parâmetros do backend falso, lidos das variáveis FAKE_LLM_* por padrão"""
+
+    def __init__(self, latency_dist=None, latency_ms=None, latency_spread=None,
+                 tokens_per_second=None, response_tokens=None, rate_limit_rate=None, seed=None):
+        self.latency_dist = latency_dist or os.getenv('FAKE_LLM_LATENCY_DIST', 'lognormal')
+        self.latency_ms = float(latency_ms if latency_ms is not None else os.getenv('FAKE_LLM_LATENCY_MS', '50'))
+        self.latency_spread = float(latency_spread if latency_spread is not None else os.getenv('FAKE_LLM_LATENCY_SPREAD', '0.5'))
+        self.tokens_per_second = float(tokens_per_second if tokens_per_second is not None else os.getenv('FAKE_LLM_TOKENS_PER_SEC', '0'))
+        self.response_tokens = int(response_tokens if response_tokens is not None else os.getenv('FAKE_LLM_RESPONSE_TOKENS', '120'))
+        self.rate_limit_rate = float(rate_limit_rate if rate_limit_rate is not None else os.getenv('FAKE_LLM_429_RATE', '0'))
+        self.seed = int(seed if seed is not None else os.getenv('FAKE_LLM_SEED', '42'))
+
+        if self.latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f'Distribuição de latência inválida: {self.latency_dist}')
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+# Configuração compartilhada por todos os FakeLLM criados sem configuração explícita
+_default_config = None
+
+
+def configure_fake_llm(**kwargs) -> FakeLLMConfig:
+    """Define a configuração padrão usada pelos agentes com backend falso"""
+    global _default_config
+    _default_config = FakeLLMConfig(**kwargs)
+    return _default_config
+
+
+def get_fake_llm_config() -> FakeLLMConfig:
+    global _default_config
+    if _default_config is None:
+        _default_config = FakeLLMConfig()
+    return _default_config
+
+
+class FakeLLM:
+    """
+    Substituto determinístico do agno.Agent para medir o overhead do orquestrador.
+
+    Cada chamada deriva sua semente de (seed, nome do agente, prompt, n-ésima
+    ocorrência do prompt), então latências, respostas e erros 429 injetados se
+    repetem entre execuções independentemente da ordem das threads.
+    """
+
+    def __init__(self, name, role, config: FakeLLMConfig = None, latency_factor: float = 1.0, system_message=None):
+        self.name = name
+        self.role = role
+        self._config = config
+        self.latency_factor = latency_factor
+        # str ou callable(agent=...), como no agno
+        self.system_message = system_message
+        self.run_response = None
+        self._seen = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @property
+    def config(self) -> FakeLLMConfig:
+        return self._config or get_fake_llm_config()
+
+    def _rng_for(self, prompt: str) -> random.Random:
+        key = zlib.crc32(prompt.encode('utf-8'))
+        with self._lock:
+            occurrence = self._seen.get(key, 0)
+            self._seen[key] = occurrence + 1
+            self.calls += 1
+        return random.Random(f"{self.config.seed}:{self.name}:{key}:{occurrence}")
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        """Latência até o primeiro token, em segundos"""
+        cfg = self.config
+        base = cfg.latency_ms / 1000.0
+        if cfg.latency_dist == 'constant':
+            return base
+        if cfg.latency_dist == 'uniform':
+            return max(0.0, rng.uniform(base * (1 - cfg.latency_spread), base * (1 + cfg.latency_spread)))
+        if cfg.latency_dist == 'exponential':
+            return rng.expovariate(1 / base) if base > 0 else 0.0
+        # lognormal: a mediana fica em latency_ms e o spread controla a cauda
+        return base * rng.lognormvariate(0, cfg.latency_spread) if base > 0 else 0.0
+
+    def _generate_tokens(self, rng: random.Random, prompt: str) -> list:
+        words = prompt.split()[:8]
+        tokens = list(words)
+        while len(tokens) < self.config.response_tokens:
+            tokens.append(rng.choice(_VOCABULARIO))
+        return tokens
+
+    def _start(self, prompt: str):
+        cfg = self.config
+        rng = self._rng_for(prompt)
+        if cfg.rate_limit_rate and rng.random() < cfg.rate_limit_rate:
+            # Mesma mensagem que o cliente HTTP real propaga
+            raise Exception('<Response [429 Too Many Requests]>')
+        time.sleep(self._sample_latency(rng) * self.latency_factor)
+        return rng, self._generate_tokens(rng, prompt)
+
+    def _full_prompt(self, prompt: str) -> str:
+        system = self.system_message(agent=self) if callable(self.system_message) else self.system_message
+        return f"{system}\n{prompt}" if system else prompt
+
+    def _metrics(self, prompt: str, tokens: list) -> dict:
+        full_prompt = self._full_prompt(prompt)
+        metrics = {
+            'input_tokens': [max(1, len(full_prompt) // CHARS_PER_TOKEN)],
+            'output_tokens': [len(tokens)],
+        }
+        if PREFIX_CACHE_ENABLED:
+            metrics['cached_tokens'] = [prefix_cache.lookup_and_store(full_prompt)]
+        return metrics
+
+    def run(self, prompt: str, stream: bool = False, **kwargs):
+        if stream:
+            return self._run_stream(prompt)
+
+        rng, tokens = self._start(prompt)
+        if self.config.tokens_per_second > 0:
+            time.sleep(len(tokens) / self.config.tokens_per_second)
+        self.run_response = FakeRunResponse(' '.join(tokens), self._metrics(prompt, tokens))
+        return self.run_response
+
+    def _run_stream(self, prompt: str):
+        rng, tokens = self._start(prompt)
+        delay = 1 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0
+        for i, token in enumerate(tokens):
+            if delay:
+                time.sleep(delay)
+            yield FakeRunResponse(token if i == 0 else ' ' + token)
+        self.run_response = FakeRunResponse(' '.join(tokens), self._metrics(prompt, tokens))
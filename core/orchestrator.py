@@ -1,11 +1,20 @@
-from typing import Dict, List
+from typing import Dict, Iterator, List
 import re
 import logging
 import json
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 # Importações e registro dos agentes
 from .base_agent import BaseAgent
+from .payload_store import PayloadWriter, default_codec, payload_path, read_payload, remove_payload
+from .write_behind import WriteBehindQueue
+from .shared_state import SharedState, get_shared_state
+from .prompt_layout import build_user_message, register_catalog_entry
+from .admission import admission
 from agents.banco_agent import banco_agent
 from agents.django_agent import django_agent
 from agents.react_agent import react_agent
@@ -14,12 +23,38 @@ from agents.architect_agent import architect_agent
 
 logger = logging.getLogger(__name__)
 
+def _fsync_path(path):
+    """fsync de um arquivo já fechado (ignora arquivos removidos nesse meio tempo)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
 # Sistema de Memória/Contexto
 class ConversationMemory:
-    def __init__(self, memory_file='conversation_memory.json'):
+    def __init__(self, memory_file='conversation_memory.json', payload_dir=None, preview_chars=500):
         self.memory_file = memory_file
+        # Resultados completos ficam fora do JSON, comprimidos, um arquivo por interação
+        self.payload_dir = payload_dir or os.path.splitext(memory_file)[0] + '_payloads'
+        self.preview_chars = preview_chars
+        self.codec = default_codec()
+        self._lock = threading.RLock()
+        # Estado das interações em andamento (lado da requisição)
+        self._streams: Dict[str, dict] = {}
+        # Arquivos de payload abertos (lado da thread de gravação)
+        self._writers: Dict[str, PayloadWriter] = {}
+        # Gravado sem fsync, pendente para a próxima sincronização (política 'interval')
+        self._unsynced_writers = set()
+        self._unsynced_paths = set()
+        self._index_unsynced = False
         self.conversations = self.load_memory()
         self.current_session = self.create_new_session()
+        # Toda gravação em disco passa pela fila write-behind (MEMORY_FLUSH_*, MEMORY_FSYNC)
+        self._persistence = WriteBehindQueue.from_env(self._flush_batch, prefix='MEMORY', name='conversation-memory')
     
     def load_memory(self):
         """Carrega memória de conversas do arquivo"""
@@ -32,12 +67,83 @@ class ConversationMemory:
         return {'sessions': []}
     
     def save_memory(self):
-        """Salva memória no arquivo"""
-        try:
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(self.conversations, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Erro ao salvar memória: {e}")
+        """Agenda a gravação do índice de sessões"""
+        self._persistence.submit(('index',))
+    
+    def flush(self, timeout=None):
+        """Bloqueia até que todas as gravações pendentes estejam em disco"""
+        self._persistence.flush(timeout)
+    
+    def close(self):
+        """Descarrega a fila e encerra a thread de gravação"""
+        self._persistence.close()
+    
+    def _write_index(self, sync):
+        with self._lock:
+            data = json.dumps(self.conversations, ensure_ascii=False, indent=2)
+        # Grava em arquivo temporário e troca, para nunca deixar o índice pela metade
+        tmp_file = f"{self.memory_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(data)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_file, self.memory_file)
+    
+    def _flush_batch(self, batch, sync):
+        """Aplica um lote da fila: payloads primeiro, índice uma única vez no final"""
+        touched = {}
+        write_index = False
+        for item in batch:
+            kind = item[0]
+            try:
+                if kind == 'open':
+                    _, interaction_id, path = item
+                    os.makedirs(self.payload_dir, exist_ok=True)
+                    self._writers[interaction_id] = PayloadWriter(path, self.codec)
+                elif kind == 'chunk':
+                    _, interaction_id, text = item
+                    writer = self._writers.get(interaction_id)
+                    if writer is not None:
+                        writer.write(text)
+                        touched[interaction_id] = writer
+                elif kind == 'close':
+                    writer = self._writers.pop(item[1], None)
+                    touched.pop(item[1], None)
+                    if writer is not None:
+                        writer.close(fsync=sync)
+                elif kind == 'remove':
+                    remove_payload(item[1])
+                elif kind == 'index':
+                    write_index = True
+            except Exception as e:
+                logger.error(f"Erro ao gravar memória ({kind}): {e}")
+        
+        for writer in touched.values():
+            writer.sync_point(fsync=sync)
+        if write_index:
+            try:
+                self._write_index(sync)
+            except Exception as e:
+                logger.error(f"Erro ao salvar memória: {e}")
+        
+        if not sync:
+            self._unsynced_writers.update(touched)
+            self._unsynced_paths.update(item[2] for item in batch if item[0] == 'open')
+            self._index_unsynced = self._index_unsynced or write_index
+            return
+        # Lote sincronizado (ou lote vazio do timer de fsync): sincroniza também o que ficou pendente
+        for interaction_id in self._unsynced_writers - set(touched):
+            writer = self._writers.get(interaction_id)
+            if writer is not None:
+                writer.sync_point(fsync=True)
+        for path in self._unsynced_paths:
+            _fsync_path(path)
+        if self._index_unsynced and not write_index:
+            _fsync_path(self.memory_file)
+        self._unsynced_writers.clear()
+        self._unsynced_paths.clear()
+        self._index_unsynced = False
     
     def create_new_session(self):
         """Cria uma nova sessão de conversa"""
@@ -50,65 +156,211 @@ class ConversationMemory:
         }
         return session
     
-    def add_interaction(self, task, agent_used, result, files=None):
-        """Adiciona uma interação à sessão atual"""
+    def begin_interaction(self, task, agent_used, files=None) -> str:
+        """
+        Registra uma interação em andamento e abre o payload para receber os
+        blocos da resposta. Retorna o id usado em `append_chunk`/`finish_interaction`.
+        """
+        interaction_id = uuid.uuid4().hex
+        path = payload_path(self.payload_dir, interaction_id, self.codec)
         interaction = {
+            'id': interaction_id,
             'timestamp': datetime.now().isoformat(),
             'task': task,
             'agent_used': agent_used,
-            'result': result[:500] + '...' if len(result) > 500 else result,  # Limita tamanho
+            'result': '',
+            'result_ref': os.path.basename(path),
+            'result_chars': 0,
+            'status': 'streaming',
             'files': [f.name if hasattr(f, 'name') else str(f) for f in files] if files else []
         }
-        self.current_session['interactions'].append(interaction)
+        with self._lock:
+            self._streams[interaction_id] = {'preview': [], 'preview_len': 0, 'chars': 0}
+            self.current_session['interactions'].append(interaction)
+            self._trim_interactions()
         
-        # Mantém apenas as últimas 10 interações por sessão
-        if len(self.current_session['interactions']) > 10:
-            self.current_session['interactions'] = self.current_session['interactions'][-10:]
+        self._persistence.submit(('open', interaction_id, path))
+        # Registra já no início: se o worker morrer, a interação e o payload parcial ficam no disco
+        self.save_current_session()
+        return interaction_id
+    
+    def append_chunk(self, interaction_id, chunk):
+        """Acrescenta um bloco da resposta ao payload e à prévia (limitada a preview_chars)"""
+        if not chunk:
+            return
+        with self._lock:
+            stream = self._streams.get(interaction_id)
+            if stream is None:
+                return
+            stream['chars'] += len(chunk)
+            remaining = self.preview_chars + 1 - stream['preview_len']
+            if remaining > 0:
+                stream['preview'].append(chunk[:remaining])
+                stream['preview_len'] += min(len(chunk), remaining)
+        self._persistence.submit(('chunk', interaction_id, chunk))
+    
+    def finish_interaction(self, interaction_id, status='complete'):
+        """Fecha o payload e grava a prévia final na sessão"""
+        with self._lock:
+            stream = self._streams.pop(interaction_id, None)
+            if stream is None:
+                return
+            preview = ''.join(stream['preview'])
+            interaction = self._find_interaction(interaction_id)
+            if interaction is not None:
+                truncated = len(preview) > self.preview_chars
+                interaction['result'] = preview[:self.preview_chars] + '...' if truncated else preview
+                interaction['result_chars'] = stream['chars']
+                interaction['status'] = status
         
-        # Salva a sessão atual
+        self._persistence.submit(('close', interaction_id))
         self.save_current_session()
     
+    def add_interaction(self, task, agent_used, result, files=None, status='complete'):
+        """Adiciona uma interação já concluída à sessão atual"""
+        interaction_id = self.begin_interaction(task, agent_used, files)
+        self.append_chunk(interaction_id, result)
+        self.finish_interaction(interaction_id, status)
+    
+    def load_result(self, interaction) -> str:
+        """Lê o resultado completo de uma interação (descomprimindo o payload)"""
+        ref = interaction.get('result_ref')
+        if not ref:
+            return interaction.get('result', '')
+        self.flush()
+        return read_payload(os.path.join(self.payload_dir, ref))
+    
+    def _find_interaction(self, interaction_id):
+        for interaction in self.current_session['interactions']:
+            if interaction.get('id') == interaction_id:
+                return interaction
+        return None
+    
+    def _trim_interactions(self):
+        # Mantém apenas as últimas 10 interações por sessão
+        interactions = self.current_session['interactions']
+        if len(interactions) > 10:
+            self._discard_payloads(interactions[:-10])
+            self.current_session['interactions'] = interactions[-10:]
+    
+    def _discard_payloads(self, interactions):
+        for interaction in interactions:
+            if interaction.get('id') in self._streams:
+                continue
+            if interaction.get('result_ref'):
+                self._persistence.submit(('remove', os.path.join(self.payload_dir, interaction['result_ref'])))
+    
     def save_current_session(self):
         """Salva a sessão atual na memória"""
-        # Remove sessão anterior com mesmo ID se existir
-        self.conversations['sessions'] = [s for s in self.conversations['sessions'] if s['id'] != self.current_session['id']]
-        
-        # Adiciona sessão atual
-        self.conversations['sessions'].append(self.current_session.copy())
-        
-        # Mantém apenas as últimas 5 sessões
-        if len(self.conversations['sessions']) > 5:
-            self.conversations['sessions'] = self.conversations['sessions'][-5:]
+        with self._lock:
+            # Remove sessão anterior com mesmo ID se existir
+            self.conversations['sessions'] = [s for s in self.conversations['sessions'] if s['id'] != self.current_session['id']]
+            
+            # Adiciona sessão atual
+            session = self.current_session.copy()
+            session['interactions'] = [dict(i) for i in self.current_session['interactions']]
+            self.conversations['sessions'].append(session)
+            
+            # Mantém apenas as últimas 5 sessões
+            if len(self.conversations['sessions']) > 5:
+                for old_session in self.conversations['sessions'][:-5]:
+                    self._discard_payloads(old_session.get('interactions', []))
+                self.conversations['sessions'] = self.conversations['sessions'][-5:]
         
         self.save_memory()
     
     def get_context_for_task(self, task):
-        """Obtém contexto relevante para uma tarefa"""
+        """Obtém contexto relevante para uma tarefa (somente prévias, nunca o payload completo)"""
         context = []
         
         # Adiciona interações recentes da sessão atual
-        recent_interactions = self.current_session['interactions'][-3:]  # Últimas 3 interações
+        with self._lock:
+            recent_interactions = list(self.current_session['interactions'][-3:])  # Últimas 3 interações
         for interaction in recent_interactions:
+            if interaction.get('status') == 'streaming':
+                continue
             context.append(f"Anterior: {interaction['task']} -> {interaction['result'][:200]}...")
         
         return "\n".join(context) if context else ""
 
+class SharedConversationMemory(ConversationMemory):
+    """
+    Memória para o modo multi-worker: o índice de interações fica no estado
+    compartilhado (SQLite) em vez do JSON, então todos os processos enxergam o
+    mesmo histórico. Os payloads continuam em arquivos (ids únicos por interação).
+    """
+    def __init__(self, shared: SharedState, memory_file='conversation_memory.json', payload_dir=None, preview_chars=500):
+        self.shared = shared
+        super().__init__(memory_file, payload_dir, preview_chars)
+    
+    def load_memory(self):
+        # O histórico é lido do estado compartilhado a cada consulta
+        return {'sessions': []}
+    
+    def create_new_session(self):
+        # Workers iniciados no mesmo segundo não podem compartilhar o id da sessão
+        session = super().create_new_session()
+        session['id'] = f"{session['id']}_{os.getpid()}"
+        return session
+    
+    def _write_index(self, sync):
+        """Grava as interações da sessão deste worker e aplica os limites globais (thread de gravação)"""
+        with self._lock:
+            session_id = self.current_session['id']
+            interactions = [dict(i) for i in self.current_session['interactions']]
+        self.shared.save_interactions(interactions, session_id)
+        for ref in self.shared.trim_interactions(session_id):
+            remove_payload(os.path.join(self.payload_dir, ref))
+    
+    def _trim_interactions(self):
+        # Os payloads antigos são descartados pelo trim do estado compartilhado
+        interactions = self.current_session['interactions']
+        if len(interactions) > 10:
+            self.current_session['interactions'] = interactions[-10:]
+    
+    def save_current_session(self):
+        self.save_memory()
+    
+    def get_context_for_task(self, task):
+        """Contexto a partir das últimas interações concluídas de qualquer worker"""
+        context = [
+            f"Anterior: {interaction['task']} -> {(interaction['result'] or '')[:200]}..."
+            for interaction in self.shared.recent_interactions(3)
+        ]
+        return "\n".join(context) if context else ""
+
+
+def create_conversation_memory(memory_file):
+    """Memória em JSON (processo único) ou no estado compartilhado (SHARED_STATE_BACKEND=sqlite)"""
+    shared = get_shared_state()
+    if shared is not None:
+        return SharedConversationMemory(shared, memory_file)
+    return ConversationMemory(memory_file)
+
 # Instância global de memória
-conversation_memory = ConversationMemory()
+conversation_memory = create_conversation_memory(os.getenv('CONVERSATION_MEMORY_FILE', 'conversation_memory.json'))
 
 class AgentRegistry:
     def __init__(self):
         self._agents: Dict[str, BaseAgent] = {}
+        # Metadados gravados no registro (chave -> (nome, papel)), lidos sem tocar nas instâncias
+        self._catalog: Dict[str, tuple] = {}
 
     def register(self, name: str, agent_instance: BaseAgent):
         if name in self._agents:
             logger.warning(f"Agente '{name}' já registrado, sobrescrevendo.")
         self._agents[name] = agent_instance
+        self._catalog[name] = (agent_instance.name, agent_instance.role)
+        register_catalog_entry(name, agent_instance.role)
         logger.info(f"Agente '{name}' registrado com sucesso.")
     
     def get_agent_names(self) -> list[str]:
         return list(self._agents.keys())
     
+    def catalog(self) -> tuple:
+        """(chave, nome, papel) de cada agente registrado, ordenado pela chave"""
+        return tuple((key, name, role) for key, (name, role) in sorted(self._catalog.items()))
+    
     def get_agent_instance(self, name: str) -> BaseAgent | None:
         agent_instance = self._agents.get(name)
         if agent_instance:
@@ -177,8 +429,13 @@ def find_best_agent(task: str) -> str:
     logger.info(f"Agente selecionado: '{best_agent}' com pontuação {agent_scores[best_agent]}")
     return best_agent
 
-def orchestrate(task: str, agent_key: str = None, files=None):
-    """Orquestra uma tarefa, selecionando automaticamente o agente se não especificado"""
+def orchestrate(task: str, agent_key: str = None, files=None, with_context: bool = True,
+                cancel_event: threading.Event = None):
+    """
+    Orquestra uma tarefa, selecionando automaticamente o agente se não especificado.
+    `with_context=False` ignora as interações anteriores; com `cancel_event` ligado,
+    a execução para no próximo bloco da resposta (a chamada em andamento ao LLM vai até o fim).
+    """
     logger.info(f"Orquestrando tarefa: '{task}'")
     
     if not task:
@@ -186,12 +443,11 @@ def orchestrate(task: str, agent_key: str = None, files=None):
         return 'A tarefa não pode ser vazia.'
     
     # Obtém contexto das interações anteriores
-    context = conversation_memory.get_context_for_task(task)
+    context = conversation_memory.get_context_for_task(task) if with_context else ''
     
-    # Se há contexto, adiciona à tarefa
-    enhanced_task = task
+    # Parte variável do prompt: a tarefa e, por último, o contexto (o prefixo estável fica no system prompt)
+    enhanced_task = build_user_message(task, context)
     if context:
-        enhanced_task = f"Contexto anterior:\n{context}\n\nTarefa atual: {task}"
         logger.info(f"Contexto adicionado à tarefa")
     
     # Se o agente não foi especificado, encontra o melhor automaticamente
@@ -204,11 +460,17 @@ def orchestrate(task: str, agent_key: str = None, files=None):
         logger.error(f"Agente '{agent_key}' não encontrado no registro.")
         return f'Agente {agent_key} não encontrado'
     
+    # A interação é registrada antes da execução e os blocos são persistidos à medida que chegam
+    interaction_id = conversation_memory.begin_interaction(task, agent_key, files)
+    chunks = []
     try:
-        result = agent.run(enhanced_task)
-        
-        # Salva a interação na memória
-        conversation_memory.add_interaction(task, agent_key, result, files)
+        for chunk in agent.run_stream(enhanced_task, task=task):
+            if cancel_event is not None and cancel_event.is_set():
+                raise TimeoutError('execução cancelada por tempo limite')
+            chunks.append(chunk)
+            conversation_memory.append_chunk(interaction_id, chunk)
+        result = ''.join(chunks)
+        conversation_memory.finish_interaction(interaction_id)
         
         logger.info(f"Agente '{agent_key}' executado com sucesso para a tarefa '{task}'.")
         return result
@@ -217,7 +479,8 @@ def orchestrate(task: str, agent_key: str = None, files=None):
         error_msg = f'Ocorreu um erro ao executar o agente: {e}'
         
         # Salva o erro na memória também
-        conversation_memory.add_interaction(task, agent_key, error_msg, files)
+        conversation_memory.append_chunk(interaction_id, ('\n' if chunks else '') + error_msg)
+        conversation_memory.finish_interaction(interaction_id, status='error')
         
         return error_msg
 
@@ -225,4 +488,104 @@ def orchestrate_auto(task: str, files=None):
     """Versão simplificada que sempre seleciona o agente automaticamente"""
     return orchestrate(task, files=files)
 
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '4'))
+BATCH_ITEM_TIMEOUT = float(os.getenv('BATCH_ITEM_TIMEOUT', '180'))
+
+def route_batch(items: List[dict]) -> List[dict]:
+    """
+    Normaliza e roteia todos os itens de um lote de uma vez.
+    Cada item vira {'index', 'id', 'task', 'agent', 'error'}; itens inválidos já saem com 'error'.
+    """
+    agent_names = set(agent_registry.get_agent_names())
+    routed = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {'task': item}
+        if not isinstance(item, dict):
+            routed.append({'index': index, 'id': None, 'task': None, 'agent': None, 'error': 'Item inválido'})
+            continue
+        task = (item.get('task') or '').strip()
+        agent_key = item.get('agent') or 'auto'
+        entry = {'index': index, 'id': item.get('id'), 'task': task, 'agent': None, 'error': None}
+        if not task:
+            entry['error'] = 'Tarefa não pode ser vazia'
+        elif agent_key == 'auto':
+            entry['agent'] = find_best_agent(task)
+        elif agent_key not in agent_names:
+            entry['error'] = f'Agente inválido: {agent_key}'
+        else:
+            entry['agent'] = agent_key
+        routed.append(entry)
+    return routed
+
+def orchestrate_batch(items: List[dict], max_concurrency: int = BATCH_MAX_CONCURRENCY,
+                      item_timeout: float = BATCH_ITEM_TIMEOUT) -> Iterator[dict]:
+    """
+    Executa um lote de tarefas com concorrência limitada, entregando cada
+    resultado assim que termina. O prazo de cada item conta a partir do início
+    da sua execução; um erro ou timeout afeta só o próprio item.
+
+    Os itens rodam sem o contexto da conversa: o resultado de um item não
+    depende de quais outros terminaram antes. Uma thread que estoura o prazo
+    não pode ser interrompida; ela é avisada e para no próximo bloco da
+    resposta, mas a chamada ao LLM em andamento termina (e consome cota).
+    """
+    routed = route_batch(items)
+    started: Dict[int, float] = {}
+    cancel_events = {entry['index']: threading.Event() for entry in routed}
+
+    def run_item(entry):
+        # Mesmas vagas das requisições avulsas, mas em espera de baixa prioridade (fora da fila
+        # interativa) por até o prazo do item; o prazo de execução conta após a admissão
+        with admission.admit(entry['agent'], timeout=item_timeout, background=True):
+            started[entry['index']] = time.monotonic()
+            return orchestrate(entry['task'], entry['agent'], with_context=False,
+                               cancel_event=cancel_events[entry['index']])
+
+    def record(entry, status, **extra):
+        elapsed = time.monotonic() - started[entry['index']] if entry['index'] in started else 0.0
+        return {'index': entry['index'], 'id': entry['id'], 'agent_used': entry['agent'], 'status': status,
+                'elapsed_ms': round(elapsed * 1000, 1), **extra}
+
+    for entry in routed:
+        if entry['error']:
+            yield record(entry, 'error', error=entry['error'])
+
+    runnable = [entry for entry in routed if not entry['error']]
+    if not runnable:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(runnable))), thread_name_prefix='batch')
+    pending = {executor.submit(run_item, entry): entry for entry in runnable}
+    try:
+        while pending:
+            # Itens ainda na fila não têm prazo correndo
+            now = time.monotonic()
+            deadlines = [started[e['index']] + item_timeout for e in pending.values() if e['index'] in started]
+            timeout = max(0.0, min(deadlines) - now) if deadlines else item_timeout
+            done, _ = wait(list(pending), timeout=min(timeout, 1.0), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                entry = pending.pop(future)
+                try:
+                    yield record(entry, 'ok', result=future.result())
+                except Exception as e:
+                    logger.exception(f"Erro no item {entry['index']} do lote.")
+                    yield record(entry, 'error', error=str(e))
+
+            now = time.monotonic()
+            for future, entry in list(pending.items()):
+                if entry['index'] in started and now - started[entry['index']] >= item_timeout:
+                    # A thread não pode ser interrompida: é avisada para parar e o resultado tardio é descartado
+                    pending.pop(future)
+                    cancel_events[entry['index']].set()
+                    logger.warning(f"Item {entry['index']} do lote excedeu {item_timeout}s.")
+                    yield record(entry, 'timeout', error=f'Tempo limite de {item_timeout:g}s excedido')
+    finally:
+        # Cliente desconectado: itens na fila não começam e os em execução param no próximo bloco
+        for future, entry in pending.items():
+            future.cancel()
+            cancel_events[entry['index']].set()
+        executor.shutdown(wait=False)
+
 time_de_agentes = [banco_agent, django_agent, react_agent, doc_agent, architect_agent]
@@ -0,0 +1,92 @@
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Extensão de arquivo por codec; o codec é deduzido da extensão na leitura
+CODEC_EXTENSIONS = {'zlib': '.z', 'zstd': '.zst'}
+
+
+def default_codec() -> str:
+    """Codec configurado em MEMORY_COMPRESSION (zstd só se a lib estiver instalada)"""
+    codec = os.getenv('MEMORY_COMPRESSION', 'zstd' if zstandard else 'zlib')
+    if codec == 'zstd' and zstandard is None:
+        return 'zlib'
+    return codec if codec in CODEC_EXTENSIONS else 'zlib'
+
+
+class PayloadWriter:
+    """
+    Grava o resultado completo de uma interação, comprimido, bloco a bloco.
+
+    `sync_point` fecha um bloco do compressor e descarrega o arquivo, então o
+    que já foi escrito pode ser lido mesmo que o processo morra no meio da geração.
+    """
+
+    def __init__(self, path: str, codec: str = 'zlib'):
+        self.path = path
+        self.codec = codec
+        self.chars = 0
+        self._file = open(path, 'ab')
+        if codec == 'zstd':
+            self._compressor = zstandard.ZstdCompressor().stream_writer(self._file, closefd=False)
+        else:
+            self._compressor = zlib.compressobj()
+
+    def write(self, text: str):
+        if not text:
+            return
+        data = text.encode('utf-8')
+        if self.codec == 'zstd':
+            self._compressor.write(data)
+        else:
+            self._file.write(self._compressor.compress(data))
+        self.chars += len(text)
+
+    def sync_point(self, fsync: bool = False):
+        if self.codec == 'zstd':
+            self._compressor.flush(zstandard.FLUSH_BLOCK)
+        else:
+            self._file.write(self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self, fsync: bool = False):
+        if self._file.closed:
+            return
+        if self.codec == 'zstd':
+            self._compressor.flush(zstandard.FLUSH_FRAME)
+        else:
+            self._file.write(self._compressor.flush())
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def payload_path(directory: str, interaction_id: str, codec: str) -> str:
+    return os.path.join(directory, interaction_id + CODEC_EXTENSIONS[codec])
+
+
+def read_payload(path: str) -> str:
+    """Lê um payload, inclusive um que ficou incompleto (gravação interrompida)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith(CODEC_EXTENSIONS['zstd']):
+        if zstandard is None:
+            raise RuntimeError('zstandard não está instalado para ler este payload')
+        raw = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    else:
+        raw = zlib.decompressobj().decompress(data)
+    return raw.decode('utf-8', errors='replace')
+
+
+def remove_payload(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
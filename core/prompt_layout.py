@@ -0,0 +1,104 @@
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+# Instruções comuns a todos os agentes do orquestrador (parte fixa do prefixo)
+BASE_INSTRUCTIONS = (
+    'Responda em português, de forma clara e objetiva.',
+    'Use markdown para formatar as respostas.',
+    'A mensagem do usuário traz a tarefa atual e, depois dela, o contexto das interações anteriores, quando houver.',
+)
+
+# Catálogo de agentes do registro: nome -> papel
+_catalog: Dict[str, str] = {}
+_catalog_lock = threading.Lock()
+
+
+def register_catalog_entry(name: str, role: str):
+    with _catalog_lock:
+        _catalog[name] = role
+
+
+def catalog_entries() -> Tuple[Tuple[str, str], ...]:
+    """Catálogo ordenado por nome, para que o texto não dependa da ordem de registro"""
+    with _catalog_lock:
+        return tuple(sorted(_catalog.items()))
+
+
+@lru_cache(maxsize=64)
+def _render_system_prompt(name: str, role: str, instructions: Tuple[str, ...], catalog: Tuple[Tuple[str, str], ...]) -> str:
+    lines = ['<papel>', f'{name}: {role}', '</papel>', '<instrucoes>']
+    lines.extend(f'- {instruction}' for instruction in instructions)
+    lines.append('</instrucoes>')
+    if catalog:
+        lines.append('<agentes_disponiveis>')
+        lines.extend(f'- {key}: {agent_role}' for key, agent_role in catalog)
+        lines.append('</agentes_disponiveis>')
+    return '\n'.join(lines)
+
+
+def build_system_prompt(name: str, role: str, instructions: Iterable[str] = BASE_INSTRUCTIONS) -> str:
+    """
+    Prefixo estável do prompt: papel, instruções e catálogo de agentes.
+    Nada variável (data, contexto, memória) entra aqui, então o texto é idêntico
+    byte a byte entre chamadas e aproveita o cache de prefixo do provedor.
+    """
+    return _render_system_prompt(name, role, tuple(instructions), catalog_entries())
+
+
+def build_user_message(task: str, context: Optional[str] = None) -> str:
+    """Parte variável, sempre no final: a tarefa e depois o contexto (que muda a cada chamada)"""
+    if context:
+        return f"Tarefa atual: {task}\n\nContexto anterior:\n{context}"
+    return task
+
+
+def token_usage(metrics) -> Tuple[int, int]:
+    """(input_tokens, cached_tokens) a partir das métricas do agno (dict de listas) ou de um objeto"""
+    if not metrics:
+        return 0, 0
+
+    def total(key):
+        value = metrics.get(key) if isinstance(metrics, dict) else getattr(metrics, key, None)
+        if isinstance(value, (list, tuple)):
+            return sum(v or 0 for v in value)
+        return value or 0
+
+    return total('input_tokens'), total('cached_tokens')
+
+
+class PromptCacheMetrics:
+    """Tokens de entrada com e sem cache de prefixo, por agente"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._agents: Dict[str, Dict[str, int]] = {}
+
+    def record(self, agent_name: str, input_tokens: int, cached_tokens: int):
+        with self._lock:
+            stats = self._agents.setdefault(agent_name, {'calls': 0, 'input_tokens': 0, 'cached_tokens': 0})
+            stats['calls'] += 1
+            stats['input_tokens'] += input_tokens
+            stats['cached_tokens'] += cached_tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            agents = {name: dict(stats) for name, stats in self._agents.items()}
+        for stats in agents.values():
+            stats['uncached_tokens'] = stats['input_tokens'] - stats['cached_tokens']
+            stats['cached_ratio'] = stats['cached_tokens'] / stats['input_tokens'] if stats['input_tokens'] else 0.0
+        input_tokens = sum(s['input_tokens'] for s in agents.values())
+        cached_tokens = sum(s['cached_tokens'] for s in agents.values())
+        return {
+            'agents': agents,
+            'input_tokens': input_tokens,
+            'cached_tokens': cached_tokens,
+            'cached_ratio': cached_tokens / input_tokens if input_tokens else 0.0,
+        }
+
+
+prompt_cache_metrics = PromptCacheMetrics()
@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# SHARED_STATE_BACKEND=sqlite liga o modo multi-worker (vários processos gunicorn na mesma máquina)
+SHARED_STATE_BACKEND = os.getenv('SHARED_STATE_BACKEND', '')
+SHARED_STATE_DB = os.getenv('SHARED_STATE_DB', 'shared_state.db')
+SHARED_STATE_BUSY_TIMEOUT_MS = int(os.getenv('SHARED_STATE_BUSY_TIMEOUT_MS', '5000'))
+# Interações em 'streaming' mais antigas que isso (worker que morreu no meio da resposta) viram 'error'
+SHARED_STATE_STREAMING_TTL = float(os.getenv('SHARED_STATE_STREAMING_TTL', '3600'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    task TEXT,
+    agent_used TEXT,
+    result TEXT,
+    result_ref TEXT,
+    result_chars INTEGER DEFAULT 0,
+    status TEXT,
+    files TEXT,
+    worker INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_interactions_session ON interactions (session_id, timestamp);
+CREATE INDEX IF NOT EXISTS ix_interactions_timestamp ON interactions (timestamp);
+
+CREATE TABLE IF NOT EXISTS token_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+INTERACTION_FIELDS = ('id', 'session_id', 'timestamp', 'task', 'agent_used', 'result',
+                      'result_ref', 'result_chars', 'status', 'files', 'worker')
+
+
+class SharedState:
+    """
+    Estado compartilhado entre processos em um arquivo SQLite local.
+
+    WAL permite leituras concorrentes com um escritor; toda escrita que
+    lê-e-altera roda em `BEGIN IMMEDIATE`, que pega o lock de escrita antes
+    da leitura e evita atualizações perdidas entre workers. busy_timeout faz
+    os concorrentes esperarem em vez de falhar com "database is locked".
+    """
+
+    def __init__(self, db_file: str = SHARED_STATE_DB, busy_timeout_ms: int = SHARED_STATE_BUSY_TIMEOUT_MS):
+        self.db_file = db_file
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Uma conexão por thread; o modo autocommit deixa o controle das transações explícito
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Transação de escrita (BEGIN IMMEDIATE): commit no sucesso, rollback na exceção"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # Memória de conversas
+
+    def save_interactions(self, interactions: List[dict], session_id: str):
+        """Grava (upsert) as interações de uma sessão em uma única transação"""
+        rows = []
+        for interaction in interactions:
+            row = {**interaction, 'session_id': session_id, 'worker': os.getpid()}
+            row['files'] = json.dumps(row.get('files') or [], ensure_ascii=False)
+            rows.append([row.get(field) for field in INTERACTION_FIELDS])
+        with self.transaction() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO interactions ({', '.join(INTERACTION_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in INTERACTION_FIELDS)})",
+                rows,
+            )
+
+    def recent_interactions(self, limit: int = 3, include_streaming: bool = False) -> List[dict]:
+        """Últimas interações de todos os workers, da mais antiga para a mais recente"""
+        where = "" if include_streaming else "WHERE status != 'streaming'"
+        rows = self._connection().execute(
+            f"SELECT * FROM interactions {where} ORDER BY timestamp DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [self._interaction(row) for row in reversed(rows)]
+
+    @staticmethod
+    def _interaction(row) -> dict:
+        interaction = dict(row)
+        interaction['files'] = json.loads(interaction['files'] or '[]')
+        return interaction
+
+    def trim_interactions(self, session_id: str, per_session: int = 10, max_sessions: int = 5,
+                          streaming_ttl: float = SHARED_STATE_STREAMING_TTL) -> List[str]:
+        """
+        Aplica os mesmos limites da memória em JSON (10 interações por sessão,
+        5 sessões). Retorna os result_ref removidos para o descarte dos payloads.
+        Interações presas em 'streaming' há mais de `streaming_ttl` segundos são
+        encerradas como 'error' e passam a seguir os mesmos limites.
+        """
+        cutoff = (datetime.now() - timedelta(seconds=streaming_ttl)).isoformat()
+        with self.transaction() as conn:
+            conn.execute("UPDATE interactions SET status = 'error' WHERE status = 'streaming' AND timestamp < ?", (cutoff,))
+            stale = conn.execute(
+                """
+                SELECT id, result_ref FROM interactions
+                WHERE status != 'streaming' AND (
+                    (session_id = ? AND id NOT IN (
+                        SELECT id FROM interactions WHERE session_id = ? ORDER BY timestamp DESC LIMIT ?))
+                    OR session_id NOT IN (
+                        SELECT session_id FROM interactions GROUP BY session_id ORDER BY MAX(timestamp) DESC LIMIT ?)
+                )
+                """,
+                (session_id, session_id, per_session, max_sessions),
+            ).fetchall()
+            conn.executemany("DELETE FROM interactions WHERE id = ?", [(row['id'],) for row in stale])
+        return [row['result_ref'] for row in stale if row['result_ref']]
+
+    # Rate limit (token bucket)
+
+    def try_acquire(self, name: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        """
+        Tenta consumir `tokens` do balde `name` (reposto a `rate` tokens/s, até `capacity`).
+        Retorna 0 quando conseguiu, ou quantos segundos faltam para haver tokens.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (name,)).fetchone()
+            available = capacity if row is None else min(capacity, row['tokens'] + (now - row['updated_at']) * rate)
+            if available >= tokens:
+                available -= tokens
+                wait = 0.0
+            else:
+                wait = (tokens - available) / rate if rate > 0 else float('inf')
+            conn.execute(
+                "INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (name, available, now),
+            )
+        return wait
+
+    def acquire(self, name: str, rate: float, capacity: float, timeout: Optional[float] = None) -> bool:
+        """Espera um token do balde compartilhado; False se o timeout vencer antes"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(name, rate, capacity)
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(min(wait, 1.0))
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_shared_state: Optional[SharedState] = None
+_shared_state_lock = threading.Lock()
+
+
+def get_shared_state() -> Optional[SharedState]:
+    """Backend compartilhado configurado (SHARED_STATE_BACKEND=sqlite) ou None no modo de processo único"""
+    global _shared_state
+    if SHARED_STATE_BACKEND != 'sqlite':
+        return None
+    with _shared_state_lock:
+        if _shared_state is None:
+            _shared_state = SharedState()
+            logger.info(f"Estado compartilhado em '{SHARED_STATE_DB}'.")
+        return _shared_state
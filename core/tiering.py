@@ -0,0 +1,163 @@
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Desligado por padrão: com TIERING_ENABLED=1 parte das tarefas passa ao modelo grande (mais caro)
+TIERING_ENABLED = os.getenv('TIERING_ENABLED', '0') == '1'
+TIERING_THRESHOLD = float(os.getenv('TIERING_THRESHOLD', '4'))
+TIERING_MIN_ANSWER_CHARS = int(os.getenv('TIERING_MIN_ANSWER_CHARS', '40'))
+
+FAST = 'fast'
+LARGE = 'large'
+
+# Modelos por provedor e camada; o modelo rápido herda OPENAI_MODEL/GEMINI_MODEL quando definidos
+MODEL_TIERS = {
+    'openai': {
+        FAST: os.getenv('OPENAI_MODEL_FAST') or os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+        LARGE: os.getenv('OPENAI_MODEL_LARGE', 'gpt-4o'),
+    },
+    'gemini': {
+        FAST: os.getenv('GEMINI_MODEL_FAST') or os.getenv('GEMINI_MODEL', 'gemini-2.5-flash'),
+        LARGE: os.getenv('GEMINI_MODEL_LARGE', 'gemini-2.5-pro'),
+    },
+}
+
+# Sinais de tarefa pesada (peso) e de tarefa simples
+HEAVY_KEYWORDS = {
+    'arquitetura': 2, 'completo': 2, 'completa': 2, 'sistema': 1, 'refatorar': 2, 'refatoração': 2,
+    'migração': 2, 'migrar': 2, 'otimizar': 1, 'otimização': 1, 'escalável': 2, 'segurança': 1,
+    'detalhado': 1, 'detalhada': 1, 'passo a passo': 1, 'comparar': 1, 'integração': 1,
+    'microserviços': 2, 'autenticação': 1, 'performance': 1, 'concorrência': 2, 'debug': 1,
+}
+LIGHT_KEYWORDS = ('o que é', 'defina', 'definição', 'resuma', 'resumo', 'traduza', 'liste', 'exemplo simples', 'sim ou não')
+
+# Artefatos pedidos explicitamente: cada um tende a aumentar o tamanho da resposta
+ARTIFACT_PATTERNS = {
+    'codigo': r'\b(código|implemente|implementar|escreva|gere|crie|criar)\b',
+    'modelo_dados': r'\b(models?|schema|tabelas?|migrations?)\b',
+    'api': r'\b(api|endpoints?|views?|serializers?|rotas?|urls?)\b',
+    'interface': r'\b(componentes?|telas?|páginas?|hooks?)\b',
+    'testes': r'\b(testes?|pytest|unittest)\b',
+    'documento': r'\b(documentação|readme|diagrama|relatório|manual)\b',
+}
+
+_REFUSALS = re.compile(r"(não posso ajudar|não consigo ajudar|i can't help|i cannot help|as an ai)", re.IGNORECASE)
+
+
+@dataclass
+class ComplexityEstimate:
+    score: float
+    tier: str
+    signals: Dict[str, float] = field(default_factory=dict)
+
+
+def estimate_complexity(task: str, threshold: float = TIERING_THRESHOLD) -> ComplexityEstimate:
+    """Pontua a tarefa localmente (tamanho, palavras-chave, artefatos pedidos) e escolhe a camada"""
+    text = (task or '').lower()
+    signals: Dict[str, float] = {}
+
+    words = len(text.split())
+    if words > 40:
+        signals['tamanho'] = min(3.0, (words - 40) / 40 + 1)
+    if '```' in text:
+        signals['codigo_no_pedido'] = 2
+
+    heavy = sum(weight for keyword, weight in HEAVY_KEYWORDS.items() if keyword in text)
+    if heavy:
+        signals['palavras_pesadas'] = heavy
+    if any(keyword in text for keyword in LIGHT_KEYWORDS):
+        signals['palavras_leves'] = -2
+
+    artifacts = [name for name, pattern in ARTIFACT_PATTERNS.items() if re.search(pattern, text)]
+    if artifacts:
+        signals['artefatos'] = len(artifacts)
+
+    # Vários pedidos na mesma mensagem (perguntas ou itens enumerados)
+    requests = text.count('?') + len(re.findall(r'(?m)^\s*(\d+[.)]|[-*])\s+', text))
+    if requests > 1:
+        signals['pedidos'] = min(3, requests - 1)
+
+    score = sum(signals.values())
+    return ComplexityEstimate(score=score, tier=LARGE if score >= threshold else FAST, signals=signals)
+
+
+def validate_response(content: Optional[str], min_chars: int = TIERING_MIN_ANSWER_CHARS,
+                      partial: bool = False) -> Optional[str]:
+    """
+    Motivo de rejeição da resposta do modelo rápido, ou None quando ela é aceitável.
+    `partial=True` valida só o início de um stream (sem a checagem de bloco de código aberto).
+    """
+    if not content or not content.strip():
+        return 'vazia'
+    stripped = content.strip()
+    if stripped.startswith('❌'):
+        # Erro do provedor (rate limit, autenticação...), não de qualidade: o modelo grande falharia igual
+        return None
+    if len(stripped) < min_chars:
+        return 'curta'
+    if _REFUSALS.search(stripped[:300]):
+        return 'recusa'
+    if not partial and stripped.count('```') % 2:
+        # Bloco de código aberto: resposta truncada
+        return 'truncada'
+    return None
+
+
+def model_for(provider: str, tier: str) -> str:
+    return MODEL_TIERS[provider][tier]
+
+
+class TieringMetrics:
+    """Distribuição por camada, escalonamentos e latência, para estimar a economia do roteamento"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = {FAST: 0, LARGE: 0}
+            self.latency = {FAST: 0.0, LARGE: 0.0}
+            self.escalations = 0
+            self.escalation_reasons: Dict[str, int] = {}
+            self.served_fast = 0
+            self.fast_latency_served = 0.0
+
+    def record(self, tier: str, seconds: float):
+        with self._lock:
+            self.calls[tier] += 1
+            self.latency[tier] += seconds
+
+    def record_served(self, tier: str, seconds: float):
+        """Latência total de uma resposta entregue (incluindo um eventual escalonamento)"""
+        if tier == FAST:
+            with self._lock:
+                self.served_fast += 1
+                self.fast_latency_served += seconds
+
+    def record_escalation(self, reason: str):
+        with self._lock:
+            self.escalations += 1
+            self.escalation_reasons[reason] = self.escalation_reasons.get(reason, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = {tier: (self.latency[tier] / self.calls[tier] if self.calls[tier] else None) for tier in self.calls}
+            # Economia estimada: respostas servidas pelo modelo rápido x latência média do modelo grande
+            savings = None
+            if avg[LARGE] is not None and self.served_fast:
+                savings = self.served_fast * avg[LARGE] - self.fast_latency_served
+            total = sum(self.calls.values())
+            return {
+                'calls': dict(self.calls),
+                'share': {tier: (count / total if total else 0.0) for tier, count in self.calls.items()},
+                'avg_latency_s': avg,
+                'escalations': self.escalations,
+                'escalation_reasons': dict(self.escalation_reasons),
+                'estimated_savings_s': savings,
+            }
+
+
+tiering_metrics = TieringMetrics()
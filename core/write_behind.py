@@ -0,0 +1,175 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    Fila limitada de escritas processada em lotes por uma thread de fundo.
+
+    O lote é descarregado quando atinge `max_batch` itens ou quando o item mais
+    antigo espera `max_delay` segundos. `flush_fn(batch, sync)` recebe os itens
+    na ordem de chegada e `sync` indica se o lote deve terminar com fsync,
+    conforme a política:
+
+    - always:   fsync a cada lote (perda máxima: o lote em andamento)
+    - interval: fsync no máximo a cada `fsync_interval` segundos; se a fila
+                esvaziar com dados sem fsync, a thread acorda ao fim do intervalo
+                e chama `flush_fn([], True)`, que deve sincronizar o que já foi escrito
+    - never:    deixa a sincronização com o sistema operacional
+
+    Com a fila cheia, `submit` bloqueia o chamador (backpressure) em vez de
+    descartar dados. No encerramento do processo a fila é descarregada.
+    """
+
+    def __init__(self, flush_fn: Callable[[List, bool], None], name='write-behind',
+                 max_batch=64, max_delay=0.5, max_queue=10000, fsync='interval',
+                 fsync_interval=1.0, enabled=True):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'Política de fsync inválida: {fsync}')
+        self.flush_fn = flush_fn
+        self.name = name
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.enabled = enabled
+        self.batches_flushed = 0
+        self.items_flushed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._last_fsync = time.monotonic()
+        # Há lotes gravados sem fsync desde a última sincronização
+        self._dirty = False
+        self._sync_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+        if enabled:
+            self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, flush_fn, prefix='MEMORY', name='write-behind'):
+        """Cria a fila a partir das variáveis <PREFIX>_FLUSH_BATCH, _FLUSH_INTERVAL, _QUEUE_SIZE, _FSYNC..."""
+        return cls(
+            flush_fn,
+            name=name,
+            max_batch=int(os.getenv(f'{prefix}_FLUSH_BATCH', '64')),
+            max_delay=float(os.getenv(f'{prefix}_FLUSH_INTERVAL', '0.5')),
+            max_queue=int(os.getenv(f'{prefix}_QUEUE_SIZE', '10000')),
+            fsync=os.getenv(f'{prefix}_FSYNC', 'interval'),
+            fsync_interval=float(os.getenv(f'{prefix}_FSYNC_INTERVAL', '1.0')),
+            enabled=os.getenv(f'{prefix}_WRITE_BEHIND', '1') != '0',
+        )
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, item):
+        """Enfileira um item; sem write-behind habilitado, grava na hora"""
+        if not self.enabled or self._closed:
+            self._write([item])
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning(f"Fila '{self.name}' cheia ({self._queue.maxsize}); aguardando descarga")
+            self._queue.put(item)
+
+    def flush(self, timeout=None):
+        """Bloqueia até que tudo que foi enfileirado até agora esteja gravado"""
+        if not self.enabled or self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """Descarrega a fila e encerra a thread de fundo"""
+        if self._closed or self._thread is None:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _should_sync(self) -> bool:
+        if self.fsync == 'always':
+            return True
+        if self.fsync == 'interval':
+            return time.monotonic() - self._last_fsync >= self.fsync_interval
+        return False
+
+    def _write(self, batch, force_sync=False):
+        with self._sync_lock:
+            sync = force_sync and self.fsync != 'never' or self._should_sync()
+            try:
+                self.flush_fn(batch, sync)
+            except Exception as e:
+                logger.error(f"Erro ao gravar lote em '{self.name}': {e}")
+            if sync:
+                self._last_fsync = time.monotonic()
+            self._dirty = not sync and self.fsync == 'interval'
+            self.batches_flushed += 1
+            self.items_flushed += len(batch)
+
+    def _sync_pending(self):
+        """Sincroniza os lotes gravados sem fsync (fila parada depois de uma rajada)"""
+        with self._sync_lock:
+            try:
+                self.flush_fn([], True)
+            except Exception as e:
+                logger.error(f"Erro ao sincronizar '{self.name}': {e}")
+            self._last_fsync = time.monotonic()
+            self._dirty = False
+
+    def _next_item(self):
+        """Próximo item da fila; com dados pendentes de fsync, espera só até o fim do intervalo"""
+        while True:
+            if not self._dirty:
+                return self._queue.get()
+            remaining = self._last_fsync + self.fsync_interval - time.monotonic()
+            if remaining <= 0:
+                self._sync_pending()
+                continue
+            try:
+                return self._queue.get(timeout=remaining)
+            except queue.Empty:
+                self._sync_pending()
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            item = self._next_item()
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.max_delay
+            while True:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stopping or waiters or len(batch) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch, force_sync=stopping)
+            for waiter in waiters:
+                waiter.set()
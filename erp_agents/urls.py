@@ -5,7 +5,13 @@ from agents import views
 urlpatterns = [
     path('', lambda request: redirect('agents/ui/', permanent=False)),
     path('agents/ui/', views.agents_ui, name='agents_ui'),
+    path('agents/ui/assets/<str:name>', views.console_asset, name='console_asset'),
+    path('agents/catalog/', views.agents_catalog, name='agents_catalog'),
     path('agents/run/', views.run_agent, name='run_agent'),
     path('agents/auto/', views.run_agent_auto, name='run_agent_auto'),
     path('agents/upload/', views.upload_and_analyze, name='upload_and_analyze'),
+    path('agents/docs/', views.doc_coverage, name='doc_coverage'),
+    path('agents/batch/', views.run_batch, name='run_batch'),
+    path('agents/admission/', views.admission_status, name='admission_status'),
+    path('agents/metrics/', views.metrics_status, name='metrics_status'),
 ]